@@ -0,0 +1,97 @@
+"""
+Cache of compiled user defined python expressions, such as index,
+grouping, transformation and metadata expressions, shared by every app
+that evaluates them
+"""
+import threading
+import time
+
+from django.db.models.signals import pre_save, post_delete
+from django.utils.translation import ugettext as _
+
+from common.literals import EXPRESSION_CACHE_SIZE
+
+_compiled_expressions = {}
+_expression_statistics = {}
+_statistics_lock = threading.Lock()
+
+
+def compile_expression(source):
+    """
+    Return the code object of an expression, compiling it only the
+    first time it is seen
+    """
+    code = _compiled_expressions.get(source)
+    if code is None:
+        if len(_compiled_expressions) >= EXPRESSION_CACHE_SIZE:
+            _compiled_expressions.clear()
+        # eval ignores leading blanks of a string, compile doesn't
+        code = compile(source.lstrip(u' \t'), u'<expression>', 'eval')
+        _compiled_expressions[source] = code
+    return code
+
+
+def evaluate_expression(source, globals_dict=None, locals_dict=None):
+    """
+    Drop in replacement for eval of an expression string that caches
+    the compiled code and records the evaluation time and errors
+    """
+    start_time = time.time()
+    failed = True
+    try:
+        result = eval(compile_expression(source), {} if globals_dict is None else globals_dict, locals_dict)
+        failed = False
+        return result
+    finally:
+        _statistics_lock.acquire()
+        try:
+            if source not in _expression_statistics and len(_expression_statistics) >= EXPRESSION_CACHE_SIZE:
+                _expression_statistics.clear()
+            statistics = _expression_statistics.setdefault(source, {'evaluations': 0, 'errors': 0, 'time': 0.0})
+            statistics['evaluations'] += 1
+            statistics['errors'] += int(failed)
+            statistics['time'] += time.time() - start_time
+        finally:
+            _statistics_lock.release()
+
+
+def discard_expression(source):
+    _compiled_expressions.pop(source, None)
+
+
+def register_expression_model(model, field_names):
+    """
+    Discard the compiled expressions stored in a model's fields when
+    they are changed or deleted
+    """
+    def model_pre_save(sender, instance, **kwargs):
+        if instance.pk:
+            for values in sender.objects.filter(pk=instance.pk).values(*field_names):
+                for field_name, source in values.items():
+                    if source and source != getattr(instance, field_name):
+                        discard_expression(source)
+
+    def model_post_delete(sender, instance, **kwargs):
+        for field_name in field_names:
+            if getattr(instance, field_name):
+                discard_expression(getattr(instance, field_name))
+
+    pre_save.connect(model_pre_save, sender=model, weak=False, dispatch_uid=u'expressions_pre_save_%s' % model.__name__)
+    post_delete.connect(model_post_delete, sender=model, weak=False, dispatch_uid=u'expressions_post_delete_%s' % model.__name__)
+
+
+def get_statistics():
+    paragraphs = [
+        _(u'Counted by the process serving this page only, evaluations made by other web server processes and by the task workers are not included.'),
+        _(u'Compiled expressions: %d') % len(_compiled_expressions),
+    ]
+    slowest = sorted(_expression_statistics.items(), key=lambda x: x[1]['time'], reverse=True)[:10]
+    for source, statistics in slowest:
+        paragraphs.append(_(u'%(expression)s: %(evaluations)d evaluations, %(errors)d errors, %(time).3f seconds') % {
+            'expression': source, 'evaluations': statistics['evaluations'],
+            'errors': statistics['errors'], 'time': statistics['time']})
+
+    return {
+        'title': _(u'Expression statistics (per process)'),
+        'paragraphs': paragraphs
+    }
@@ -38,3 +38,7 @@ PAGE_ORIENTATION_CHOICES = (
     (PAGE_ORIENTATION_PORTRAIT, _(u'Portrait')),
     (PAGE_ORIENTATION_LANDSCAPE, _(u'Landscape')),
 )
+
+# Number of compiled user expressions, and of expressions with evaluation
+# statistics, kept before they are reset
+EXPRESSION_CACHE_SIZE = 1000
@@ -7,6 +7,7 @@ from django.utils.http import urlquote  as django_urlquote
 from django.utils.http import urlencode as django_urlencode
 from django.utils.datastructures import MultiValueDict
 from django.conf import settings
+from django.db import connection
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth.models import User
@@ -337,3 +338,21 @@ def return_diff(old_obj, new_obj, attrib_list=None):
             }
 
     return diff_dict
+
+
+def insert_rows(cursor, table, columns, rows, batch_size=None):
+    """
+    Insert many rows in a table with a single prepared INSERT statement,
+    in batches of batch_size rows when given.  Raw statements don't mark
+    the transaction as dirty, callers in a managed transaction must call
+    transaction.set_dirty()
+    """
+    rows = list(rows)
+    if not rows:
+        return
+
+    qn = connection.ops.quote_name
+    sql = u'INSERT INTO %s (%s) VALUES (%s)' % (qn(table), u', '.join([qn(column) for column in columns]), u', '.join([u'%s'] * len(columns)))
+    batch_size = batch_size or len(rows)
+    for index in range(0, len(rows), batch_size):
+        cursor.executemany(sql, rows[index:index + batch_size])
@@ -1,5 +1,8 @@
 import os
 import subprocess
+import hashlib
+import shutil
+import tempfile
 
 from django.utils.importlib import import_module
 from django.template.defaultfilters import slugify
@@ -12,8 +15,10 @@ from converter.conf.settings import HIGH_QUALITY_OPTIONS
 from converter.conf.settings import PRINT_QUALITY_OPTIONS
 from converter.conf.settings import GRAPHICS_BACKEND
 from converter.conf.settings import UNOCONV_PATH
+from converter.conf.settings import CACHE_DIRECTORY
 
 from converter.exceptions import UnpaperError, OfficeConversionError
+from converter.models import CachedImage
 
 from common import TEMPORARY_DIRECTORY
 from documents.utils import document_save_to_temp_dir
@@ -40,6 +45,8 @@ CONVERTER_OFFICE_FILE_EXTENSIONS = [
     u'ods', u'docx', u'doc'
 ]
 
+RENDER_CACHE_DIRECTORY = CACHE_DIRECTORY if CACHE_DIRECTORY else os.path.join(TEMPORARY_DIRECTORY, u'converter_cache')
+
 
 def _lazy_load(fn):
     _cached = []
@@ -61,6 +68,20 @@ except ImportError:
     raise ImportError(u'Missing or incorrect converter backend: %s' % GRAPHICS_BACKEND)
 
 
+def document_save_to_unique_file(document):
+    """
+    Copy a document's file to a temporary file of its own, renders of
+    the same document running at the same time don't share their input
+    """
+    handle, filepath = tempfile.mkstemp(dir=TEMPORARY_DIRECTORY, prefix=u'%s_' % document.checksum)
+    os.close(handle)
+    try:
+        return document.save_to_file(filepath)
+    except:
+        cleanup(filepath)
+        raise
+
+
 def cleanup(filename):
     """
     Tries to remove the given filename. Ignores non-existent files
@@ -130,12 +151,160 @@ def convert_office_document(input_filepath):
     return None
 
 
+def get_render_cache_key(checksum, **kwargs):
+    """
+    Return a digest uniquely identifying a rendered image of a
+    document's content using all the arguments that affect the output
+    """
+    key_parts = [
+        checksum,
+        kwargs.get('page', DEFAULT_PAGE_INDEX_NUMBER),
+        kwargs.get('size'),
+        kwargs.get('zoom', DEFAULT_ZOOM_LEVEL),
+        kwargs.get('rotation', DEFAULT_ROTATION),
+        kwargs.get('extra_options', u''),
+        kwargs.get('quality', QUALITY_DEFAULT),
+        kwargs.get('file_format', DEFAULT_FILE_FORMAT),
+    ]
+    return hashlib.sha1(u'|'.join([unicode(part) for part in key_parts]).encode('utf-8')).hexdigest()
+
+
+def get_render_cache_filepath(key, file_format=DEFAULT_FILE_FORMAT):
+    """
+    Return the path of a rendered image in the cache directory, files
+    are spread in two levels of subdirectories to keep directories small
+    """
+    directory = os.path.join(RENDER_CACHE_DIRECTORY, key[0:2], key[2:4])
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # Created concurrently by another process
+            pass
+    return os.path.join(directory, os.extsep.join([key, file_format]))
+
+
+def get_cached_document_image(document, **kwargs):
+    """
+    Return the path to a previously rendered image of a document or
+    None if it is not in the render cache
+    """
+    return CachedImage.objects.lookup(get_render_cache_key(document.checksum, **kwargs))
+
+
 def convert_document(document, *args, **kwargs):
-    document_filepath = create_image_cache_filename(document.checksum, *args, **kwargs)
-    if os.path.exists(document_filepath):
-        return document_filepath
+    key = get_render_cache_key(document.checksum, **kwargs)
+    cached_filepath = CachedImage.objects.lookup(key)
+    if cached_filepath:
+        return cached_filepath
+
+    output_filepath = get_render_cache_filepath(key, kwargs.get('file_format', DEFAULT_FILE_FORMAT))
+    input_filepath = document_save_to_unique_file(document)
+    try:
+        result = convert(input_filepath, output_filepath=output_filepath, *args, **kwargs)
+    finally:
+        # convert doesn't remove the input when the output exists already
+        cleanup(input_filepath)
+    CachedImage.objects.register(key, result)
+    return result
+
+
+def get_resize_rotate_arguments(size, zoom=DEFAULT_ZOOM_LEVEL, rotation=DEFAULT_ROTATION):
+    arguments = u' -resize %s' % size
+    if zoom != 100:
+        arguments += u' -resize %d%% ' % zoom
+
+    if rotation != 0 and rotation != 360:
+        arguments += u' -rotate %d ' % rotation
 
-    return convert(document_save_to_temp_dir(document, document.checksum), *args, **kwargs)
+    return arguments
+
+
+def convert_document_pages(document, page_list=None, *args, **kwargs):
+    """
+    Render many pages of a document into the render cache opening the
+    document only once, pages sharing the same transformations are
+    rasterized by a single backend invocation.  Return a dictionary of
+    page numbers and rendered image file paths
+    """
+    if page_list is None:
+        page_list = document.documentpage_set.all()
+
+    results = {}
+    pending = {}
+    for document_page in page_list:
+        transformation_string, warnings = document_page.get_transformation_string()
+        page_arguments = kwargs.copy()
+        page_arguments.update({
+            'page': document_page.page_number - 1,
+            'extra_options': transformation_string
+        })
+        key = get_render_cache_key(document.checksum, **page_arguments)
+        cached_filepath = CachedImage.objects.lookup(key)
+        if cached_filepath:
+            results[document_page.page_number] = cached_filepath
+        else:
+            pending.setdefault(transformation_string, []).append((document_page.page_number, key))
+
+    if not pending:
+        return results
+
+    input_filepath = document_save_to_unique_file(document)
+    unoconv_output = None
+    path, extension = os.path.splitext(document.get_fullname())
+    if extension[1:].lower() in CONVERTER_OFFICE_FILE_EXTENSIONS:
+        unoconv_output = convert_office_document(input_filepath)
+
+    try:
+        for transformation_string, page_entries in pending.items():
+            if unoconv_output:
+                results.update(_convert_pages(unoconv_output, page_entries, u'', *args, **kwargs))
+            else:
+                results.update(_convert_pages(input_filepath, page_entries, transformation_string, *args, **kwargs))
+    finally:
+        cleanup(input_filepath)
+        if unoconv_output:
+            cleanup(unoconv_output)
+
+    return results
+
+
+def _convert_pages(input_filepath, page_entries, extra_options, *args, **kwargs):
+    """
+    Rasterize a list of (page number, cache key) entries from an input
+    file with a single backend call and store the output in the
+    render cache
+    """
+    file_format = kwargs.get('file_format', DEFAULT_FILE_FORMAT)
+    quality = kwargs.get('quality', QUALITY_DEFAULT)
+
+    input_arg = u'%s[%s]' % (input_filepath, u','.join([unicode(page_number - 1) for page_number, key in page_entries]))
+    arguments = extra_options + get_resize_rotate_arguments(
+        kwargs.get('size'),
+        kwargs.get('zoom', DEFAULT_ZOOM_LEVEL),
+        kwargs.get('rotation', DEFAULT_ROTATION)
+    )
+    # Write each frame to it's own file
+    arguments += u' +adjoin'
+
+    results = {}
+    output_directory = tempfile.mkdtemp(dir=TEMPORARY_DIRECTORY)
+    try:
+        output_template = os.path.join(output_directory, os.extsep.join([u'page-%d', file_format]))
+        backend.execute_convert(input_filepath=input_arg, arguments=arguments, output_filepath=u'%s:%s' % (file_format, output_template), quality=quality)
+
+        # Output frames are numbered sequentially in the order requested
+        for index, (page_number, key) in enumerate(page_entries):
+            frame_filepath = output_template % index
+            if os.path.exists(frame_filepath):
+                cache_filepath = get_render_cache_filepath(key, file_format)
+                shutil.move(frame_filepath, cache_filepath)
+                CachedImage.objects.register(key, cache_filepath)
+                results[page_number] = cache_filepath
+    finally:
+        shutil.rmtree(output_directory, ignore_errors=True)
+
+    return results
 
 
 def convert(input_filepath, *args, **kwargs):
@@ -148,9 +317,12 @@ def convert(input_filepath, *args, **kwargs):
     cleanup_files = kwargs.get('cleanup_files', True)
     quality = kwargs.get('quality', QUALITY_DEFAULT)
 
+    output_filepath = kwargs.pop('output_filepath', None)
+
     unoconv_output = None
 
-    output_filepath = create_image_cache_filename(input_filepath, *args, **kwargs)
+    if not output_filepath:
+        output_filepath = create_image_cache_filename(input_filepath, *args, **kwargs)
     if os.path.exists(output_filepath):
         return output_filepath
 
@@ -163,12 +335,7 @@ def convert(input_filepath, *args, **kwargs):
             extra_options = u''
 
     input_arg = u'%s[%s]' % (input_filepath, page)
-    extra_options += u' -resize %s' % size
-    if zoom != 100:
-        extra_options += u' -resize %d%% ' % zoom
-
-    if rotation != 0 and rotation != 360:
-        extra_options += u' -rotate %d ' % rotation
+    extra_options += get_resize_rotate_arguments(size, zoom, rotation)
 
     if format == u'jpg':
         extra_options += u' -quality 85'
@@ -192,21 +359,30 @@ def get_page_count(input_filepath):
 
 
 def get_document_dimensions(document, *args, **kwargs):
-    document_filepath = create_image_cache_filename(document.checksum, *args, **kwargs)
-    if os.path.exists(document_filepath):
+    document_filepath = get_cached_document_image(document, **kwargs)
+    if document_filepath:
         options = [u'-format', u'%w %h']
         return [int(dimension) for dimension in backend.execute_identify(unicode(document_filepath), options).split()]
     else:
         return [0, 0]
 
 
-def convert_document_for_ocr(document, page=DEFAULT_PAGE_INDEX_NUMBER, file_format=DEFAULT_OCR_FILE_FORMAT):
-    #Extract document file
-    input_filepath = document_save_to_temp_dir(document, document.uuid)
+def convert_document_for_ocr(document, page=DEFAULT_PAGE_INDEX_NUMBER, file_format=DEFAULT_OCR_FILE_FORMAT, input_filepath=None, output_directory=TEMPORARY_DIRECTORY):
+    """
+    Rasterize and clean up a document page for OCR, a previously
+    extracted copy of the document's file can be passed as
+    input_filepath to avoid copying it out of storage again
+    """
+    if input_filepath:
+        extracted_filepath = None
+    else:
+        #Extract document file, one copy per page to allow converting
+        #many pages of the same document concurrently
+        input_filepath = extracted_filepath = document_save_to_temp_dir(document, u'%s_%s' % (document.uuid, page))
 
     #Convert for OCR
     temp_filename, separator = os.path.splitext(os.path.basename(input_filepath))
-    temp_path = os.path.join(TEMPORARY_DIRECTORY, temp_filename)
+    temp_path = os.path.join(output_directory, temp_filename)
     transformation_output_file = u'%s_trans%s%s%s' % (temp_path, page, os.extsep, file_format)
     unpaper_input_file = u'%s_unpaper_in%s%spnm' % (temp_path, page, os.extsep)
     unpaper_output_file = u'%s_unpaper_out%s%spnm' % (temp_path, page, os.extsep)
@@ -227,6 +403,8 @@ def convert_document_for_ocr(document, page=DEFAULT_PAGE_INDEX_NUMBER, file_form
         # Convert to tif
         backend.execute_convert(input_filepath=unpaper_output_file, output_filepath=convert_output_file)
     finally:
+        if extracted_filepath:
+            cleanup(extracted_filepath)
         cleanup(transformation_output_file)
         cleanup(unpaper_input_file)
         cleanup(unpaper_output_file)
@@ -0,0 +1,207 @@
+"""
+GraphicsMagick backend that keeps a bounded pool of long lived
+"gm batch" processes and feeds them conversion commands instead of
+spawning a new process for every call
+"""
+import atexit
+import os
+import pipes
+import select
+import subprocess
+import tempfile
+import threading
+import time
+import Queue
+
+from converter.conf.settings import GM_PATH
+from converter.conf.settings import GM_SETTINGS
+from converter.conf.settings import BATCH_POOL_SIZE
+from converter.conf.settings import BATCH_TIMEOUT
+from converter.conf.settings import BATCH_MAX_JOBS
+from converter.api import QUALITY_DEFAULT, QUALITY_SETTINGS
+from converter.exceptions import ConvertError, UnknownFormat, IdentifyError
+from converter.backends.graphicsmagick import get_format_list, \
+    CONVERTER_ERROR_STRING_NO_DECODER, CONVERTER_ERROR_STARTS_WITH
+
+BATCH_RESULT_PASS = 'PASS'
+BATCH_RESULT_FAIL = 'FAIL'
+
+
+class BatchTimeout(ConvertError):
+    """
+    Raised when a batch worker doesn't finish a job in the allotted time
+    """
+    pass
+
+
+class BatchWorker(object):
+    """
+    Wrapper around a single "gm batch" process
+    """
+    def __init__(self):
+        self.jobs = 0
+        self._buffer = ''
+        self.stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            [unicode(GM_PATH), u'batch', u'-escape', u'unix', u'-feedback', u'on', u'-stop-on-error', u'off', u'-'],
+            close_fds=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=self.stderr
+        )
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def terminate(self):
+        try:
+            self.process.stdin.close()
+            if self.is_alive():
+                self.process.kill()
+            self.process.wait()
+        except (OSError, IOError):
+            pass
+        self.stderr.close()
+
+    def _readline(self, deadline):
+        while '\n' not in self._buffer:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise BatchTimeout(u'Batch conversion timed out after %d seconds' % BATCH_TIMEOUT)
+            ready, dummy, dummy = select.select([self.process.stdout], [], [], remaining)
+            if ready:
+                data = os.read(self.process.stdout.fileno(), 4096)
+                if not data:
+                    raise ConvertError(u'Batch conversion process exited unexpectedly')
+                self._buffer += data
+
+        line, self._buffer = self._buffer.split('\n', 1)
+        return line
+
+    def execute(self, command):
+        """
+        Send a command line to the batch process and return a tuple
+        with the result status, the standard output and the error output
+        """
+        self.jobs += 1
+        self.stderr.seek(0, os.SEEK_END)
+        error_offset = self.stderr.tell()
+        line = u' '.join([pipes.quote(unicode(argument)) for argument in command])
+        self.process.stdin.write(line.encode('utf-8') + '\n')
+        self.process.stdin.flush()
+
+        deadline = time.time() + BATCH_TIMEOUT
+        output = []
+        while True:
+            result = self._readline(deadline)
+            if result in (BATCH_RESULT_PASS, BATCH_RESULT_FAIL):
+                break
+            output.append(result)
+
+        self.stderr.seek(error_offset)
+        return result == BATCH_RESULT_PASS, '\n'.join(output), self.stderr.read()
+
+
+class BatchWorkerPool(object):
+    """
+    Bounded pool of batch workers, callers block on the idle worker
+    queue when all the workers are busy
+    """
+    def __init__(self, size=BATCH_POOL_SIZE, max_jobs=BATCH_MAX_JOBS):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.idle = Queue.Queue()
+        self.workers = []
+        self.lock = threading.Lock()
+
+    def _acquire(self):
+        while True:
+            try:
+                return self.idle.get_nowait()
+            except Queue.Empty:
+                pass
+
+            self.lock.acquire()
+            try:
+                if len(self.workers) < self.size:
+                    worker = BatchWorker()
+                    self.workers.append(worker)
+                    return worker
+            finally:
+                self.lock.release()
+
+            try:
+                # Wake up periodically in case a busy worker was discarded
+                return self.idle.get(timeout=1)
+            except Queue.Empty:
+                pass
+
+    def _discard(self, worker):
+        worker.terminate()
+        self.lock.acquire()
+        try:
+            if worker in self.workers:
+                self.workers.remove(worker)
+        finally:
+            self.lock.release()
+
+    def _release(self, worker):
+        if worker.is_alive() and worker.jobs < self.max_jobs:
+            self.idle.put(worker)
+        else:
+            # Recycle workers after too many jobs to contain leaks
+            self._discard(worker)
+
+    def execute(self, command):
+        worker = self._acquire()
+        try:
+            result = worker.execute(command)
+        except:
+            # A worker in an unknown state can't be reused
+            self._discard(worker)
+            raise
+
+        self._release(worker)
+        return result
+
+    def shutdown(self):
+        self.lock.acquire()
+        try:
+            for worker in self.workers:
+                worker.terminate()
+            self.workers = []
+        finally:
+            self.lock.release()
+
+pool = BatchWorkerPool()
+atexit.register(pool.shutdown)
+
+
+def execute_identify(input_filepath, arguments=None):
+    command = []
+    command.append(u'identify')
+    if arguments:
+        command.extend(arguments)
+    command.append(unicode(input_filepath))
+    success, output, errors = pool.execute(command)
+    if not success:
+        raise IdentifyError(errors.splitlines()[0] if errors else u'')
+    return output
+
+
+def execute_convert(input_filepath, output_filepath, quality=QUALITY_DEFAULT, arguments=None):
+    command = []
+    command.append(u'convert')
+    command.extend(unicode(QUALITY_SETTINGS[quality]).split())
+    command.extend(unicode(GM_SETTINGS).split())
+    command.append(unicode(input_filepath))
+    if arguments:
+        command.extend(unicode(arguments).split())
+    command.append(unicode(output_filepath))
+    success, output, errors = pool.execute(command)
+    if not success:
+        #Got an error from convert program
+        error_line = errors.splitlines()[0] if errors else u''
+        if (CONVERTER_ERROR_STRING_NO_DECODER in error_line) or (CONVERTER_ERROR_STARTS_WITH in error_line):
+            #Try to determine from error message which class of error is it
+            raise UnknownFormat
+        else:
+            raise ConvertError(error_line)
@@ -12,12 +12,19 @@ register_settings(
         {'name': u'UNPAPER_PATH', 'global_name': u'CONVERTER_UNPAPER_PATH', 'default': u'/usr/bin/unpaper', 'description': _(u'File path to unpaper program.'), 'exists': True},
         {'name': u'GM_PATH', 'global_name': u'CONVERTER_GM_PATH', 'default': u'/usr/bin/gm', 'description': _(u'File path to graphicsmagick\'s program.'), 'exists': True},
         {'name': u'GM_SETTINGS', 'global_name': u'CONVERTER_GM_SETTINGS', 'default': u''},
-        {'name': u'GRAPHICS_BACKEND', 'global_name': u'CONVERTER_GRAPHICS_BACKEND', 'default': u'converter.backends.imagemagick', 'description': _(u'Graphics conversion backend to use.  Options are: converter.backends.imagemagick and converter.backends.graphicsmagick.')},
+        {'name': u'GRAPHICS_BACKEND', 'global_name': u'CONVERTER_GRAPHICS_BACKEND', 'default': u'converter.backends.imagemagick', 'description': _(u'Graphics conversion backend to use.  Options are: converter.backends.imagemagick, converter.backends.graphicsmagick and converter.backends.graphicsmagick_batch.')},
+        {'name': u'BATCH_POOL_SIZE', 'global_name': u'CONVERTER_BATCH_POOL_SIZE', 'default': 2, 'description': _(u'Maximum number of persistent conversion processes per server process when using the graphicsmagick_batch backend.')},
+        {'name': u'BATCH_TIMEOUT', 'global_name': u'CONVERTER_BATCH_TIMEOUT', 'default': 120, 'description': _(u'Amount of seconds a persistent conversion process is allowed to spend on a single job before being terminated.')},
+        {'name': u'BATCH_MAX_JOBS', 'global_name': u'CONVERTER_BATCH_MAX_JOBS', 'default': 100, 'description': _(u'Number of jobs after which a persistent conversion process is recycled.')},
         {'name': u'UNOCONV_PATH', 'global_name': u'CONVERTER_UNOCONV_PATH', 'default': u'/usr/bin/unoconv', 'exists': True},
         {'name': u'OCR_OPTIONS', 'global_name': u'CONVERTER_OCR_OPTIONS', 'default': u'-colorspace Gray -depth 8 -resample 200x200'},
         {'name': u'DEFAULT_OPTIONS', 'global_name': u'CONVERTER_DEFAULT_OPTIONS', 'default': u''},
         {'name': u'LOW_QUALITY_OPTIONS', 'global_name': u'CONVERTER_LOW_QUALITY_OPTIONS', 'default': u''},
         {'name': u'HIGH_QUALITY_OPTIONS', 'global_name': u'CONVERTER_HIGH_QUALITY_OPTIONS', 'default': u'-density 400'},
         {'name': u'PRINT_QUALITY_OPTIONS', 'global_name': u'CONVERTER_PRINT_QUALITY_OPTIONS', 'default': u'-density 500'},
+        # Render cache
+        {'name': u'CACHE_DIRECTORY', 'global_name': u'CONVERTER_CACHE_DIRECTORY', 'default': u'', 'description': _(u'Directory where rendered document pages are stored.  If none is specified, a subdirectory of the common temporary directory is used.')},
+        {'name': u'CACHE_MAXIMUM_SIZE', 'global_name': u'CONVERTER_CACHE_MAXIMUM_SIZE', 'default': 512 * 1024 * 1024, 'description': _(u'Maximum size in bytes the rendered page cache is allowed to grow to before evicting entries.')},
+        {'name': u'CACHE_EVICTION_POLICY', 'global_name': u'CONVERTER_CACHE_EVICTION_POLICY', 'default': u'lru', 'description': _(u'Policy used to select rendered pages to remove when the cache is full.  Options are: lru (least recently used) and lfu (least frequently used).')},
     ]
 )
@@ -0,0 +1,31 @@
+from django.utils.translation import ugettext_lazy as _
+
+CACHE_EVICTION_LRU = u'lru'
+CACHE_EVICTION_LFU = u'lfu'
+
+CACHE_EVICTION_CHOICES = (
+    (CACHE_EVICTION_LRU, _(u'least recently used')),
+    (CACHE_EVICTION_LFU, _(u'least frequently used')),
+)
+
+CACHE_COUNTER_HITS = u'hits'
+CACHE_COUNTER_MISSES = u'misses'
+CACHE_COUNTER_EVICTIONS = u'evictions'
+# Running total of the size of the cached images, in bytes
+CACHE_COUNTER_SIZE = u'size'
+
+CACHE_COUNTER_CHOICES = (
+    (CACHE_COUNTER_HITS, _(u'hits')),
+    (CACHE_COUNTER_MISSES, _(u'misses')),
+    (CACHE_COUNTER_EVICTIONS, _(u'evictions')),
+    (CACHE_COUNTER_SIZE, _(u'size')),
+)
+
+# Fraction of the cache size budget to shrink to once eviction kicks in,
+# avoids evicting on every single store when the cache is full
+CACHE_EVICTION_LOW_WATERMARK = 0.9
+
+# Cache hits and misses are counted in memory and written to the database
+# after this many lookups or seconds, whichever comes first
+CACHE_HITS_FLUSH_SIZE = 100
+CACHE_HITS_FLUSH_INTERVAL = 30
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from common.utils import pretty_size
+from converter.api import RENDER_CACHE_DIRECTORY
+from converter.conf.settings import CACHE_MAXIMUM_SIZE
+from converter.conf.settings import CACHE_EVICTION_POLICY
+from converter.literals import CACHE_COUNTER_HITS, CACHE_COUNTER_MISSES, \
+    CACHE_COUNTER_EVICTIONS
+from converter.models import CachedImage, CacheCounter
+
+
+class Command(BaseCommand):
+    help = 'Inspect or clean up the rendered document page cache.'
+    args = '[stats|evict|purge|reset_counters]'
+
+    def handle(self, action=u'stats', *args, **options):
+        if action == u'stats':
+            counters = CacheCounter.objects.get_values()
+            hits = counters.get(CACHE_COUNTER_HITS, 0)
+            misses = counters.get(CACHE_COUNTER_MISSES, 0)
+            lookups = hits + misses
+            print 'Directory: %s' % RENDER_CACHE_DIRECTORY
+            print 'Eviction policy: %s' % CACHE_EVICTION_POLICY
+            print 'Entries: %d' % CachedImage.objects.count()
+            print 'Size: %s of %s' % (pretty_size(CachedImage.objects.get_total_size()), pretty_size(CACHE_MAXIMUM_SIZE))
+            print 'Hits: %d' % hits
+            print 'Misses: %d' % misses
+            print 'Hit ratio: %0.2f%%' % (hits * 100.0 / lookups if lookups else 0)
+            print 'Evictions: %d' % counters.get(CACHE_COUNTER_EVICTIONS, 0)
+        elif action == u'evict':
+            print 'Evicted %d entries.' % CachedImage.objects.evict()
+        elif action == u'purge':
+            print 'Purged %d entries.' % CachedImage.objects.purge()
+        elif action == u'reset_counters':
+            CacheCounter.objects.reset()
+            print 'Counters reset.'
+        else:
+            raise CommandError('Unknown action: %s' % action)
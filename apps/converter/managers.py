@@ -0,0 +1,251 @@
+import os
+import time
+import atexit
+import threading
+from datetime import datetime
+
+from django.db import models
+from django.db.models import F, Sum
+
+from converter.conf.settings import CACHE_MAXIMUM_SIZE
+from converter.conf.settings import CACHE_EVICTION_POLICY
+from converter.literals import CACHE_EVICTION_LFU, \
+    CACHE_COUNTER_HITS, CACHE_COUNTER_MISSES, CACHE_COUNTER_EVICTIONS, \
+    CACHE_COUNTER_SIZE, CACHE_EVICTION_LOW_WATERMARK, \
+    CACHE_HITS_FLUSH_INTERVAL, CACHE_HITS_FLUSH_SIZE
+
+
+class CacheCounterManager(models.Manager):
+    def increment(self, name, amount=1):
+        if not self.model.objects.filter(name=name).update(value=F('value') + amount):
+            counter, created = self.model.objects.get_or_create(name=name)
+            self.model.objects.filter(pk=counter.pk).update(value=F('value') + amount)
+
+    def get_values(self):
+        return dict(self.model.objects.values_list('name', 'value'))
+
+    def reset(self):
+        # The size counter is the running total of the cache's size
+        self.model.objects.exclude(name=CACHE_COUNTER_SIZE).update(value=0)
+
+
+class PendingHits(object):
+    """
+    Cache hits and misses counted in memory and written to the database
+    in batches, every CACHE_HITS_FLUSH_SIZE lookups or
+    CACHE_HITS_FLUSH_INTERVAL seconds, so looking up an image in the
+    cache doesn't write to the database
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = {}
+        self.misses = 0
+        self.count = 0
+        self.last_flush = time.time()
+
+    def add(self, model, pk):
+        self.record(model, pk)
+
+    def add_miss(self, model):
+        self.record(model, None)
+
+    def record(self, model, pk):
+        self.lock.acquire()
+        try:
+            if pk is None:
+                self.misses += 1
+            else:
+                self.hits[pk] = self.hits.get(pk, 0) + 1
+            self.count += 1
+            if self.count < CACHE_HITS_FLUSH_SIZE and time.time() - self.last_flush < CACHE_HITS_FLUSH_INTERVAL:
+                return
+            pending = self.take()
+        finally:
+            self.lock.release()
+
+        self.write(model, *pending)
+
+    def take(self):
+        # Called with the lock held
+        pending = (self.hits, self.misses)
+        self.hits, self.misses, self.count, self.last_flush = {}, 0, 0, time.time()
+        return pending
+
+    def flush(self, model):
+        self.lock.acquire()
+        try:
+            hits, misses = self.take()
+        finally:
+            self.lock.release()
+
+        if hits or misses:
+            self.write(model, hits, misses)
+
+    def write(self, model, hits, misses):
+        from converter.models import CacheCounter
+
+        # One update per distinct amount of hits, most are a single hit
+        by_amount = {}
+        for pk, amount in hits.items():
+            by_amount.setdefault(amount, []).append(pk)
+        now = datetime.now()
+        for amount, pks in by_amount.items():
+            model.objects.filter(pk__in=pks).update(
+                hits=F('hits') + amount, datetime_accessed=now)
+        if hits:
+            CacheCounter.objects.increment(CACHE_COUNTER_HITS, sum(hits.values()))
+        if misses:
+            CacheCounter.objects.increment(CACHE_COUNTER_MISSES, misses)
+
+
+pending_hits = PendingHits()
+
+
+def flush_pending_hits():
+    from converter.models import CachedImage
+
+    try:
+        pending_hits.flush(CachedImage)
+    except Exception:
+        # Database gone at exit, the statistics aren't worth an error
+        pass
+
+# Lookups not written yet when the process exits
+atexit.register(flush_pending_hits)
+
+
+class CachedImageManager(models.Manager):
+    """
+    Keeps the index of the rendered page images stored in the cache
+    directory and enforces the cache size budget
+    """
+    def lookup(self, key):
+        """
+        Return the file path of a cached image or None if it is not in
+        the cache, the hit or miss is recorded by the next flush of the
+        pending hits
+        """
+        from converter.models import CacheCounter
+
+        try:
+            cached_image = self.model.objects.get(key=key)
+        except self.model.DoesNotExist:
+            pending_hits.add_miss(self.model)
+            return None
+
+        if not os.path.exists(cached_image.filepath):
+            # File was removed from under the cache
+            cached_image.delete()
+            CacheCounter.objects.increment(CACHE_COUNTER_SIZE, -cached_image.size)
+            pending_hits.add_miss(self.model)
+            return None
+
+        pending_hits.add(self.model, cached_image.pk)
+        return cached_image.filepath
+
+    def flush_hits(self):
+        """
+        Write the hits and misses counted by this process to the
+        database
+        """
+        pending_hits.flush(self.model)
+
+    def register(self, key, filepath):
+        """
+        Add a freshly rendered image to the cache index and evict
+        entries if the cache grew past its size budget, which is
+        checked against the running total kept in the size counter
+        """
+        from converter.models import CacheCounter
+
+        try:
+            size = os.path.getsize(filepath)
+        except OSError:
+            return None
+
+        total_size = self.get_size_counter()
+        cached_image, created = self.model.objects.get_or_create(key=key,
+            defaults={'filepath': filepath, 'size': size})
+        if created:
+            delta = size
+        else:
+            self.model.objects.filter(pk=cached_image.pk).update(
+                filepath=filepath, size=size,
+                datetime_accessed=datetime.now())
+            delta = size - cached_image.size
+
+        if delta:
+            CacheCounter.objects.increment(CACHE_COUNTER_SIZE, delta)
+            total_size += delta
+
+        if total_size > CACHE_MAXIMUM_SIZE:
+            self.evict(int(CACHE_MAXIMUM_SIZE * CACHE_EVICTION_LOW_WATERMARK))
+
+        return cached_image
+
+    def get_total_size(self):
+        return self.model.objects.aggregate(total=Sum('size'))['total'] or 0
+
+    def evict(self, target_size=CACHE_MAXIMUM_SIZE):
+        """
+        Remove cached images following the configured eviction policy
+        until the total size of the cache is below target_size.  The
+        size counter is set to the actual total afterwards, correcting
+        any drift of the running total
+        """
+        from converter.models import CacheCounter
+
+        # Recent hits count for the eviction order
+        self.flush_hits()
+
+        if CACHE_EVICTION_POLICY == CACHE_EVICTION_LFU:
+            queryset = self.model.objects.order_by('hits', 'datetime_accessed')
+        else:
+            queryset = self.model.objects.order_by('datetime_accessed')
+
+        total_size = self.get_total_size()
+        evicted = 0
+        for cached_image in queryset.iterator():
+            if total_size <= target_size:
+                break
+            total_size -= cached_image.size
+            cached_image.delete()
+            evicted += 1
+
+        if evicted:
+            CacheCounter.objects.increment(CACHE_COUNTER_EVICTIONS, evicted)
+        self.set_size_counter(self.get_total_size())
+
+        return evicted
+
+    def get_size_counter(self):
+        """
+        Return the running total of the cache's size, it is computed
+        once from the cached images if there is none yet
+        """
+        from converter.models import CacheCounter
+
+        try:
+            return CacheCounter.objects.filter(name=CACHE_COUNTER_SIZE).values_list('value', flat=True)[0]
+        except IndexError:
+            total_size = self.get_total_size()
+            self.set_size_counter(total_size)
+            return total_size
+
+    def set_size_counter(self, total_size):
+        from converter.models import CacheCounter
+
+        if not CacheCounter.objects.filter(name=CACHE_COUNTER_SIZE).update(value=total_size):
+            CacheCounter.objects.get_or_create(name=CACHE_COUNTER_SIZE, defaults={'value': total_size})
+
+    def purge(self):
+        """
+        Remove all the images from the cache
+        """
+        count = 0
+        for cached_image in self.model.objects.all().iterator():
+            cached_image.delete()
+            count += 1
+        self.set_size_counter(0)
+
+        return count
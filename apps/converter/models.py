@@ -1,3 +1,51 @@
+import os
+from datetime import datetime
+
 from django.db import models
+from django.utils.translation import ugettext_lazy as _
+
+from converter.literals import CACHE_COUNTER_CHOICES
+from converter.managers import CachedImageManager, CacheCounterManager
+
+
+class CachedImage(models.Model):
+    """
+    Index entry for a rendered document page image stored in the cache
+    directory, keyed by a digest of all the rendering arguments
+    """
+    key = models.CharField(max_length=64, unique=True, verbose_name=_(u'key'))
+    filepath = models.CharField(max_length=255, verbose_name=_(u'file path'))
+    size = models.PositiveIntegerField(default=0, verbose_name=_(u'size'))
+    hits = models.PositiveIntegerField(default=0, verbose_name=_(u'hits'))
+    datetime_created = models.DateTimeField(verbose_name=_(u'date time created'), auto_now_add=True)
+    datetime_accessed = models.DateTimeField(verbose_name=_(u'date time accessed'), default=datetime.now, db_index=True)
+
+    objects = CachedImageManager()
+
+    class Meta:
+        verbose_name = _(u'cached image')
+        verbose_name_plural = _(u'cached images')
+
+    def __unicode__(self):
+        return self.key
+
+    def delete(self, *args, **kwargs):
+        try:
+            os.remove(self.filepath)
+        except OSError:
+            pass
+        super(CachedImage, self).delete(*args, **kwargs)
+
+
+class CacheCounter(models.Model):
+    name = models.CharField(max_length=16, choices=CACHE_COUNTER_CHOICES, unique=True, verbose_name=_(u'name'))
+    value = models.BigIntegerField(default=0, verbose_name=_(u'value'))
+
+    objects = CacheCounterManager()
+
+    class Meta:
+        verbose_name = _(u'cache counter')
+        verbose_name_plural = _(u'cache counters')
 
-# Create your models here.
+    def __unicode__(self):
+        return u'%s: %d' % (self.get_name_display(), self.value)
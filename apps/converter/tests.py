@@ -5,8 +5,18 @@ unittest). These will both pass when you run "manage.py test".
 Replace these with more appropriate tests for your application.
 """
 
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
 from django.test import TestCase
 
+from converter import managers
+from converter.literals import CACHE_COUNTER_SIZE, CACHE_COUNTER_EVICTIONS, \
+    CACHE_EVICTION_LRU, CACHE_EVICTION_LFU
+from converter.models import CachedImage, CacheCounter
+
 class SimpleTest(TestCase):
     def test_basic_addition(self):
         """
@@ -14,6 +24,91 @@ class SimpleTest(TestCase):
         """
         self.failUnlessEqual(1 + 1, 2)
 
+
+
+class RenderCacheTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.maximum_size = managers.CACHE_MAXIMUM_SIZE
+        self.eviction_policy = managers.CACHE_EVICTION_POLICY
+        managers.CACHE_EVICTION_POLICY = CACHE_EVICTION_LRU
+
+    def tearDown(self):
+        managers.CACHE_MAXIMUM_SIZE = self.maximum_size
+        managers.CACHE_EVICTION_POLICY = self.eviction_policy
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def register(self, key, size, age=0):
+        """
+        Store an image of size bytes last accessed age minutes ago
+        """
+        filepath = os.path.join(self.directory, key)
+        image = open(filepath, 'wb')
+        image.write('x' * size)
+        image.close()
+        cached_image = CachedImage.objects.register(key, filepath)
+        CachedImage.objects.filter(key=key).update(datetime_accessed=datetime.now() - timedelta(minutes=age))
+        return cached_image
+
+    def get_size_counter(self):
+        return CacheCounter.objects.get(name=CACHE_COUNTER_SIZE).value
+
+    def get_keys(self):
+        return sorted(CachedImage.objects.values_list('key', flat=True))
+
+    def test_size_counter(self):
+        self.register(u'a', 100)
+        self.register(u'b', 50)
+        self.assertEqual(self.get_size_counter(), 150)
+        self.assertEqual(self.get_size_counter(), CachedImage.objects.get_total_size())
+
+    def test_size_counter_replaced_image(self):
+        self.register(u'a', 100)
+        self.register(u'a', 40)
+        self.assertEqual(self.get_size_counter(), 40)
+
+    def test_size_counter_missing_file(self):
+        self.register(u'a', 100)
+        self.register(u'b', 50)
+        os.remove(os.path.join(self.directory, u'a'))
+        self.assertEqual(CachedImage.objects.lookup(u'a'), None)
+        self.assertEqual(self.get_size_counter(), 50)
+
+    def test_evict_least_recently_used(self):
+        self.register(u'a', 100, age=3)
+        self.register(u'b', 100, age=1)
+        self.register(u'c', 100, age=2)
+        self.assertEqual(CachedImage.objects.evict(150), 2)
+        self.assertEqual(self.get_keys(), [u'b'])
+        self.failIf(os.path.exists(os.path.join(self.directory, u'a')))
+        self.assertEqual(self.get_size_counter(), 100)
+        self.assertEqual(CacheCounter.objects.get(name=CACHE_COUNTER_EVICTIONS).value, 2)
+
+    def test_evict_least_frequently_used(self):
+        managers.CACHE_EVICTION_POLICY = CACHE_EVICTION_LFU
+        self.register(u'a', 100, age=3)
+        self.register(u'b', 100, age=1)
+        CachedImage.objects.filter(key=u'a').update(hits=5)
+        CachedImage.objects.evict(100)
+        self.assertEqual(self.get_keys(), [u'a'])
+
+    def test_register_over_budget(self):
+        managers.CACHE_MAXIMUM_SIZE = 250
+        self.register(u'a', 100, age=2)
+        self.register(u'b', 100, age=1)
+        # Shrinks to the low watermark, below the budget
+        self.register(u'c', 100)
+        self.assertEqual(self.get_keys(), [u'b', u'c'])
+        self.assertEqual(self.get_size_counter(), 200)
+
+    def test_purge(self):
+        self.register(u'a', 100)
+        self.register(u'b', 100)
+        self.assertEqual(CachedImage.objects.purge(), 2)
+        self.assertEqual(self.get_keys(), [])
+        self.assertEqual(self.get_size_counter(), 0)
+
+
 __test__ = {"doctest": """
 Another way to test that 1 + 1 is equal to 2.
 
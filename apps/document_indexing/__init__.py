@@ -1,4 +1,5 @@
 from django.utils.translation import ugettext_lazy as _
+from django.db.models.signals import post_syncdb
 
 from navigation.api import register_top_menu, register_sidebar_template, \
     register_links
@@ -7,7 +8,11 @@ from main.api import register_tool
 from documents.literals import PERMISSION_DOCUMENT_VIEW
 from documents.models import Document
 
-from document_indexing.models import IndexInstance
+from document_indexing import models as document_indexing_models
+from document_indexing.models import IndexInstance, IndexFilename, \
+    IndexInstanceSummary
+# Connect the virtual filesystem's cache invalidation handlers
+import document_indexing.virtual_filesystem
 
 PERMISSION_DOCUMENT_INDEXING_VIEW = {'namespace': 'document_indexing', 'name': 'document_index_view', 'label': _(u'View document indexes')}
 PERMISSION_DOCUMENT_INDEXING_REBUILD_INDEXES = {'namespace': 'document_indexing', 'name': 'document_rebuild_indexes', 'label': _(u'Rebuild document indexes')}
@@ -22,12 +27,35 @@ document_index_list = {'text': _(u'indexes'), 'view': 'document_index_list', 'ar
 
 register_top_menu('indexes', link={'text': _('indexes'), 'famfam': 'folder_page', 'view': 'index_instance_list'}, children_path_regex=[r'^document_indexing'], position=10)
 
-rebuild_index_instances = {'text': _('rebuild indexes'), 'view': 'rebuild_index_instances', 'famfam': 'folder_page', 'permissions': [PERMISSION_DOCUMENT_INDEXING_REBUILD_INDEXES], 'description': _(u'Deletes and creates from scratch all the document indexes.')}
+rebuild_index_instances = {'text': _('rebuild indexes'), 'view': 'rebuild_index_instances', 'famfam': 'folder_page', 'permissions': [PERMISSION_DOCUMENT_INDEXING_REBUILD_INDEXES], 'description': _(u'Deletes and creates from scratch all the document indexes, in the background.')}
+
+index_rebuild_list = {'text': _('index rebuilds'), 'view': 'index_rebuild_list', 'famfam': 'folder_page', 'permissions': [PERMISSION_DOCUMENT_INDEXING_REBUILD_INDEXES]}
 
 register_tool(rebuild_index_instances, namespace='document_indexing', title=_(u'Indexes'))
 
+register_links(['index_rebuild_list'], [rebuild_index_instances], menu_name='sidebar')
+register_links(['rebuild_index_instances'], [index_rebuild_list], menu_name='sidebar')
+
 register_sidebar_template(['index_instance_list'], 'indexing_help.html')
 
 register_links(IndexInstance, [index_parent])
 
 register_links(Document, [document_index_list], menu_name='form_header')
+
+
+def index_filename_table_created(sender, created_models, verbosity=1, **kwargs):
+    if IndexFilename in created_models:
+        if verbosity >= 1:
+            print 'Building the index filename table'
+        IndexFilename.objects.rebuild()
+
+
+def index_instance_summary_table_created(sender, created_models, verbosity=1, **kwargs):
+    if IndexInstanceSummary in created_models:
+        if verbosity >= 1:
+            print 'Building the index instance summary table'
+        IndexInstanceSummary.objects.rebuild()
+
+
+post_syncdb.connect(index_filename_table_created, sender=document_indexing_models, dispatch_uid=u'document_indexing_index_filename_table_created')
+post_syncdb.connect(index_instance_summary_table_created, sender=document_indexing_models, dispatch_uid=u'document_indexing_index_instance_summary_table_created')
@@ -3,7 +3,8 @@ from django.contrib import admin
 from mptt.admin import MPTTModelAdmin
 
 from document_indexing.models import Index, IndexInstance, \
-    DocumentRenameCount
+    DocumentRenameCount, IndexRebuild, IndexFilename, \
+    IndexInstanceSummary
 
 
 class IndexInstanceInline(admin.StackedInline):
@@ -25,3 +26,6 @@ class IndexInstanceAdmin(MPTTModelAdmin):
 admin.site.register(Index, IndexAdmin)
 admin.site.register(IndexInstance, IndexInstanceAdmin)
 admin.site.register(DocumentRenameCount)
+admin.site.register(IndexRebuild)
+admin.site.register(IndexFilename)
+admin.site.register(IndexInstanceSummary)
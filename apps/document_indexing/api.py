@@ -1,3 +1,6 @@
+import datetime
+
+from django.db import transaction
 from django.utils.translation import ugettext_lazy as _
 from django.utils.translation import ugettext
 from django.core.urlresolvers import reverse
@@ -5,17 +8,19 @@ from django.utils.safestring import mark_safe
 from django.template.defaultfilters import slugify
 
 from documents.models import Document
-from metadata.classes import MetadataObject
 
-from document_indexing.models import Index, IndexInstance, \
-    DocumentRenameCount
-from document_indexing.conf.settings import AVAILABLE_INDEXING_FUNCTIONS
+from document_indexing.models import IndexInstance, DocumentRenameCount, \
+    IndexFilename, IndexInstanceSummary
 from document_indexing.conf.settings import MAX_SUFFIX_COUNT
 from document_indexing.filesystem import fs_create_index_directory, \
     fs_create_document_link, fs_delete_document_link, \
-    fs_delete_index_directory, fs_delete_directory_recusive
+    fs_delete_index_directory
 from document_indexing.conf.settings import SLUGIFY_PATHS
-from document_indexing.os_agnostic import assemble_document_filename
+from document_indexing.rebuild import rebuild_indexes
+from document_indexing.evaluation import get_index_tree, \
+    get_document_metadata_dict, evaluate_document_paths
+from document_indexing.literals import INDEXREBUILD_STATE_PROCESSING, \
+    INDEXREBUILD_STATE_DONE, INDEXREBUILD_STATE_ERROR
 
 if SLUGIFY_PATHS == False:
     # Do not slugify path or filenames and extensions
@@ -29,24 +34,51 @@ class MaxSuffixCountReached(Exception):
 
 
 # External functions
+@transaction.commit_on_success
 def update_indexes(document):
     """
-    Update or create all the index instances related to a document
+    Update or create all the index instances related to a document,
+    only the memberships that differ from the current ones are added
+    or removed
     """
     warnings = []
+    index_tree = get_index_tree()
+    paths = evaluate_document_paths(document, get_document_metadata_dict(document), index_tree, warnings)
+    index_nodes = dict([(node.pk, node) for nodes in index_tree.values() for node in nodes])
+
+    # Current memberships and the instances along their paths
+    current_links = {}
+    path_instances = {}
+    index_instances = IndexInstanceSummary.objects.attach(document.indexinstance_set.all())
+    ancestor_ids = set([pk for index_instance in index_instances for pk, value in index_instance.get_path()])
+    instances = IndexInstance.objects.in_bulk(ancestor_ids)
+    for index_instance in index_instances:
+        path = ()
+        for pk, value in index_instance.get_path():
+            path += ((instances[pk].index_id, value),)
+            path_instances[path] = instances[pk]
+        current_links[path] = index_instance
+
+    # Add before removing so that emptied parents shared with a new
+    # path are not deleted
+    for path, link_documents in paths:
+        try:
+            index_instance = _get_path_instance(path, path_instances, index_nodes)
+            if link_documents and path not in current_links:
+                _add_document_to_index_instance(document, index_instance)
+        except Exception, exc:
+            warnings.append(_(u'Error updating document index, expression: %(expression)s; %(exception)s') % {
+                'expression': index_nodes[path[-1][0]].expression, 'exception': exc})
 
-    eval_dict = {}
-    document_metadata_dict = dict([(metadata.metadata_type.name, metadata.value) for metadata in document.documentmetadata_set.all() if metadata.value])
-    eval_dict['document'] = document
-    eval_dict['metadata'] = MetadataObject(document_metadata_dict)
-
-    for root in Index.objects.filter(parent=None):
-        index_warnings = _evaluate_index(eval_dict, document, root)
-        warnings.extend(index_warnings)
+    desired_links = set([path for path, link_documents in paths if link_documents])
+    for path, index_instance in current_links.items():
+        if path not in desired_links:
+            warnings.extend(_remove_document_from_index_instance(document, index_instance))
 
     return warnings
 
 
+@transaction.commit_on_success
 def delete_indexes(document):
     """
     Delete all the index instances related to a document
@@ -96,15 +128,13 @@ def get_breadcrumbs(index_instance, simple=False, single_link=False, include_cou
 
     result.append(get_instance_link(simple=simple))
 
-    for instance in index_instance.get_ancestors():
-        result.append(get_instance_link(instance, simple=simple))
-
-    result.append(get_instance_link(index_instance, simple=simple))
+    for pk, value in index_instance.get_path():
+        result.append(_get_path_link(pk, value, simple=simple))
 
     output = []
 
     if include_count:
-        output.append(u'(%d)' % index_instance.documents.count())
+        output.append(u'(%d)' % index_instance.get_summary().document_count)
 
     if single_link:
         # Return the entire breadcrumb path as a single HTML anchor
@@ -115,70 +145,95 @@ def get_breadcrumbs(index_instance, simple=False, single_link=False, include_cou
         return mark_safe(u' '.join(output))
 
 
-def do_rebuild_all_indexes():
-    fs_delete_directory_recusive()
-    IndexInstance.objects.all().delete()
-    DocumentRenameCount.objects.all().delete()
-    for document in Document.objects.all():
-        update_indexes(document)
+def do_rebuild_all_indexes(progress_callback=None):
+    """
+    Rebuild all the index instances, return a list of warnings
+    """
+    return rebuild_indexes(progress_callback=progress_callback)
 
-    return []  # Warnings - None
+
+def run_index_rebuild(index_rebuild, progress_callback=None):
+    """
+    Rebuild all the index instances recording the progress and the
+    outcome in an IndexRebuild instance
+    """
+    def progress(processed, total):
+        index_rebuild.documents_processed = processed
+        index_rebuild.document_count = total
+        index_rebuild.save()
+        if progress_callback:
+            progress_callback(processed, total)
+
+    index_rebuild.state = INDEXREBUILD_STATE_PROCESSING
+    index_rebuild.document_count = Document.objects.count()
+    index_rebuild.save()
+    try:
+        warnings = do_rebuild_all_indexes(progress_callback=progress)
+    except Exception, exc:
+        index_rebuild.state = INDEXREBUILD_STATE_ERROR
+        index_rebuild.result = unicode(exc)
+    else:
+        index_rebuild.state = INDEXREBUILD_STATE_DONE
+        index_rebuild.result = u'\n'.join([unicode(warning) for warning in warnings])
+    index_rebuild.datetime_finished = datetime.datetime.now()
+    index_rebuild.save()
 
 
 # Internal functions
 def find_lowest_available_suffix(index_instance, document):
-    index_instance_documents = DocumentRenameCount.objects.filter(index_instance=index_instance).filter(document__file_extension=document.file_extension)
-    files_list = []
-    for index_instance_document in index_instance_documents:
-        files_list.append(assemble_document_filename(index_instance_document.document, index_instance_document.suffix))
-
-    for suffix in xrange(MAX_SUFFIX_COUNT):
-        if assemble_document_filename(document, suffix) not in files_list:
-            return suffix
+    """
+    Reserve and return the lowest suffix that gives the document a
+    filename not yet used in the index instance
+    """
+    suffix = IndexFilename.objects.allocate(index_instance, document, MAX_SUFFIX_COUNT)
+    if suffix is None:
+        raise MaxSuffixCountReached(ugettext(u'Maximum suffix (%s) count reached.') % MAX_SUFFIX_COUNT)
 
-    raise MaxSuffixCountReached(ugettext(u'Maximum suffix (%s) count reached.') % MAX_SUFFIX_COUNT)
+    return suffix
 
 
-def _evaluate_index(eval_dict, document, node, parent_index_instance=None):
+def _get_path_link(index_instance_id, value, simple=False):
     """
-    Evaluate an enabled index expression and update or create all the
-    related index instances also recursively calling itself to evaluate
-    all the index's children
+    Same as get_instance_link for an index instance known only by its
+    id and value
     """
-    warnings = []
-    if node.enabled:
-        try:
-            result = eval(node.expression, eval_dict, AVAILABLE_INDEXING_FUNCTIONS)
-            if result:
-                index_instance, created = IndexInstance.objects.get_or_create(index=node, value=result, parent=parent_index_instance)
-                #if created:
-                fs_create_index_directory(index_instance)
-                if node.link_documents:
-                    suffix = find_lowest_available_suffix(index_instance, document)
-                    document_count = DocumentRenameCount(
-                        index_instance=index_instance,
-                        document=document,
-                        suffix=suffix
-                    )
-                    document_count.save()
-
-                    fs_create_document_link(index_instance, document, suffix)
-                    index_instance.documents.add(document)
-
-                for children in node.get_children():
-                    children_warnings = _evaluate_index(
-                        eval_dict, document, children, index_instance
-                    )
-                    warnings.extend(children_warnings)
-
-        except (NameError, AttributeError), exc:
-            warnings.append(_(u'Error in document indexing update expression: %(expression)s; %(exception)s') % {
-                'expression': node.expression, 'exception': exc})
-        except Exception, exc:
-            warnings.append(_(u'Error updating document index, expression: %(expression)s; %(exception)s') % {
-                'expression': node.expression, 'exception': exc})
+    if simple:
+        return value
+    return u'<a href="%(url)s">%(value)s</a>' % {
+        'url': reverse('index_instance_list', args=[index_instance_id]),
+        'value': value
+    }
 
-    return warnings
+
+def _get_path_instance(path, path_instances, index_nodes):
+    """
+    Return the index instance at the end of a path, creating it and
+    any missing ancestor
+    """
+    index_instance = path_instances.get(path)
+    if index_instance is None:
+        parent = _get_path_instance(path[:-1], path_instances, index_nodes) if len(path) > 1 else None
+        index_id, value = path[-1]
+        index_instance, created = IndexInstance.objects.get_or_create(index=index_nodes[index_id], value=value, parent=parent)
+        index_instance._summary = IndexInstanceSummary.objects.create_for_instance(index_instance, parent.get_summary() if parent else None)
+        if created:
+            fs_create_index_directory(index_instance)
+        path_instances[path] = index_instance
+    return index_instance
+
+
+def _add_document_to_index_instance(document, index_instance):
+    suffix = find_lowest_available_suffix(index_instance, document)
+    document_count = DocumentRenameCount(
+        index_instance=index_instance,
+        document=document,
+        suffix=suffix
+    )
+    document_count.save()
+
+    fs_create_document_link(index_instance, document, suffix)
+    index_instance.documents.add(document)
+    IndexInstanceSummary.objects.add_documents(index_instance, 1)
 
 
 def _remove_document_from_index_instance(document, index_instance):
@@ -192,7 +247,9 @@ def _remove_document_from_index_instance(document, index_instance):
         document_rename_count = DocumentRenameCount.objects.get(index_instance=index_instance, document=document)
         fs_delete_document_link(index_instance, document, document_rename_count.suffix)
         document_rename_count.delete()
+        IndexFilename.objects.release(index_instance, document)
         index_instance.documents.remove(document)
+        IndexInstanceSummary.objects.add_documents(index_instance, -1)
         if index_instance.documents.count() == 0 and index_instance.get_children().count() == 0:
             # if there are no more documents and no children, delete
             # node and check parent for the same conditions
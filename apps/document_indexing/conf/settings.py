@@ -1,4 +1,7 @@
 """Configuration options for the document_indexing app"""
+import multiprocessing
+
+from django.utils.translation import ugettext_lazy as _
 
 from common.utils import proper_name
 from smart_settings.api import register_settings
@@ -16,8 +19,12 @@ register_settings(
         {'name': u'SUFFIX_SEPARATOR', 'global_name': u'DOCUMENT_INDEXING_SUFFIX_SEPARATOR', 'default': u'_'},
         # Filesystem serving
         {'name': u'SLUGIFY_PATHS', 'global_name': u'DOCUMENT_INDEXING_FILESYSTEM_SLUGIFY_PATHS', 'default': False},
+        {'name': u'REBUILD_CONCURRENT_PROCESSES', 'global_name': u'DOCUMENT_INDEXING_REBUILD_CONCURRENT_PROCESSES', 'default': multiprocessing.cpu_count(), 'description': _(u'Number of worker processes evaluating index expressions during a rebuild.')},
         {'name': u'MAX_SUFFIX_COUNT', 'global_name': u'DOCUMENT_INDEXING_FILESYSTEM_MAX_SUFFIX_COUNT', 'default': 1000},
         {'name': u'FILESERVING_PATH', 'global_name': u'DOCUMENT_INDEXING_FILESYSTEM_FILESERVING_PATH', 'default': u'/tmp/mayan/documents', 'exists': True},
-        {'name': u'FILESERVING_ENABLE', 'global_name': u'DOCUMENT_INDEXING_FILESYSTEM_FILESERVING_ENABLE', 'default': True}
+        {'name': u'FILESERVING_ENABLE', 'global_name': u'DOCUMENT_INDEXING_FILESYSTEM_FILESERVING_ENABLE', 'default': True, 'description': _(u'Mirror the indexes as directories and symbolic links under the fileserving path.  Not needed to access the indexes with WebDAV.')},
+        # Virtual filesystem
+        {'name': u'VIRTUAL_FILESYSTEM_CACHE_URI', 'global_name': u'DOCUMENT_INDEXING_VIRTUAL_FILESYSTEM_CACHE_URI', 'default': None, 'description': _(u'URI of a cache shared by every process, used to remember the index directory listings served over WebDAV, i.e.: memcached://127.0.0.1:11211/.  When not set each process keeps its own.')},
+        {'name': u'VIRTUAL_FILESYSTEM_CACHE_TIMEOUT', 'global_name': u'DOCUMENT_INDEXING_VIRTUAL_FILESYSTEM_CACHE_TIMEOUT', 'default': 60, 'description': _(u'Number of seconds the index directory listings served over WebDAV are cached.')},
     ]
 )
@@ -0,0 +1,68 @@
+from django.utils.translation import ugettext as _
+
+from common.expressions import evaluate_expression
+from metadata.classes import MetadataObject
+
+from document_indexing.models import Index, IndexInstance
+from document_indexing.conf.settings import AVAILABLE_INDEXING_FUNCTIONS
+
+
+def get_index_tree():
+    """
+    Return a dictionary mapping each index node's parent id to its
+    children, loading the whole index definition with a single query
+    """
+    opts = Index._mptt_meta
+    children = {}
+    for node in Index.objects.order_by(opts.tree_id_attr, opts.left_attr):
+        children.setdefault(node.parent_id, []).append(node)
+    return children
+
+
+def get_document_metadata_dict(document):
+    return dict([(metadata.metadata_type.name, metadata.value) for metadata in document.documentmetadata_set.all() if metadata.value])
+
+
+def evaluate_document_paths(document, metadata_dict, index_tree, warnings):
+    """
+    Evaluate every enabled index expression for a document and return
+    a list of (path, link_documents) tuples, one per index instance the
+    document belongs to, where path is a tuple of (index id, value)
+    pairs from the root of the tree
+    """
+    eval_dict = {
+        'document': document,
+        'metadata': MetadataObject(metadata_dict)
+    }
+    paths = []
+    max_length = IndexInstance._meta.get_field('value').max_length
+
+    def _evaluate(node, parent_path):
+        if not node.enabled:
+            return
+
+        try:
+            result = evaluate_expression(node.expression, eval_dict, AVAILABLE_INDEXING_FUNCTIONS)
+        except (NameError, AttributeError), exc:
+            warnings.append(_(u'Error in document indexing update expression: %(expression)s; %(exception)s') % {
+                'expression': node.expression, 'exception': exc})
+        except Exception, exc:
+            warnings.append(_(u'Error updating document index, expression: %(expression)s; %(exception)s') % {
+                'expression': node.expression, 'exception': exc})
+        else:
+            if result:
+                value = unicode(result)
+                if len(value) > max_length:
+                    # Would not fit the index instance's value column
+                    warnings.append(_(u'Document indexing expression: %(expression)s; result longer than %(max_length)d characters: %(value)s') % {
+                        'expression': node.expression, 'max_length': max_length, 'value': value})
+                    return
+                path = parent_path + ((node.pk, value),)
+                paths.append((path, node.link_documents))
+                for child in index_tree.get(node.pk, []):
+                    _evaluate(child, path)
+
+    for root in index_tree.get(None, []):
+        _evaluate(root, ())
+
+    return paths
@@ -1,5 +1,6 @@
 import errno
 import os
+import shutil
 
 from django.utils.translation import ugettext_lazy as _
 
@@ -13,13 +14,7 @@ def get_instance_path(index_instance):
     Return a platform formated filesytem path corresponding to an
     index instance
     """
-    names = []
-    for ancestor in index_instance.get_ancestors():
-        names.append(ancestor.value)
-
-    names.append(index_instance.value)
-
-    return os.sep.join(names)
+    return os.sep.join([value for pk, value in index_instance.get_path()])
 
 
 def fs_create_index_directory(index_instance):
@@ -90,3 +85,44 @@ def fs_delete_directory_recusive(path=FILESERVING_PATH):
                 os.unlink(os.path.join(dirpath, filename))
             for dirname in dirnames:
                 os.rmdir(os.path.join(dirpath, dirname))
+
+
+def fs_replace_tree(directories, links):
+    """
+    Build a new mirror from a list of relative directory paths and of
+    (relative link path, link target) tuples next to the current one,
+    which stays in place until both are swapped
+    """
+    if FILESERVING_ENABLE:
+        base_path = FILESERVING_PATH.rstrip(os.sep)
+        staging_path = u'%s.rebuild' % base_path
+        previous_path = u'%s.previous' % base_path
+        for path in (staging_path, previous_path):
+            if os.path.exists(path):
+                shutil.rmtree(path)
+
+        try:
+            os.mkdir(staging_path)
+            for directory in directories:
+                os.mkdir(os.path.join(staging_path, directory))
+            for link, target in links:
+                os.symlink(target, os.path.join(staging_path, link))
+        except OSError, exc:
+            raise Exception(_(u'Unable to create indexing directory; %s') % exc)
+
+        if not os.path.exists(base_path):
+            os.rename(staging_path, base_path)
+            return
+
+        try:
+            os.rename(base_path, previous_path)
+        except OSError:
+            # The serving path can't be moved, i.e.: a mount point,
+            # empty it and move the new contents inside
+            fs_delete_directory_recusive(base_path)
+            for name in os.listdir(staging_path):
+                os.rename(os.path.join(staging_path, name), os.path.join(base_path, name))
+            os.rmdir(staging_path)
+        else:
+            os.rename(staging_path, base_path)
+            shutil.rmtree(previous_path)
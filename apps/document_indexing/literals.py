@@ -0,0 +1,19 @@
+from django.utils.translation import ugettext_lazy as _
+
+INDEXREBUILD_STATE_PENDING = 'p'
+INDEXREBUILD_STATE_PROCESSING = 'i'
+INDEXREBUILD_STATE_DONE = 'd'
+INDEXREBUILD_STATE_ERROR = 'e'
+
+INDEXREBUILD_STATE_CHOICES = (
+    (INDEXREBUILD_STATE_PENDING, _(u'pending')),
+    (INDEXREBUILD_STATE_PROCESSING, _(u'processing')),
+    (INDEXREBUILD_STATE_DONE, _(u'done')),
+    (INDEXREBUILD_STATE_ERROR, _(u'error')),
+)
+
+# Number of documents evaluated by a worker process at a time
+REBUILD_EVALUATION_BATCH_SIZE = 200
+
+# Number of rows written per bulk insert statement
+REBUILD_INSERT_BATCH_SIZE = 1000
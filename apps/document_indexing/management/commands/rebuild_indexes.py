@@ -0,0 +1,23 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from document_indexing.models import IndexRebuild
+from document_indexing.api import run_index_rebuild
+from document_indexing.literals import INDEXREBUILD_STATE_ERROR
+
+
+class Command(BaseCommand):
+    help = 'Delete and create from scratch all the document indexes.'
+
+    def handle(self, *args, **options):
+        def progress(processed, total):
+            sys.stdout.write('\rDocuments evaluated: %d of %d' % (processed, total))
+            sys.stdout.flush()
+
+        index_rebuild = IndexRebuild.objects.create()
+        run_index_rebuild(index_rebuild, progress_callback=progress)
+        print
+        if index_rebuild.state == INDEXREBUILD_STATE_ERROR:
+            raise CommandError(index_rebuild.result)
+        print index_rebuild.result or 'Index rebuild completed successfully.'
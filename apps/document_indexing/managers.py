@@ -0,0 +1,175 @@
+import hashlib
+
+from django.db import models, connection, transaction, IntegrityError
+from django.db.models import F, Count
+from django.utils import simplejson
+from django.utils.encoding import smart_str
+
+from common.utils import insert_rows
+
+from document_indexing.os_agnostic import assemble_suffixed_filename, \
+    split_suffixed_filename
+
+
+def get_filename_checksum(filename):
+    return hashlib.sha1(smart_str(filename)).hexdigest()
+
+
+class IndexFilenameManager(models.Manager):
+    # Columns of the rows returned by get_row_values
+    row_fields = ('index_instance', 'document', 'filename', 'filename_checksum', 'extension', 'suffix')
+
+    def get_lowest_free_suffix(self, index_instance, filename, extension):
+        """
+        Return the lowest suffix above 0 not taken by a name assembled
+        from filename, in a single query using the unique index
+        """
+        qn = connection.ops.quote_name
+        opts = self.model._meta
+        columns = {
+            'table': qn(opts.db_table),
+            'index_instance': qn(opts.get_field('index_instance').column),
+            'extension': qn(opts.get_field('extension').column),
+            'filename_checksum': qn(opts.get_field('filename_checksum').column),
+            'suffix': qn(opts.get_field('suffix').column),
+        }
+        family = u'%(index_instance)s = %%s AND %(extension)s = %%s AND %(filename_checksum)s = %%s'
+
+        # Either 1 is free or the lowest taken suffix not followed by
+        # another taken one ends the first run of taken suffixes
+        sql = (
+            u'SELECT CASE WHEN NOT EXISTS (SELECT 1 FROM %(table)s WHERE ' + family + u' AND %(suffix)s = 1) '
+            u'THEN 1 ELSE (SELECT MIN(taken.%(suffix)s) + 1 FROM %(table)s taken WHERE '
+            u'taken.%(index_instance)s = %%s AND taken.%(extension)s = %%s AND taken.%(filename_checksum)s = %%s '
+            u'AND NOT EXISTS (SELECT 1 FROM %(table)s following '
+            u'WHERE following.%(index_instance)s = taken.%(index_instance)s '
+            u'AND following.%(extension)s = taken.%(extension)s '
+            u'AND following.%(filename_checksum)s = taken.%(filename_checksum)s '
+            u'AND following.%(suffix)s = taken.%(suffix)s + 1)) END'
+        ) % columns
+
+        params = [index_instance.pk, extension, get_filename_checksum(filename)]
+        cursor = connection.cursor()
+        cursor.execute(sql, params + params)
+        return int(cursor.fetchone()[0])
+
+    def _claim(self, index_instance, document, filename, suffix):
+        """
+        Insert the row for a name, return False if it is already taken
+        """
+        savepoint_id = transaction.savepoint()
+        try:
+            self.model.objects.create(index_instance=index_instance, document=document, filename=filename, filename_checksum=get_filename_checksum(filename), extension=document.file_extension, suffix=suffix)
+        except IntegrityError:
+            transaction.savepoint_rollback(savepoint_id)
+            return False
+        else:
+            transaction.savepoint_commit(savepoint_id)
+            return True
+
+    def allocate(self, index_instance, document, max_suffix_count):
+        """
+        Reserve the lowest suffix giving the document a filename not
+        used by another document of the same extension in the index
+        instance, return the suffix or None if none is left.  The
+        unique index decides between concurrent allocations, a loser
+        looks up the next free suffix again
+        """
+        filename, suffix = split_suffixed_filename(document.file_filename)
+        if self._claim(index_instance, document, filename, suffix):
+            return 0
+
+        while True:
+            suffix = self.get_lowest_free_suffix(index_instance, document.file_filename, document.file_extension)
+            if suffix >= max_suffix_count:
+                return None
+            if self._claim(index_instance, document, document.file_filename, suffix):
+                return suffix
+
+    def release(self, index_instance, document):
+        self.model.objects.filter(index_instance=index_instance, document=document).delete()
+
+    def get_row_values(self, index_instance_id, document_id, filename, extension, suffix):
+        """
+        Return the column values of the row reserving a document
+        filename, for bulk inserts
+        """
+        filename, suffix = split_suffixed_filename(assemble_suffixed_filename(filename, suffix))
+        return (index_instance_id, document_id, filename, get_filename_checksum(filename), extension, suffix)
+
+    @transaction.commit_on_success
+    def rebuild(self):
+        """
+        Recreate every row from the stored document suffixes
+        """
+        from document_indexing.models import DocumentRenameCount
+
+        self.model.objects.all().delete()
+        opts = self.model._meta
+        rows = {}
+        for values in DocumentRenameCount.objects.values_list('index_instance', 'document', 'document__file_filename', 'document__file_extension', 'suffix').iterator():
+            row = self.get_row_values(*values)
+            # Names that already collided keep the first document
+            rows.setdefault((row[0], row[4], row[3], row[5]), row)
+
+        insert_rows(connection.cursor(), opts.db_table, [opts.get_field(name).column for name in self.row_fields], rows.values())
+        return len(rows)
+
+
+class IndexInstanceSummaryManager(models.Manager):
+    def create_for_instance(self, index_instance, parent_summary=None):
+        """
+        Store the summary of an index instance, computing its path from
+        the one of its parent
+        """
+        if index_instance.parent_id:
+            if parent_summary is None:
+                parent_summary = self.get_for_instance(index_instance.parent)
+            path = parent_summary.get_path()
+        else:
+            path = []
+        path.append((index_instance.pk, index_instance.value))
+
+        summary, created = self.model.objects.get_or_create(index_instance=index_instance, defaults={
+            'document_count': index_instance.documents.count(),
+            'path': simplejson.dumps(path),
+        })
+        return summary
+
+    def get_for_instance(self, index_instance):
+        try:
+            return self.model.objects.get(index_instance=index_instance)
+        except self.model.DoesNotExist:
+            # Instances created before summaries existed
+            return self.create_for_instance(index_instance)
+
+    def attach(self, index_instances):
+        """
+        Load the summaries of several index instances with a single
+        query so their paths and counts can be displayed
+        """
+        index_instances = list(index_instances)
+        summaries = self.model.objects.in_bulk([index_instance.pk for index_instance in index_instances])
+        for index_instance in index_instances:
+            index_instance._summary = summaries.get(index_instance.pk) or self.get_for_instance(index_instance)
+        return index_instances
+
+    def add_documents(self, index_instance, count):
+        self.model.objects.filter(index_instance=index_instance).update(document_count=F('document_count') + count)
+
+    @transaction.commit_on_success
+    def rebuild(self):
+        """
+        Recompute the summary of every index instance
+        """
+        from document_indexing.models import IndexInstance
+
+        self.model.objects.all().delete()
+        mptt_opts = IndexInstance._mptt_meta
+        paths = {}
+        for index_instance in IndexInstance.objects.annotate(document_count=Count('documents')).order_by(mptt_opts.tree_id_attr, mptt_opts.left_attr):
+            path = paths.get(index_instance.parent_id, []) + [(index_instance.pk, index_instance.value)]
+            paths[index_instance.pk] = path
+            self.model.objects.create(index_instance=index_instance, document_count=index_instance.document_count, path=simplejson.dumps(path))
+
+        return len(paths)
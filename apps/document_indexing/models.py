@@ -1,12 +1,18 @@
 from django.db import models
+from django.utils import simplejson
 from django.utils.translation import ugettext_lazy as _
 
 from mptt.models import MPTTModel
 from mptt.fields import TreeForeignKey
 
 from documents.models import Document
+from common.expressions import register_expression_model
 
 from document_indexing.conf.settings import AVAILABLE_INDEXING_FUNCTIONS
+from document_indexing.literals import INDEXREBUILD_STATE_CHOICES, \
+    INDEXREBUILD_STATE_PENDING
+from document_indexing.managers import IndexFilenameManager, \
+    IndexInstanceSummaryManager
 
 available_indexing_functions_string = (_(u'Available functions: %s') % u','.join([u'%s()' % name for name, function in AVAILABLE_INDEXING_FUNCTIONS.items()])) if AVAILABLE_INDEXING_FUNCTIONS else u''
 
@@ -42,11 +48,46 @@ class IndexInstance(MPTTModel):
     def get_document_list_display(self):
         return u', '.join([d.file_filename for d in self.documents.all()])
 
+    def get_summary(self):
+        if not hasattr(self, '_summary'):
+            self._summary = IndexInstanceSummary.objects.get_for_instance(self)
+        return self._summary
+
+    def get_path(self):
+        """
+        Return the (id, value) pairs of the index instances from the
+        root of the tree to this one
+        """
+        return self.get_summary().get_path()
+
     class Meta:
         verbose_name = _(u'index instance')
         verbose_name_plural = _(u'indexes instances')
 
 
+class IndexInstanceSummary(models.Model):
+    """
+    Document count and path of an index instance, maintained by the
+    indexing code so the tree can be displayed and mirrored without
+    per node queries
+    """
+    index_instance = models.OneToOneField(IndexInstance, primary_key=True, related_name='summary', verbose_name=_(u'index instance'))
+    document_count = models.PositiveIntegerField(default=0, verbose_name=_(u'document count'))
+    path = models.TextField(verbose_name=_(u'path'))
+
+    objects = IndexInstanceSummaryManager()
+
+    def __unicode__(self):
+        return u' / '.join([value for pk, value in self.get_path()])
+
+    def get_path(self):
+        return [tuple(pair) for pair in simplejson.loads(self.path)]
+
+    class Meta:
+        verbose_name = _(u'index instance summary')
+        verbose_name_plural = _(u'index instances summaries')
+
+
 class DocumentRenameCount(models.Model):
     index_instance = models.ForeignKey(IndexInstance, verbose_name=_(u'index instance'))
     document = models.ForeignKey(Document, verbose_name=_(u'document'))
@@ -58,3 +99,60 @@ class DocumentRenameCount(models.Model):
     class Meta:
         verbose_name = _(u'document rename count')
         verbose_name_plural = _(u'documents rename count')
+
+
+class IndexFilename(models.Model):
+    """
+    Filename taken by a document in an index instance, stored as the
+    filename and suffix it is assembled from so the unique index can
+    find the lowest free suffix of a filename.  The index is on a
+    checksum of the filename to stay within the key length limits of
+    MySQL
+    """
+    index_instance = models.ForeignKey(IndexInstance, verbose_name=_(u'index instance'))
+    document = models.ForeignKey(Document, verbose_name=_(u'document'))
+    filename = models.CharField(max_length=255, verbose_name=_(u'filename'))
+    filename_checksum = models.CharField(max_length=40, verbose_name=_(u'filename checksum'))
+    extension = models.CharField(max_length=16, verbose_name=_(u'extension'))
+    suffix = models.PositiveIntegerField(verbose_name=_(u'suffix'))
+
+    objects = IndexFilenameManager()
+
+    def __unicode__(self):
+        return u'%s - %s - %s' % (self.index_instance, self.filename, self.suffix)
+
+    class Meta:
+        unique_together = ('index_instance', 'extension', 'filename_checksum', 'suffix')
+        verbose_name = _(u'index filename')
+        verbose_name_plural = _(u'index filenames')
+
+
+class IndexRebuild(models.Model):
+    """
+    Progress and outcome of a rebuild of all the index instances
+    """
+    datetime_submitted = models.DateTimeField(verbose_name=_(u'date time submitted'), auto_now_add=True, db_index=True)
+    datetime_finished = models.DateTimeField(verbose_name=_(u'date time finished'), blank=True, null=True)
+    state = models.CharField(max_length=4,
+        choices=INDEXREBUILD_STATE_CHOICES,
+        default=INDEXREBUILD_STATE_PENDING,
+        verbose_name=_(u'state'))
+    document_count = models.PositiveIntegerField(default=0, verbose_name=_(u'document count'))
+    documents_processed = models.PositiveIntegerField(default=0, verbose_name=_(u'documents processed'))
+    result = models.TextField(blank=True, null=True, verbose_name=_(u'result'))
+
+    class Meta:
+        ordering = ('-datetime_submitted',)
+        verbose_name = _(u'index rebuild')
+        verbose_name_plural = _(u'index rebuilds')
+
+    def __unicode__(self):
+        return unicode(self.datetime_submitted).split('.')[0]
+
+    def get_progress_display(self):
+        if self.document_count:
+            return u'%d%%' % (self.documents_processed * 100 / self.document_count)
+        return u''
+
+
+register_expression_model(Index, ('expression',))
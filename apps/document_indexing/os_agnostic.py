@@ -1,8 +1,25 @@
 from document_indexing.conf.settings import SUFFIX_SEPARATOR
 
 
-def assemble_document_filename(document, suffix=0):
+def assemble_suffixed_filename(filename, suffix=0):
     if suffix:
-        return SUFFIX_SEPARATOR.join([document.file_filename, unicode(suffix)])
+        return SUFFIX_SEPARATOR.join([filename, unicode(suffix)])
+    else:
+        return filename
+
+
+def assemble_document_filename(document, suffix=0):
+    return assemble_suffixed_filename(document.file_filename, suffix)
+
+
+def split_suffixed_filename(filename):
+    """
+    Inverse of assemble_suffixed_filename, return the (filename, suffix)
+    pair a name would be assembled from, so that a document whose own
+    filename ends in a suffix maps to the same pair as a suffixed one
+    """
+    head, separator, tail = filename.rpartition(SUFFIX_SEPARATOR)
+    if separator and head and tail.isdigit() and not tail.startswith(u'0'):
+        return head, int(tail)
     else:
-        return document.file_filename
+        return filename, 0
@@ -0,0 +1,256 @@
+"""
+Rebuild of all the index instances.  Index expressions are evaluated for
+batches of documents by worker processes, the resulting tree is
+assembled in memory and written with bulk inserts in a single
+transaction that replaces the previous index instances, which stay
+readable until it commits.
+"""
+import os
+import multiprocessing
+
+from django.utils import simplejson
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.core.management.color import no_style
+from django.utils.translation import ugettext
+
+from common.utils import insert_rows
+from documents.models import Document
+from metadata.models import DocumentMetadata
+
+from document_indexing.models import IndexInstance, DocumentRenameCount, \
+    IndexFilename, IndexInstanceSummary
+from document_indexing.evaluation import get_index_tree, \
+    evaluate_document_paths
+from document_indexing.filesystem import fs_replace_tree
+from document_indexing.os_agnostic import assemble_suffixed_filename
+from document_indexing.conf.settings import MAX_SUFFIX_COUNT
+from document_indexing.conf.settings import REBUILD_CONCURRENT_PROCESSES
+from document_indexing.conf.settings import FILESERVING_ENABLE
+from document_indexing.virtual_filesystem import invalidate_filesystem
+from document_indexing.literals import REBUILD_EVALUATION_BATCH_SIZE, \
+    REBUILD_INSERT_BATCH_SIZE
+
+
+def evaluate_documents(document_ids):
+    """
+    Evaluate the index expressions for a batch of documents, return
+    plain data so it can be sent back from a worker process
+    """
+    index_tree = get_index_tree()
+    metadata = {}
+    for document_id, name, value in DocumentMetadata.objects.filter(document__in=document_ids).values_list('document', 'metadata_type__name', 'value'):
+        if value:
+            metadata.setdefault(document_id, {})[name] = value
+
+    results = []
+    for document in Document.objects.filter(pk__in=document_ids).order_by('pk'):
+        warnings = []
+        paths = evaluate_document_paths(document, metadata.get(document.pk, {}), index_tree, warnings)
+        file_path = None
+        if FILESERVING_ENABLE:
+            try:
+                file_path = document.file.path
+            except NotImplementedError:
+                # Storage backend without local paths
+                pass
+        results.append({
+            'id': document.pk,
+            'filename': document.file_filename,
+            'extension': document.file_extension,
+            'file_path': file_path,
+            'paths': paths,
+            'warnings': warnings,
+        })
+
+    return results
+
+
+class IndexTreeBuilder(object):
+    """
+    Accumulate the index instances of every document in memory and
+    write them all at once
+    """
+    def __init__(self):
+        self.nodes = {}
+        self.roots = []
+        self.warnings = []
+
+    def get_node(self, path):
+        node = self.nodes.get(path)
+        if node is None:
+            index_id, value = path[-1]
+            node = {
+                'index_id': index_id,
+                'value': value,
+                'children': [],
+                'documents': [],
+                'filenames': set(),
+            }
+            self.nodes[path] = node
+            if len(path) > 1:
+                self.get_node(path[:-1])['children'].append(node)
+            else:
+                self.roots.append(node)
+        return node
+
+    def add_document(self, document):
+        self.warnings.extend(document['warnings'])
+        for path, link_documents in document['paths']:
+            node = self.get_node(path)
+            if link_documents:
+                # Names only collide with documents of the same extension
+                for suffix in xrange(MAX_SUFFIX_COUNT):
+                    filename = assemble_suffixed_filename(document['filename'], suffix)
+                    if (filename, document['extension']) not in node['filenames']:
+                        node['filenames'].add((filename, document['extension']))
+                        node['documents'].append((document, suffix))
+                        break
+                else:
+                    self.warnings.append(ugettext(u'Maximum suffix (%s) count reached.') % MAX_SUFFIX_COUNT)
+
+    def assign_tree_fields(self, first_id):
+        """
+        Number the nodes in preorder and compute the MPTT fields the
+        tree manager would have stored, return the nodes in insertion
+        order, parents before their children, along with the path from
+        the root kept by the instance summaries
+        """
+        ordered = []
+        next_id = [first_id]
+
+        def _walk(node, parent_id, tree_id, level, left, parent_path):
+            node['id'] = next_id[0]
+            next_id[0] += 1
+            node.update({'parent_id': parent_id, 'tree_id': tree_id, 'level': level, 'left': left})
+            node['path'] = parent_path + [(node['id'], node['value'])]
+            ordered.append(node)
+            right = left + 1
+            for child in node['children']:
+                right = _walk(child, node['id'], tree_id, level + 1, right, node['path']) + 1
+            node['right'] = right
+            return right
+
+        for tree_id, root in enumerate(self.roots):
+            _walk(root, None, tree_id + 1, 0, 1, [])
+
+        return ordered
+
+    @transaction.commit_manually
+    def write(self):
+        qn = connection.ops.quote_name
+        opts = IndexInstance._meta
+        mptt_opts = IndexInstance._mptt_meta
+        documents_field = opts.get_field('documents')
+        rename_opts = DocumentRenameCount._meta
+        filename_opts = IndexFilename._meta
+        summary_opts = IndexInstanceSummary._meta
+
+        try:
+            cursor = connection.cursor()
+            # New ids start after the current ones so links to the old
+            # instances don't silently point to different ones
+            first_id = (IndexInstance.objects.aggregate(Max('pk'))['pk__max'] or 0) + 1
+            ordered = self.assign_tree_fields(first_id)
+
+            # Remove the previous index, the parent link is cleared
+            # first for databases checking constraints row by row
+            cursor.execute(u'DELETE FROM %s' % qn(documents_field.m2m_db_table()))
+            cursor.execute(u'DELETE FROM %s' % qn(rename_opts.db_table))
+            cursor.execute(u'DELETE FROM %s' % qn(filename_opts.db_table))
+            cursor.execute(u'DELETE FROM %s' % qn(summary_opts.db_table))
+            cursor.execute(u'UPDATE %s SET %s = NULL' % (qn(opts.db_table), qn(opts.get_field('parent').column)))
+            cursor.execute(u'DELETE FROM %s' % qn(opts.db_table))
+
+            columns = [opts.pk.column, opts.get_field('parent').column, opts.get_field('index').column, opts.get_field('value').column]
+            columns.extend([opts.get_field(getattr(mptt_opts, attr)).column for attr in ('left_attr', 'right_attr', 'tree_id_attr', 'level_attr')])
+            insert_rows(cursor, opts.db_table, columns,
+                [(node['id'], node['parent_id'], node['index_id'], node['value'], node['left'], node['right'], node['tree_id'], node['level']) for node in ordered], REBUILD_INSERT_BATCH_SIZE)
+
+            insert_rows(cursor, documents_field.m2m_db_table(),
+                [documents_field.m2m_column_name(), documents_field.m2m_reverse_name()],
+                [(node['id'], document['id']) for node in ordered for document, suffix in node['documents']], REBUILD_INSERT_BATCH_SIZE)
+
+            insert_rows(cursor, rename_opts.db_table,
+                [rename_opts.get_field('index_instance').column, rename_opts.get_field('document').column, rename_opts.get_field('suffix').column],
+                [(node['id'], document['id'], suffix) for node in ordered for document, suffix in node['documents']], REBUILD_INSERT_BATCH_SIZE)
+
+            insert_rows(cursor, filename_opts.db_table,
+                [filename_opts.get_field(name).column for name in IndexFilename.objects.row_fields],
+                [IndexFilename.objects.get_row_values(node['id'], document['id'], document['filename'], document['extension'], suffix) for node in ordered for document, suffix in node['documents']], REBUILD_INSERT_BATCH_SIZE)
+
+            insert_rows(cursor, summary_opts.db_table,
+                [summary_opts.get_field(name).column for name in ('index_instance', 'document_count', 'path')],
+                [(node['id'], len(node['documents']), simplejson.dumps(node['path'])) for node in ordered], REBUILD_INSERT_BATCH_SIZE)
+
+            for sql in connection.ops.sequence_reset_sql(no_style(), [IndexInstance]):
+                cursor.execute(sql)
+        except:
+            transaction.rollback()
+            raise
+        else:
+            transaction.commit()
+
+        invalidate_filesystem()
+        if FILESERVING_ENABLE:
+            self.write_filesystem(ordered)
+
+    def write_filesystem(self, ordered):
+        directories = []
+        links = []
+        node_paths = {}
+        for node in ordered:
+            path = os.path.join(node_paths[node['parent_id']], node['value']) if node['parent_id'] else node['value']
+            node_paths[node['id']] = path
+            directories.append(path)
+            for document, suffix in node['documents']:
+                if document['file_path']:
+                    filename = os.extsep.join([assemble_suffixed_filename(document['filename'], suffix), document['extension']])
+                    links.append((os.path.join(path, filename), document['file_path']))
+
+        fs_replace_tree(directories, links)
+
+
+def rebuild_indexes(processes=REBUILD_CONCURRENT_PROCESSES, progress_callback=None):
+    """
+    Rebuild every index instance, return the list of warnings.
+    progress_callback is called with the number of documents evaluated
+    and the total after each batch
+    """
+    document_ids = list(Document.objects.order_by('pk').values_list('pk', flat=True))
+    batches = [document_ids[index:index + REBUILD_EVALUATION_BATCH_SIZE] for index in range(0, len(document_ids), REBUILD_EVALUATION_BATCH_SIZE)]
+    builder = IndexTreeBuilder()
+    processed = 0
+
+    # Daemonic processes such as Celery's pool workers can't have
+    # children, evaluate in process there
+    if processes > 1 and len(batches) > 1 and not multiprocessing.current_process().daemon:
+        # Don't share the database connection with the workers
+        connection.close()
+        pool = multiprocessing.Pool(processes)
+        try:
+            # Ordered results keep suffix allocation deterministic
+            results = pool.imap(evaluate_documents, batches)
+            for batch in results:
+                for document in batch:
+                    builder.add_document(document)
+                processed += len(batch)
+                if progress_callback:
+                    progress_callback(processed, len(document_ids))
+        except:
+            pool.terminate()
+            raise
+        else:
+            pool.close()
+        pool.join()
+    else:
+        for batch_ids in batches:
+            for document in evaluate_documents(batch_ids):
+                builder.add_document(document)
+            processed += len(batch_ids)
+            if progress_callback:
+                progress_callback(processed, len(document_ids))
+
+    builder.write()
+    return builder.warnings
@@ -0,0 +1,9 @@
+from celery.decorators import task
+
+from document_indexing.models import IndexRebuild
+from document_indexing.api import run_index_rebuild
+
+
+@task
+def task_rebuild_all_indexes(index_rebuild_id):
+    run_index_rebuild(IndexRebuild.objects.get(pk=index_rebuild_id))
@@ -5,8 +5,21 @@ unittest). These will both pass when you run "manage.py test".
 Replace these with more appropriate tests for your application.
 """
 
+from django.db import models
 from django.test import TestCase
 
+from documents.models import Document
+
+from document_indexing.models import Index, IndexInstance, IndexFilename
+from document_indexing.rebuild import IndexTreeBuilder
+
+
+def create_document(filename, extension=u'pdf'):
+    document = Document(file_filename=filename, file_extension=extension)
+    # Document.save inspects the file, these documents have none
+    models.Model.save(document)
+    return document
+
 class SimpleTest(TestCase):
     def test_basic_addition(self):
         """
@@ -14,6 +27,118 @@ class SimpleTest(TestCase):
         """
         self.failUnlessEqual(1 + 1, 2)
 
+
+
+class IndexFilenameAllocationTest(TestCase):
+    def setUp(self):
+        index = Index.objects.create(expression=u'document.file_extension', link_documents=True)
+        self.index_instance = IndexInstance.objects.create(index=index, value=u'pdf')
+
+    def allocate(self, filename, extension=u'pdf', max_suffix_count=1000):
+        document = create_document(filename, extension)
+        return document, IndexFilename.objects.allocate(self.index_instance, document, max_suffix_count)
+
+    def test_suffixes_in_order(self):
+        self.assertEqual([self.allocate(u'report')[1] for i in range(3)], [0, 1, 2])
+
+    def test_released_suffix_reused(self):
+        self.allocate(u'report')
+        second, suffix = self.allocate(u'report')
+        self.allocate(u'report')
+        IndexFilename.objects.release(self.index_instance, second)
+        self.assertEqual(self.allocate(u'report')[1], 1)
+
+    def test_lowest_gap_reused(self):
+        documents = [self.allocate(u'report')[0] for i in range(5)]
+        IndexFilename.objects.release(self.index_instance, documents[3])
+        IndexFilename.objects.release(self.index_instance, documents[1])
+        self.assertEqual(self.allocate(u'report')[1], 1)
+        self.assertEqual(self.allocate(u'report')[1], 3)
+        self.assertEqual(self.allocate(u'report')[1], 5)
+
+    def test_extensions_dont_collide(self):
+        self.allocate(u'report')
+        self.assertEqual(self.allocate(u'report', u'txt')[1], 0)
+
+    def test_maximum_suffix_count(self):
+        self.allocate(u'report', max_suffix_count=2)
+        self.allocate(u'report', max_suffix_count=2)
+        self.assertEqual(self.allocate(u'report', max_suffix_count=2)[1], None)
+
+    def test_first_claim_split(self):
+        # A document named like a suffixed name takes that suffix of
+        # the unsuffixed name
+        document, suffix = self.allocate(u'report_2')
+        self.assertEqual(suffix, 0)
+        row = IndexFilename.objects.get(document=document)
+        self.assertEqual((row.filename, row.suffix), (u'report', 2))
+
+        self.assertEqual(self.allocate(u'report')[1], 0)
+        self.assertEqual(self.allocate(u'report')[1], 1)
+        # 2 is taken by report_2
+        self.assertEqual(self.allocate(u'report')[1], 3)
+
+    def test_suffixed_name_taken(self):
+        self.allocate(u'report')
+        self.allocate(u'report')
+        # report_1 is the name given to the second report, this one is
+        # suffixed in turn
+        document, suffix = self.allocate(u'report_1')
+        self.assertEqual(suffix, 1)
+        row = IndexFilename.objects.get(document=document)
+        self.assertEqual((row.filename, row.suffix), (u'report_1', 1))
+
+
+class IndexTreeBuilderTest(TestCase):
+    def build(self, documents):
+        builder = IndexTreeBuilder()
+        for document in documents:
+            builder.add_document(document)
+        return builder.assign_tree_fields(10)
+
+    def document(self, document_id, *paths):
+        return {'id': document_id, 'filename': u'report', 'extension': u'pdf', 'file_path': None, 'warnings': [], 'paths': paths}
+
+    def test_tree_fields(self):
+        # A
+        # +- B
+        # |  +- D
+        # +- C
+        # E
+        ordered = self.build([
+            self.document(1, (((1, u'A'), (2, u'B'), (3, u'D')), True), (((1, u'A'), (4, u'C')), True)),
+            self.document(2, (((5, u'E'),), True)),
+        ])
+        fields = [(node['value'], node['id'], node['parent_id'], node['tree_id'], node['level'], node['left'], node['right']) for node in ordered]
+        self.assertEqual(fields, [
+            (u'A', 10, None, 1, 0, 1, 8),
+            (u'B', 11, 10, 1, 1, 2, 5),
+            (u'D', 12, 11, 1, 2, 3, 4),
+            (u'C', 13, 10, 1, 1, 6, 7),
+            (u'E', 14, None, 2, 0, 1, 2),
+        ])
+
+    def test_same_as_tree_manager(self):
+        index = Index.objects.create(expression=u'u"A"')
+        root = IndexInstance.objects.create(index=index, value=u'A')
+        child_b = IndexInstance.objects.create(index=index, value=u'B', parent=root)
+        IndexInstance.objects.create(index=index, value=u'D', parent=child_b)
+        IndexInstance.objects.create(index=index, value=u'C', parent=root)
+        expected = [(instance.value, instance.level, instance.lft, instance.rght) for instance in IndexInstance.objects.order_by('lft')]
+
+        ordered = self.build([
+            self.document(1, (((index.pk, u'A'), (index.pk, u'B'), (index.pk, u'D')), False), (((index.pk, u'A'), (index.pk, u'C')), False)),
+        ])
+        self.assertEqual([(node['value'], node['level'], node['left'], node['right']) for node in ordered], expected)
+
+    def test_colliding_filenames_suffixed(self):
+        ordered = self.build([
+            self.document(1, (((1, u'A'),), True)),
+            self.document(2, (((1, u'A'),), True)),
+        ])
+        self.assertEqual([(document['id'], suffix) for document, suffix in ordered[0]['documents']], [(1, 0), (2, 1)])
+
+
 __test__ = {"doctest": """
 Another way to test that 1 + 1 is equal to 2.
 
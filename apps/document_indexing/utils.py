@@ -1,6 +1,7 @@
 from django.utils.translation import ugettext_lazy as _
 
 from document_indexing.api import get_breadcrumbs
+from document_indexing.models import IndexInstanceSummary
 
 
 def get_document_indexing_subtemplate(document):
@@ -10,7 +11,7 @@ def get_document_indexing_subtemplate(document):
     """
     object_list = []
 
-    for index_instance in document.indexinstance_set.all():
+    for index_instance in IndexInstanceSummary.objects.attach(document.indexinstance_set.all()):
         object_list.append(get_breadcrumbs(index_instance, single_link=True, include_count=True))
 
     return {
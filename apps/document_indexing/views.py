@@ -1,21 +1,38 @@
+import base64
+import time
+
 from django.utils.translation import ugettext_lazy as _
-from django.http import HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect, \
+    HttpResponseForbidden, HttpResponseNotAllowed, Http404
 from django.shortcuts import render_to_response, get_object_or_404
 from django.template import RequestContext
 from django.contrib import messages
 from django.utils.safestring import mark_safe
+from django.core.urlresolvers import reverse
+from django.views.generic.list_detail import object_list
+from django.views.decorators.csrf import csrf_exempt
+from django.contrib.auth import authenticate
+from django.core.exceptions import PermissionDenied
+from django.template.loader import render_to_string
+from django.utils.http import http_date, urlquote
+
+from filetransfers.api import serve_file
 
 from permissions.api import check_permissions
-from documents.literals import PERMISSION_DOCUMENT_VIEW
+from documents.literals import PERMISSION_DOCUMENT_VIEW, \
+    PERMISSION_DOCUMENT_DOWNLOAD
 from documents.models import Document
 
 from document_indexing import PERMISSION_DOCUMENT_INDEXING_VIEW, \
     PERMISSION_DOCUMENT_INDEXING_REBUILD_INDEXES
 
-from document_indexing.models import IndexInstance
-from document_indexing.api import get_breadcrumbs, get_instance_link, \
-    do_rebuild_all_indexes
+from document_indexing.models import IndexInstance, IndexRebuild, \
+    IndexInstanceSummary
+from document_indexing.api import get_breadcrumbs, get_instance_link
+from document_indexing.tasks import task_rebuild_all_indexes
 from document_indexing.widgets import index_instance_item_link
+from document_indexing.virtual_filesystem import resolve_path, \
+    get_directory_entries, PathNotFound, ENTRY_TYPE_DIRECTORY
 
 
 def index_instance_list(request, index_id=None):
@@ -23,13 +40,13 @@ def index_instance_list(request, index_id=None):
 
     if index_id:
         index_instance = get_object_or_404(IndexInstance, pk=index_id)
-        index_instance_list = [index for index in index_instance.get_children().order_by('value')]
+        index_instance_list = IndexInstanceSummary.objects.attach(index_instance.get_children().order_by('value'))
         breadcrumbs = get_breadcrumbs(index_instance)
-        if index_instance.documents.count():
+        if index_instance.get_summary().document_count:
             for document in index_instance.documents.all().order_by('file_filename'):
                 index_instance_list.append(document)
     else:
-        index_instance_list = IndexInstance.objects.filter(parent=None)
+        index_instance_list = IndexInstanceSummary.objects.attach(IndexInstance.objects.filter(parent=None))
         breadcrumbs = get_instance_link()
         index_instance = None
     
@@ -73,15 +90,37 @@ def rebuild_index_instances(request):
         }, context_instance=RequestContext(request))
     else:
         try:
-            warnings = do_rebuild_all_indexes()
-            messages.success(request, _(u'Index rebuild completed successfully.'))
-            for warning in warnings:
-                messages.warning(request, warning)
-
+            # The current indexes remain browsable until the rebuild
+            # job replaces them
+            index_rebuild = IndexRebuild.objects.create()
+            task_rebuild_all_indexes.delay(index_rebuild.pk)
+            messages.success(request, _(u'Index rebuild queued successfully.'))
         except Exception, e:
             messages.error(request, _(u'Index rebuild error: %s') % e)
 
-        return HttpResponseRedirect(next)
+        return HttpResponseRedirect(reverse('index_rebuild_list'))
+
+
+def index_rebuild_list(request):
+    check_permissions(request.user, [PERMISSION_DOCUMENT_INDEXING_REBUILD_INDEXES])
+
+    return object_list(
+        request,
+        queryset=IndexRebuild.objects.all(),
+        template_name='generic_list.html',
+        extra_context={
+            'title': _(u'index rebuilds'),
+            'hide_object': True,
+            'extra_columns': [
+                {'name': _(u'submitted'), 'attribute': lambda x: unicode(x.datetime_submitted).split('.')[0], 'keep_together': True},
+                {'name': _(u'finished'), 'attribute': lambda x: unicode(x.datetime_finished).split('.')[0] if x.datetime_finished else u'', 'keep_together': True},
+                {'name': _(u'state'), 'attribute': lambda x: x.get_state_display()},
+                {'name': _(u'documents'), 'attribute': lambda x: u'%d / %d' % (x.documents_processed, x.document_count)},
+                {'name': _(u'progress'), 'attribute': lambda x: x.get_progress_display()},
+                {'name': _(u'result'), 'attribute': 'result'},
+            ],
+        },
+    )
 
 
 def document_index_list(request, document_id):
@@ -90,7 +129,7 @@ def document_index_list(request, document_id):
    
     object_list = []
 
-    for index_instance in document.indexinstance_set.all():
+    for index_instance in IndexInstanceSummary.objects.attach(document.indexinstance_set.all()):
         object_list.append(get_breadcrumbs(index_instance, single_link=True, include_count=True))
 
 
@@ -100,3 +139,111 @@ def document_index_list(request, document_id):
         'hide_link': True,
         'object': document
     }, context_instance=RequestContext(request))
+
+
+def _get_webdav_user(request):
+    """
+    Return the user of a session or the one of the HTTP basic
+    authentication credentials WebDAV clients send
+    """
+    if request.user.is_authenticated():
+        return request.user
+
+    authorization = request.META.get('HTTP_AUTHORIZATION', u'').split()
+    if len(authorization) == 2 and authorization[0].lower() == 'basic':
+        try:
+            username, password = base64.b64decode(authorization[1]).split(':', 1)
+        except (TypeError, ValueError):
+            return None
+        user = authenticate(username=username, password=password)
+        if user and user.is_active:
+            return user
+
+    return None
+
+
+def _get_webdav_entry_properties(entry, href):
+    properties = {
+        'href': href,
+        'name': entry['name'],
+        'is_directory': entry['type'] == ENTRY_TYPE_DIRECTORY,
+    }
+    if not properties['is_directory']:
+        properties.update({
+            'has_size': entry['size'] is not None,
+            'size': entry['size'],
+            'content_type': entry['content_type'],
+            'modified': http_date(time.mktime(entry['modified'].timetuple())),
+        })
+    return properties
+
+
+@csrf_exempt
+def index_instance_webdav(request, path=u''):
+    """
+    Read only WebDAV access to the index instances and the documents
+    they contain
+    """
+    user = _get_webdav_user(request)
+    if user is None:
+        response = HttpResponse(status=401)
+        response['WWW-Authenticate'] = 'Basic realm="%s"' % _(u'Indexes')
+        return response
+    request.user = user
+
+    try:
+        check_permissions(request.user, [PERMISSION_DOCUMENT_INDEXING_VIEW])
+    except PermissionDenied:
+        return HttpResponseForbidden()
+
+    if request.method == 'OPTIONS':
+        response = HttpResponse()
+        response['DAV'] = '1'
+        response['Allow'] = 'OPTIONS, GET, HEAD, PROPFIND'
+        return response
+
+    try:
+        entry = resolve_path(path)
+    except PathNotFound:
+        raise Http404
+
+    if request.method == 'PROPFIND':
+        href = urlquote(request.path)
+        if entry['type'] == ENTRY_TYPE_DIRECTORY and not href.endswith(u'/'):
+            href += u'/'
+        responses = [_get_webdav_entry_properties(entry, href)]
+        # Depth infinity is answered as depth 1 instead of walking the
+        # whole tree
+        if entry['type'] == ENTRY_TYPE_DIRECTORY and request.META.get('HTTP_DEPTH', 'infinity') != '0':
+            for name, child in sorted(get_directory_entries(entry['id']).items()):
+                child_href = u'%s%s' % (href, urlquote(name))
+                if child['type'] == ENTRY_TYPE_DIRECTORY:
+                    child_href += u'/'
+                responses.append(_get_webdav_entry_properties(child, child_href))
+
+        return HttpResponse(
+            render_to_string('index_instance_webdav_multistatus.xml', {'responses': responses}),
+            status=207, content_type='application/xml; charset=utf-8'
+        )
+    elif request.method in ('GET', 'HEAD'):
+        if entry['type'] == ENTRY_TYPE_DIRECTORY:
+            # Browsers are sent to the regular index pages
+            if entry['id']:
+                return HttpResponseRedirect(reverse('index_instance_list', args=[entry['id']]))
+            else:
+                return HttpResponseRedirect(reverse('index_instance_list'))
+
+        try:
+            check_permissions(request.user, [PERMISSION_DOCUMENT_DOWNLOAD])
+        except PermissionDenied:
+            return HttpResponseForbidden()
+
+        document = get_object_or_404(Document, pk=entry['id'])
+        return serve_file(
+            request,
+            document.file,
+            save_as=u'"%s"' % entry['name'],
+            content_type=entry['content_type']
+        )
+    else:
+        return HttpResponseNotAllowed(['OPTIONS', 'GET', 'HEAD', 'PROPFIND'])
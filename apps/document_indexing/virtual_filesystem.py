@@ -0,0 +1,111 @@
+"""
+Read only view of the index instances as a tree of directories and
+document files, resolved from the database instead of being mirrored
+as directories and symbolic links
+"""
+import os
+import time
+
+from django.core.cache import get_cache, InvalidCacheBackendError
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models.signals import post_save, post_delete
+from django.utils.hashcompat import md5_constructor
+
+from document_indexing.models import IndexInstance, DocumentRenameCount
+from document_indexing.os_agnostic import assemble_document_filename
+from document_indexing.conf.settings import VIRTUAL_FILESYSTEM_CACHE_URI
+from document_indexing.conf.settings import VIRTUAL_FILESYSTEM_CACHE_TIMEOUT
+
+VIRTUAL_FILESYSTEM_VERSION_KEY = u'document_indexing_virtual_filesystem_version'
+
+ENTRY_TYPE_DIRECTORY = u'directory'
+ENTRY_TYPE_FILE = u'file'
+
+if VIRTUAL_FILESYSTEM_CACHE_URI:
+    try:
+        cache_backend = get_cache(VIRTUAL_FILESYSTEM_CACHE_URI)
+    except (ImportError, InvalidCacheBackendError), exc:
+        raise ImproperlyConfigured(u'Invalid DOCUMENT_INDEXING_VIRTUAL_FILESYSTEM_CACHE_URI: %s; %s' % (VIRTUAL_FILESYSTEM_CACHE_URI, exc))
+else:
+    # Per process, changes made by other processes are only seen once
+    # the cached entries time out
+    cache_backend = get_cache('locmem://')
+
+
+class PathNotFound(Exception):
+    pass
+
+
+def get_filesystem_version():
+    version = cache_backend.get(VIRTUAL_FILESYSTEM_VERSION_KEY)
+    if version is None:
+        version = invalidate_filesystem()
+    return version
+
+
+def invalidate_filesystem(*args, **kwargs):
+    """
+    Make every cached directory listing stale, usable as a signal
+    handler
+    """
+    version = u'%f' % time.time()
+    cache_backend.set(VIRTUAL_FILESYSTEM_VERSION_KEY, version)
+    return version
+
+
+def get_directory_entries(index_instance_id=None):
+    """
+    Return the entries of the directory of an index instance, or of the
+    root when no index instance is given, as a dictionary of names to
+    dictionaries describing each entry
+    """
+    cache_key = md5_constructor(u'document_indexing_virtual_filesystem_%s_%s' % (get_filesystem_version(), index_instance_id)).hexdigest()
+    entries = cache_backend.get(cache_key)
+    if entries is not None:
+        return entries
+
+    entries = {}
+    for pk, value in IndexInstance.objects.filter(parent=index_instance_id).values_list('pk', 'value'):
+        entries[value] = {'type': ENTRY_TYPE_DIRECTORY, 'id': pk, 'name': value}
+
+    if index_instance_id:
+        for document_rename_count in DocumentRenameCount.objects.filter(index_instance=index_instance_id).select_related('document'):
+            document = document_rename_count.document
+            name = os.extsep.join([assemble_document_filename(document, document_rename_count.suffix), document.file_extension])
+            try:
+                size = document.file.storage.size(document.file.name)
+            except Exception:
+                # Missing file or storage without size support
+                size = None
+            entries[name] = {
+                'type': ENTRY_TYPE_FILE,
+                'id': document.pk,
+                'name': name,
+                'size': size,
+                'content_type': document.file_mimetype or u'application/octet-stream',
+                'modified': document.date_updated,
+            }
+
+    cache_backend.set(cache_key, entries, VIRTUAL_FILESYSTEM_CACHE_TIMEOUT)
+    return entries
+
+
+def resolve_path(path):
+    """
+    Return the entry found at a slash separated path
+    """
+    entry = {'type': ENTRY_TYPE_DIRECTORY, 'id': None, 'name': u''}
+    for name in [name for name in path.split(u'/') if name]:
+        if entry['type'] != ENTRY_TYPE_DIRECTORY:
+            raise PathNotFound(path)
+        try:
+            entry = get_directory_entries(entry['id'])[name]
+        except KeyError:
+            raise PathNotFound(path)
+
+    return entry
+
+
+for model in (IndexInstance, DocumentRenameCount):
+    post_save.connect(invalidate_filesystem, sender=model, dispatch_uid=u'virtual_filesystem_save_%s' % model.__name__)
+    post_delete.connect(invalidate_filesystem, sender=model, dispatch_uid=u'virtual_filesystem_delete_%s' % model.__name__)
@@ -8,8 +8,11 @@ FOLDER_ICON = u'folder_page'
 def index_instance_item_link(index_instance_item):
     icon = FOLDER_ICON if isinstance(index_instance_item, IndexInstance) else u''
     icon_template = u'<span class="famfam active famfam-%s"></span>' % icon if icon else u''
-    return mark_safe('%(icon_template)s<a href="%(url)s">%(text)s</a>' % {
+    document_count = index_instance_item.get_summary().document_count if isinstance(index_instance_item, IndexInstance) else 0
+    count = u' (%d)' % document_count if document_count else u''
+    return mark_safe('%(icon_template)s<a href="%(url)s">%(text)s</a>%(count)s' % {
         'url': index_instance_item.get_absolute_url(),
         'icon_template': icon_template,
-        'text': index_instance_item
+        'text': index_instance_item,
+        'count': count
     })
@@ -1,6 +1,7 @@
 from django.utils.translation import ugettext_lazy as _
 from django.core.urlresolvers import reverse
 from django.conf import settings
+from django.db.models.signals import post_syncdb
 
 from navigation.api import register_links, register_top_menu, \
     register_model_list_columns, register_multi_item_links, \
@@ -11,8 +12,10 @@ from tags.widgets import get_tags_inline_widget_simple
 from history.api import register_history_type
 from metadata.api import get_metadata_string
 
+from documents import models as documents_models
 from documents.models import Document, DocumentPage, \
-    DocumentPageTransformation, DocumentType, DocumentTypeFilename
+    DocumentPageTransformation, DocumentType, DocumentTypeFilename, \
+    DocumentChecksum
 from documents.staging import StagingFile
 from documents.conf.settings import USE_STAGING_DIRECTORY
 from documents.conf.settings import PER_USER_STAGING_DIRECTORY
@@ -80,6 +83,9 @@ document_preview = {'text': _(u'preview'), 'class': 'fancybox', 'view': 'documen
 document_download = {'text': _(u'download'), 'view': 'document_download', 'args': 'object.id', 'famfam': 'page_save', 'permissions': [PERMISSION_DOCUMENT_DOWNLOAD]}
 document_find_duplicates = {'text': _(u'find duplicates'), 'view': 'document_find_duplicates', 'args': 'object.id', 'famfam': 'page_refresh', 'permissions': [PERMISSION_DOCUMENT_VIEW]}
 document_find_all_duplicates = {'text': _(u'find all duplicates'), 'view': 'document_find_all_duplicates', 'famfam': 'page_refresh', 'permissions': [PERMISSION_DOCUMENT_VIEW], 'description': _(u'Search all the documents\' checksums and return a list of the exact matches.')}
+document_duplicate_scan = {'text': _(u'search duplicates again'), 'view': 'document_duplicate_scan', 'famfam': 'page_refresh', 'permissions': [PERMISSION_DOCUMENT_VIEW]}
+document_duplicate_scan_list = {'text': _(u'duplicate searches'), 'view': 'document_duplicate_scan_list', 'famfam': 'page_refresh', 'permissions': [PERMISSION_DOCUMENT_VIEW]}
+archive_upload_list = {'text': _(u'compressed file uploads'), 'view': 'archive_upload_list', 'famfam': 'page_white_zip', 'permissions': [PERMISSION_DOCUMENT_CREATE]}
 document_clear_transformations = {'text': _(u'clear transformations'), 'view': 'document_clear_transformations', 'args': 'object.id', 'famfam': 'page_paintbrush', 'permissions': [PERMISSION_DOCUMENT_TRANSFORM]}
 document_multiple_clear_transformations = {'text': _(u'clear transformations'), 'view': 'document_multiple_clear_transformations', 'famfam': 'page_paintbrush', 'permissions': [PERMISSION_DOCUMENT_TRANSFORM]}
 document_print = {'text': _(u'print'), 'view': 'document_print', 'args': 'object.id', 'famfam': 'printer', 'permissions': [PERMISSION_DOCUMENT_VIEW]}
@@ -158,6 +164,7 @@ register_links(DocumentPage, [
 register_links(['document_page_view'], [document_page_rotate_left, document_page_rotate_right, document_page_zoom_in, document_page_zoom_out], menu_name='form_header')
 
 # Upload sources
+register_links(['upload_document_from_local', 'upload_document_from_staging', 'upload_document_from_user_staging', 'archive_upload_view'], [archive_upload_list], menu_name='sidebar')
 register_links(['upload_document_from_local', 'upload_document_from_staging', 'upload_document_from_user_staging'], [upload_document_from_local, upload_document_from_staging, upload_document_from_user_staging], menu_name='form_header')
 
 register_links(DocumentPageTransformation, [document_page_transformation_edit, document_page_transformation_delete])
@@ -171,6 +178,8 @@ register_links(StagingFile, [staging_file_preview, staging_file_delete])
 register_diagnostic('documents', _(u'Documents'), document_missing_list)
 
 register_tool(document_find_all_duplicates, namespace='documents', title=_(u'documents'))
+register_links(['document_find_all_duplicates', 'document_duplicate_scan_list'], [document_duplicate_scan], menu_name='sidebar')
+register_links(['document_find_all_duplicates', 'document_duplicate_scan'], [document_duplicate_scan_list], menu_name='sidebar')
 
 
 def document_exists(document):
@@ -209,3 +218,13 @@ register_sidebar_template(['document_type_list'], 'document_types_help.html')
 register_links(Document, [document_view_simple], menu_name='form_header', position=0)
 register_links(Document, [document_view_advanced], menu_name='form_header', position=1)
 register_links(Document, [document_history_view], menu_name='form_header')
+
+
+def document_checksum_table_created(sender, created_models, verbosity=1, **kwargs):
+    if DocumentChecksum in created_models:
+        if verbosity >= 1:
+            print 'Building the document checksum table'
+        DocumentChecksum.objects.rebuild()
+
+
+post_syncdb.connect(document_checksum_table_created, sender=documents_models, dispatch_uid=u'documents_document_checksum_table_created')
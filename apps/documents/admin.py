@@ -4,7 +4,8 @@ from metadata.admin import DocumentMetadataInline
 
 from documents.models import DocumentType, Document, \
     DocumentTypeFilename, DocumentPage, \
-    DocumentPageTransformation, RecentDocument
+    DocumentPageTransformation, RecentDocument, DuplicateScan, \
+    ArchiveUpload, ArchiveMember, BulkImport, BulkImportFile
 
 
 class DocumentTypeFilenameInline(admin.StackedInline):
@@ -51,3 +52,33 @@ admin.site.register(Document, DocumentAdmin)
 admin.site.register(DocumentPageTransformation,
     DocumentPageTransformationAdmin)
 admin.site.register(RecentDocument, RecentDocumentAdmin)
+admin.site.register(DuplicateScan)
+
+
+class ArchiveMemberInline(admin.TabularInline):
+    model = ArchiveMember
+    extra = 0
+    raw_id_fields = ('document',)
+
+
+class ArchiveUploadAdmin(admin.ModelAdmin):
+    inlines = [ArchiveMemberInline]
+    list_display = ('filename', 'user', 'datetime_submitted', 'state', 'member_count', 'done_count', 'error_count')
+
+
+admin.site.register(ArchiveUpload, ArchiveUploadAdmin)
+
+
+class BulkImportAdmin(admin.ModelAdmin):
+    list_display = ('source', 'document_type', 'datetime_started', 'datetime_finished', 'file_count', 'imported_count', 'error_count')
+
+
+class BulkImportFileAdmin(admin.ModelAdmin):
+    list_display = ('path', 'bulk_import', 'state', 'document', 'message')
+    list_filter = ('bulk_import', 'state')
+    raw_id_fields = ('document',)
+    search_fields = ('path',)
+
+
+admin.site.register(BulkImport, BulkImportAdmin)
+admin.site.register(BulkImportFile, BulkImportFileAdmin)
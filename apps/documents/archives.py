@@ -0,0 +1,185 @@
+"""
+Expansion of uploaded compressed files in the background.  The archive
+is spooled to the document storage, which every worker can read, and
+copied to the worker's temporary directory to be expanded.  Its members
+are streamed one at a time into new documents and the metadata, indexes
+and history of each new document are handled by a job of its own
+"""
+import datetime
+import os
+import zipfile
+
+from django.http import QueryDict
+from django.db.models import F
+from django.core.files.uploadedfile import TemporaryUploadedFile
+
+from common import TEMPORARY_DIRECTORY
+from metadata.api import save_metadata_list, decode_metadata_from_url
+from document_indexing.api import update_indexes
+from history.api import create_history
+
+from documents.models import Document, RecentDocument, ArchiveUpload, \
+    ArchiveMember
+from documents.utils import copyfile
+from documents.literals import HISTORY_DOCUMENT_CREATED, \
+    INGEST_CHUNK_SIZE, ARCHIVEUPLOAD_STATE_EXPANDING, \
+    ARCHIVEUPLOAD_STATE_EXPANDED, ARCHIVEUPLOAD_STATE_ERROR, \
+    ARCHIVEMEMBER_STATE_DONE, ARCHIVEMEMBER_STATE_ERROR
+
+
+class ArchiveSpoolError(Exception):
+    pass
+
+
+def get_uploaded_filename(uploaded_file):
+    return getattr(uploaded_file, 'filename', getattr(uploaded_file, 'name', u''))
+
+
+def is_archive(uploaded_file):
+    return get_uploaded_filename(uploaded_file).lower().endswith('zip')
+
+
+def get_spool_storage():
+    return Document._meta.get_field('file').storage
+
+
+def get_archive_path(archive_upload):
+    return os.path.join(TEMPORARY_DIRECTORY, u'archive_upload_%d.zip' % archive_upload.pk)
+
+
+def create_archive_upload(user, uploaded_file, document_type=None, query_string=u''):
+    """
+    Spool an uploaded archive to the document storage and return the
+    ArchiveUpload instance tracking its expansion
+    """
+    archive_upload = ArchiveUpload.objects.create(
+        user=user,
+        document_type=document_type,
+        filename=os.path.basename(get_uploaded_filename(uploaded_file)),
+        query_string=query_string
+    )
+    uploaded_file.seek(0)
+    archive_upload.spool_name = get_spool_storage().save(u'archive_upload_%d.zip' % archive_upload.pk, uploaded_file)
+    archive_upload.save()
+    return archive_upload
+
+
+def fetch_spooled_archive(archive_upload):
+    """
+    Copy a spooled archive from the document storage to the temporary
+    directory, zip files are read out of order
+    """
+    storage = get_spool_storage()
+    if not archive_upload.spool_name or not storage.exists(archive_upload.spool_name):
+        raise ArchiveSpoolError(u'The uploaded archive was not found in the document storage: %s' % archive_upload.spool_name)
+
+    archive_path = get_archive_path(archive_upload)
+    copyfile(storage.open(archive_upload.spool_name), archive_path, INGEST_CHUNK_SIZE)
+    return archive_path
+
+
+def delete_spooled_archive(archive_upload):
+    if archive_upload.spool_name:
+        try:
+            get_spool_storage().delete(archive_upload.spool_name)
+        except Exception:
+            pass
+
+
+def store_archive_member(archive, info, document_type=None):
+    """
+    Create a document from an archive member, copied through a
+    temporary file a chunk at a time
+    """
+    content = TemporaryUploadedFile(info.filename, None, info.file_size, None)
+    try:
+        source = archive.open(info)
+        try:
+            while True:
+                chunk = source.read(INGEST_CHUNK_SIZE)
+                if not chunk:
+                    break
+                content.write(chunk)
+        finally:
+            source.close()
+
+        content.seek(0)
+        document = Document(file=content)
+        if document_type:
+            document.document_type = document_type
+        document.save()
+    finally:
+        content.close()
+
+    return document
+
+
+def expand_archive(archive_upload, member_callback=None):
+    """
+    Store every member of a spooled archive as a document, recording
+    the ones that fail, member_callback is called with the ArchiveMember
+    of each document stored
+    """
+    archive_path = get_archive_path(archive_upload)
+    archive_upload.state = ARCHIVEUPLOAD_STATE_EXPANDING
+    archive_upload.save()
+
+    try:
+        archive = zipfile.ZipFile(fetch_spooled_archive(archive_upload))
+        try:
+            infos = [info for info in archive.infolist() if not info.filename.endswith('/')]
+            archive_upload.member_count = len(infos)
+            archive_upload.save()
+
+            for info in infos:
+                try:
+                    document = store_archive_member(archive, info, archive_upload.document_type)
+                except Exception, exc:
+                    ArchiveMember.objects.create(archive_upload=archive_upload, filename=info.filename, state=ARCHIVEMEMBER_STATE_ERROR, message=unicode(exc))
+                    ArchiveUpload.objects.filter(pk=archive_upload.pk).update(error_count=F('error_count') + 1)
+                else:
+                    archive_member = ArchiveMember.objects.create(archive_upload=archive_upload, filename=info.filename, document=document)
+                    if member_callback:
+                        member_callback(archive_member)
+        finally:
+            archive.close()
+    except Exception, exc:
+        archive_upload.state = ARCHIVEUPLOAD_STATE_ERROR
+        archive_upload.result = unicode(exc)
+    else:
+        archive_upload.state = ARCHIVEUPLOAD_STATE_EXPANDED
+    finally:
+        try:
+            os.remove(archive_path)
+        except OSError:
+            pass
+        delete_spooled_archive(archive_upload)
+
+    # The member jobs update the counters meanwhile, only the fields of
+    # the expansion are written
+    archive_upload.datetime_finished = datetime.datetime.now()
+    ArchiveUpload.objects.filter(pk=archive_upload.pk).update(state=archive_upload.state, result=archive_upload.result, datetime_finished=archive_upload.datetime_finished)
+
+
+def process_archive_member(archive_member):
+    """
+    Do for a document stored from an archive what is done for a single
+    uploaded document
+    """
+    archive_upload = archive_member.archive_upload
+    document = archive_member.document
+    try:
+        RecentDocument.objects.add_document_for_user(archive_upload.user, document)
+        save_metadata_list(decode_metadata_from_url(QueryDict(str(archive_upload.query_string))), document, create=True)
+        warnings = update_indexes(document)
+        create_history(HISTORY_DOCUMENT_CREATED, document, {'user': archive_upload.user})
+    except Exception, exc:
+        archive_member.state = ARCHIVEMEMBER_STATE_ERROR
+        archive_member.message = unicode(exc)
+        counter = 'error_count'
+    else:
+        archive_member.state = ARCHIVEMEMBER_STATE_DONE
+        archive_member.message = u'\n'.join([unicode(warning) for warning in warnings])
+        counter = 'done_count'
+    archive_member.save()
+    ArchiveUpload.objects.filter(pk=archive_upload.pk).update(**{counter: F(counter) + 1})
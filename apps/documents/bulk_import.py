@@ -0,0 +1,281 @@
+"""
+Import of existing archives from the command line.  The files of a
+directory tree or of a CSV manifest are split in batches imported by
+worker processes, each batch in a single transaction along with bulk
+inserts of its metadata and of the journal of the files imported, which
+lets an interrupted import be resumed.  Indexing is left to an index
+rebuild and OCR to the OCR queue.
+
+The files stored by a batch whose transaction doesn't commit are removed
+from the storage again.
+"""
+import csv
+import datetime
+import hashlib
+import os
+import time
+import multiprocessing
+from collections import deque
+
+from django.core.files.base import File
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils.encoding import force_unicode, smart_str
+
+from common.utils import insert_rows
+from metadata.models import MetadataType, DocumentMetadata
+
+from documents.models import Document, DocumentType, BulkImport, \
+    BulkImportFile
+from documents.literals import BULKIMPORTFILE_STATE_DONE, \
+    BULKIMPORTFILE_STATE_ERROR, BULKIMPORT_BATCH_SIZE
+from documents.conf.settings import PREGENERATE_IMAGES
+
+MANIFEST_PATH_COLUMN = u'path'
+MANIFEST_DOCUMENT_TYPE_COLUMN = u'document_type'
+
+
+class BulkImportError(Exception):
+    pass
+
+
+def get_path_checksum(path):
+    return hashlib.sha1(smart_str(path)).hexdigest()
+
+
+def walk_directory(root):
+    """
+    Yield an entry for each file of a directory tree, in the same order
+    every time, hidden files and directories are skipped
+    """
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted([dirname for dirname in dirnames if not dirname.startswith(u'.')])
+        for filename in sorted(filenames):
+            if not filename.startswith(u'.'):
+                yield {'path': os.path.join(dirpath, filename), 'metadata': {}}
+
+
+def read_manifest(manifest_path):
+    """
+    Yield an entry for each row of a UTF-8 CSV manifest.  The path
+    column is relative to the manifest's directory unless absolute, the
+    optional document_type column holds document type names and every
+    other column is named after a metadata type
+    """
+    metadata_types = dict(MetadataType.objects.values_list('name', 'pk'))
+    document_types = dict(DocumentType.objects.values_list('name', 'pk'))
+    base_path = os.path.dirname(os.path.abspath(manifest_path))
+    max_length = DocumentMetadata._meta.get_field('value').max_length
+
+    source = open(manifest_path, 'rb')
+    try:
+        reader = csv.reader(source)
+        try:
+            columns = [column.decode('utf-8').strip() for column in reader.next()]
+        except StopIteration:
+            return
+
+        if MANIFEST_PATH_COLUMN not in columns:
+            raise BulkImportError(u'The manifest has no column named: %s' % MANIFEST_PATH_COLUMN)
+        unknown = [column for column in columns if column not in metadata_types and column not in (MANIFEST_PATH_COLUMN, MANIFEST_DOCUMENT_TYPE_COLUMN)]
+        if unknown:
+            raise BulkImportError(u'Unknown metadata types in the manifest: %s' % u', '.join(unknown))
+
+        for row in reader:
+            row = dict(zip(columns, [value.decode('utf-8') for value in row]))
+            entry = {
+                'path': os.path.join(base_path, row.pop(MANIFEST_PATH_COLUMN, u'')),
+                'metadata': dict([(metadata_types[name], value) for name, value in row.items() if value and name in metadata_types]),
+            }
+            document_type = row.get(MANIFEST_DOCUMENT_TYPE_COLUMN)
+            if document_type:
+                if document_type in document_types:
+                    entry['document_type_id'] = document_types[document_type]
+                else:
+                    entry['error'] = u'Unknown document type: %s' % document_type
+            too_long = [name for name, value in row.items() if name in metadata_types and len(value) > max_length]
+            if too_long:
+                entry['error'] = u'Metadata values longer than %d characters: %s' % (max_length, u', '.join(too_long))
+            yield entry
+    finally:
+        source.close()
+
+
+def delete_stored_files(names):
+    storage = Document._meta.get_field('file').storage
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            # Leaving a file behind is better than hiding the error
+            # that caused the rollback
+            pass
+
+
+def import_file(entry, document_type_id=None):
+    source = open(entry['path'], 'rb')
+    try:
+        document = Document(file=File(source, name=os.path.basename(entry['path'])))
+        document.document_type_id = entry.get('document_type_id', document_type_id)
+        try:
+            # The pregeneration jobs are queued once the batch commits,
+            # they could run before and not find the document
+            document.save(pregenerate_images=False)
+        except:
+            if document.file._committed:
+                # Stored before the error
+                delete_stored_files([document.file.name])
+            raise
+    finally:
+        source.close()
+
+    return document
+
+
+@transaction.commit_manually
+def import_batch(arguments):
+    """
+    Import a batch of entries in a single transaction, return a list of
+    (path, document id or None, error message, size) tuples.  Runs in
+    the worker processes so it only takes and returns plain data
+    """
+    bulk_import_id, document_type_id, entries = arguments
+    results = []
+    journal_rows = []
+    metadata_rows = []
+    stored_names = []
+    try:
+        for entry in entries:
+            size = 0
+            if entry.get('error'):
+                document, message = None, entry['error']
+            else:
+                sid = transaction.savepoint()
+                try:
+                    size = os.path.getsize(entry['path'])
+                    document, message = import_file(entry, document_type_id), u''
+                except Exception, exc:
+                    transaction.savepoint_rollback(sid)
+                    document, message = None, unicode(exc)
+                else:
+                    transaction.savepoint_commit(sid)
+                    stored_names.append(document.file.name)
+
+            document_id = document.pk if document else None
+            state = BULKIMPORTFILE_STATE_DONE if document else BULKIMPORTFILE_STATE_ERROR
+            journal_rows.append((bulk_import_id, force_unicode(entry['path'], errors='replace'), entry['path_checksum'], document_id, state, message))
+            if document:
+                metadata_rows.extend([(document_id, metadata_type_id, value) for metadata_type_id, value in entry['metadata'].items()])
+            results.append((entry['path'], document_id, message, size))
+
+        # Errors of previous runs are replaced
+        BulkImportFile.objects.filter(bulk_import=bulk_import_id, path_checksum__in=[entry['path_checksum'] for entry in entries]).delete()
+        cursor = connection.cursor()
+        insert_rows(cursor, BulkImportFile._meta.db_table, [BulkImportFile._meta.get_field(name).column for name in ('bulk_import', 'path', 'path_checksum', 'document', 'state', 'message')], journal_rows)
+        insert_rows(cursor, DocumentMetadata._meta.db_table, [DocumentMetadata._meta.get_field(name).column for name in ('document', 'metadata_type', 'value')], metadata_rows)
+        transaction.commit()
+    except:
+        transaction.rollback()
+        # The documents of the batch are gone, so are their files
+        delete_stored_files(stored_names)
+        raise
+
+    if PREGENERATE_IMAGES:
+        # Imported here to avoid a circular import with the tasks module
+        from documents.tasks import task_pregenerate_document_images
+        for path, document_id, message, size in results:
+            if document_id:
+                task_pregenerate_document_images.delay(document_id, True)
+
+    return results
+
+
+def get_pending_batches(bulk_import, entries, batch_size, stats):
+    """
+    Split the entries in batches leaving out the files already imported
+    by a previous run
+    """
+    def _pending(batch):
+        imported = set(BulkImportFile.objects.filter(bulk_import=bulk_import, state=BULKIMPORTFILE_STATE_DONE, path_checksum__in=[entry['path_checksum'] for entry in batch]).values_list('path_checksum', flat=True))
+        stats['skipped'] += len(imported)
+        return [entry for entry in batch if entry['path_checksum'] not in imported]
+
+    batch = []
+    for entry in entries:
+        entry['path_checksum'] = get_path_checksum(entry['path'])
+        batch.append(entry)
+        if len(batch) == batch_size:
+            pending = _pending(batch)
+            if pending:
+                yield pending
+            batch = []
+
+    if batch:
+        pending = _pending(batch)
+        if pending:
+            yield pending
+
+
+def update_bulk_import_counts(bulk_import):
+    counts = dict(bulk_import.bulkimportfile_set.values_list('state').annotate(count=Count('pk')).order_by())
+    bulk_import.imported_count = counts.get(BULKIMPORTFILE_STATE_DONE, 0)
+    bulk_import.error_count = counts.get(BULKIMPORTFILE_STATE_ERROR, 0)
+    bulk_import.file_count = bulk_import.imported_count + bulk_import.error_count
+    bulk_import.datetime_finished = datetime.datetime.now()
+    bulk_import.save()
+
+
+def run_bulk_import(bulk_import, entries, processes, batch_size=BULKIMPORT_BATCH_SIZE, progress_callback=None):
+    """
+    Import the entries not imported yet by a BulkImport, return a
+    dictionary of statistics of this run.  progress_callback is called
+    with the statistics after each batch
+    """
+    stats = {'imported': 0, 'errors': 0, 'skipped': 0, 'bytes': 0, 'started': time.time()}
+
+    def collect(results):
+        for path, document_id, message, size in results:
+            if document_id:
+                stats['imported'] += 1
+                stats['bytes'] += size
+            else:
+                stats['errors'] += 1
+        if progress_callback:
+            progress_callback(stats)
+
+    arguments = ((bulk_import.pk, bulk_import.document_type_id, batch) for batch in get_pending_batches(bulk_import, entries, batch_size, stats))
+    try:
+        if processes > 1:
+            # Don't share the database connection with the workers
+            connection.close()
+            pool = multiprocessing.Pool(processes)
+            pending = deque()
+            try:
+                # Only a few batches are queued ahead of the workers so
+                # the entries are read as they are needed
+                for argument in arguments:
+                    pending.append(pool.apply_async(import_batch, (argument,)))
+                    while len(pending) > processes * 2 or (pending and pending[0].ready()):
+                        result = pending.popleft()
+                        # Waiting with a timeout keeps the wait interruptible
+                        while not result.ready():
+                            result.wait(1)
+                        collect(result.get())
+                while pending:
+                    result = pending.popleft()
+                    while not result.ready():
+                        result.wait(1)
+                    collect(result.get())
+            except:
+                pool.terminate()
+                raise
+            else:
+                pool.close()
+            pool.join()
+        else:
+            for argument in arguments:
+                collect(import_batch(argument))
+    finally:
+        update_bulk_import_counts(bulk_import)
+
+    return stats
@@ -34,6 +34,11 @@ register_settings(
         {'name': u'USER_STAGING_DIRECTORY_EXPRESSION', 'global_name': u'DOCUMENTS_USER_STAGING_DIRECTORY_EXPRESSION', 'default': u'user.username'},
         {'name': u'DELETE_STAGING_FILE_AFTER_UPLOAD', 'global_name': u'DOCUMENTS_DELETE_STAGING_FILE_AFTER_UPLOAD', 'default': False},
         {'name': u'STAGING_FILES_PREVIEW_SIZE', 'global_name': u'DOCUMENTS_STAGING_FILES_PREVIEW_SIZE', 'default': u'640x480'},
+        # Watch folders
+        {'name': u'WATCH_FOLDERS', 'global_name': u'DOCUMENTS_WATCH_FOLDERS', 'default': [], 'description': _(u'List of dictionaries of the folders ingested unattended by the watch_staging_folders command, with the keys: path and optionally document_type (name), metadata (dictionary of metadata type names and values) and user (username credited with the documents).  When empty the staging directory is watched if enabled.')},
+        {'name': u'WATCH_FOLDER_SETTLE_TIME', 'global_name': u'DOCUMENTS_WATCH_FOLDER_SETTLE_TIME', 'default': 10, 'description': _(u'Amount of seconds the size and modification time of a file in a watch folder must remain the same before the file is ingested.')},
+        {'name': u'WATCH_FOLDER_POLL_INTERVAL', 'global_name': u'DOCUMENTS_WATCH_FOLDER_POLL_INTERVAL', 'default': 10, 'description': _(u'Amount of seconds between listings of the watch folders when inotify is not available.')},
+        {'name': u'WATCH_FOLDER_CONCURRENT_INGESTIONS', 'global_name': u'DOCUMENTS_WATCH_FOLDER_CONCURRENT_INGESTIONS', 'default': 4, 'description': _(u'Maximum amount of files of the watch folders ingested at the same time.')},
         # Saving
         {'name': u'CHECKSUM_FUNCTION', 'global_name': u'DOCUMENTS_CHECKSUM_FUNCTION', 'default': default_checksum},
         {'name': u'UUID_FUNCTION', 'global_name': u'DOCUMENTS_UUID_FUNCTION', 'default': default_uuid},
@@ -53,5 +58,10 @@ register_settings(
         {'name': u'ZOOM_MAX_LEVEL', 'global_name': u'DOCUMENTS_ZOOM_MAX_LEVEL', 'default': 200, 'description': _(u'Maximum amount in percent (%) to allow user to zoom in a document page interactively.')},
         {'name': u'ZOOM_MIN_LEVEL', 'global_name': u'DOCUMENTS_ZOOM_MIN_LEVEL', 'default': 50, 'description': _(u'Minimum amount in percent (%) to allow user to zoom out a document page interactively.')},
         {'name': u'ROTATION_STEP', 'global_name': u'DOCUMENTS_ROTATION_STEP', 'default': 90, 'description': _(u'Amount in degrees to rotate a document page per user interaction.')},
+        # Image pregeneration
+        {'name': u'PREGENERATE_IMAGES', 'global_name': u'DOCUMENTS_PREGENERATE_IMAGES', 'default': False, 'description': _(u'Render the thumbnails and previews of newly created documents in the background.  Requires a running celery worker.')},
+        {'name': u'PREGENERATE_CONCURRENT_EXECUTION', 'global_name': u'DOCUMENTS_PREGENERATE_CONCURRENT_EXECUTION', 'default': 1, 'description': _(u'Maximum amount of concurrent document image pregenerations a node can perform.')},
+        {'name': u'PREGENERATE_RETRY_DELAY', 'global_name': u'DOCUMENTS_PREGENERATE_RETRY_DELAY', 'default': 10, 'description': _(u'Amount of seconds to wait before retrying an image pregeneration when a node is busy.')},
+        {'name': u'PREGENERATE_TIMEOUT', 'global_name': u'DOCUMENTS_PREGENERATE_TIMEOUT', 'default': 300, 'description': _(u'Amount of seconds after a document is created during which a placeholder is shown instead of rendering missing images while the view request is being served.')},
     ]
 )
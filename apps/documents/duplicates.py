@@ -0,0 +1,102 @@
+"""
+Detection of documents with the same checksum.  Clusters of duplicates
+are found with a grouped query over the indexed checksum table and
+stored so they can be browsed a page at a time
+"""
+import datetime
+
+from django.db import connection, transaction
+
+from common.utils import insert_rows
+
+from documents.models import Document, DocumentChecksum, DuplicateScan, \
+    DuplicateCluster
+from documents.literals import DUPLICATESCAN_STATE_PROCESSING, \
+    DUPLICATESCAN_STATE_DONE, DUPLICATESCAN_STATE_ERROR, \
+    DUPLICATESCAN_INSERT_BATCH_SIZE
+
+
+def get_document_duplicates(document):
+    """
+    Return a queryset of the documents with the same checksum as the
+    given one, including it
+    """
+    if not document.checksum:
+        return Document.objects.none()
+    return Document.objects.filter(documentchecksum__checksum=document.checksum)
+
+
+class DuplicateClusters(object):
+    """
+    Clusters of a duplicate scan, the documents are only fetched for
+    the slices requested which lets the list be handed directly to a
+    paginator
+    """
+    def __init__(self, duplicate_scan):
+        self.queryset = DuplicateCluster.objects.filter(duplicate_scan=duplicate_scan)
+
+    def count(self):
+        return self.queryset.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+
+        clusters = list(self.queryset[key])
+        documents = {}
+        for document_checksum in DocumentChecksum.objects.filter(checksum__in=[cluster.checksum for cluster in clusters]).select_related('document'):
+            documents.setdefault(document_checksum.checksum, []).append(document_checksum.document)
+
+        for cluster in clusters:
+            cluster.documents = sorted(documents.get(cluster.checksum, []), key=lambda x: x.pk)
+        return clusters
+
+
+def get_latest_duplicate_scan():
+    try:
+        return DuplicateScan.objects.filter(state=DUPLICATESCAN_STATE_DONE).order_by('-datetime_finished')[0]
+    except IndexError:
+        return None
+
+
+@transaction.commit_on_success
+def store_duplicate_clusters(duplicate_scan, checksums):
+    """
+    Replace the stored clusters of previous scans with the ones of the
+    given scan
+    """
+    qn = connection.ops.quote_name
+    opts = DuplicateCluster._meta
+    cursor = connection.cursor()
+    cursor.execute(u'DELETE FROM %s' % qn(opts.db_table))
+
+    insert_rows(cursor, opts.db_table,
+        [opts.get_field(name).column for name in ('duplicate_scan', 'checksum', 'document_count')],
+        [(duplicate_scan.pk, checksum, document_count) for checksum, document_count in checksums],
+        DUPLICATESCAN_INSERT_BATCH_SIZE)
+    # Raw statements don't mark the transaction as dirty
+    transaction.set_dirty()
+
+
+def run_duplicate_scan(duplicate_scan):
+    """
+    Find every cluster of duplicated documents recording the progress
+    and the outcome in a DuplicateScan instance
+    """
+    duplicate_scan.state = DUPLICATESCAN_STATE_PROCESSING
+    duplicate_scan.save()
+    try:
+        checksums = DocumentChecksum.objects.get_duplicated_checksums()
+        store_duplicate_clusters(duplicate_scan, checksums)
+    except Exception, exc:
+        duplicate_scan.state = DUPLICATESCAN_STATE_ERROR
+        duplicate_scan.result = unicode(exc)
+    else:
+        duplicate_scan.state = DUPLICATESCAN_STATE_DONE
+        duplicate_scan.cluster_count = len(checksums)
+        duplicate_scan.document_count = sum([document_count for checksum, document_count in checksums])
+    duplicate_scan.datetime_finished = datetime.datetime.now()
+    duplicate_scan.save()
@@ -0,0 +1,98 @@
+"""
+Single pass inspection of the file of a new document.  The checksum is
+computed as the file is read in chunks, the mimetype is sniffed from the
+first chunk and the pages are only counted for formats that can have
+more than one, from a copy spooled during the same read
+"""
+import hashlib
+import os
+import tempfile
+
+from common import TEMPORARY_DIRECTORY
+from converter.api import get_page_count
+
+from documents.utils import get_buffer_mimetype
+from documents.conf.settings import CHECKSUM_FUNCTION, default_checksum
+from documents.literals import INGEST_CHUNK_SIZE, SINGLE_PAGE_MIMETYPES
+
+
+def compute_checksum(source):
+    """
+    Return the checksum of a file object's contents
+    """
+    if CHECKSUM_FUNCTION is default_checksum:
+        hasher = hashlib.sha256()
+        while True:
+            chunk = source.read(INGEST_CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+        return unicode(hasher.hexdigest())
+    else:
+        # User provided functions expect the whole contents
+        return unicode(CHECKSUM_FUNCTION(source.read()))
+
+
+def probe_file(source, filename, local_path=None):
+    """
+    Read a file object once and return a dictionary with its checksum,
+    mimetype, mimetype encoding and page count.  local_path is the path
+    of a local copy of the file if one exists, otherwise one is spooled
+    when the pages need to be counted
+    """
+    incremental = CHECKSUM_FUNCTION is default_checksum
+    hasher = hashlib.sha256()
+    chunks = []
+    spool = None
+    spool_path = None
+    file_mimetype = file_mime_encoding = None
+
+    try:
+        while True:
+            chunk = source.read(INGEST_CHUNK_SIZE)
+            if file_mimetype is None:
+                try:
+                    file_mimetype, file_mime_encoding = get_buffer_mimetype(chunk, filename)
+                except Exception:
+                    # Not knowing the mimetype doesn't prevent storing
+                    # the file
+                    file_mimetype, file_mime_encoding = u'', u''
+                if not local_path and file_mimetype not in SINGLE_PAGE_MIMETYPES:
+                    handle, spool_path = tempfile.mkstemp(dir=TEMPORARY_DIRECTORY)
+                    spool = os.fdopen(handle, 'wb')
+
+            if not chunk:
+                break
+
+            if incremental:
+                hasher.update(chunk)
+            else:
+                # User provided functions expect the whole contents
+                chunks.append(chunk)
+
+            if spool:
+                spool.write(chunk)
+
+        if spool:
+            spool.close()
+            spool = None
+
+        if file_mimetype in SINGLE_PAGE_MIMETYPES:
+            page_count = 1
+        else:
+            page_count = get_page_count(local_path or spool_path)
+    finally:
+        if spool:
+            spool.close()
+        if spool_path:
+            try:
+                os.remove(spool_path)
+            except OSError:
+                pass
+
+    return {
+        'checksum': unicode(hasher.hexdigest() if incremental else CHECKSUM_FUNCTION(''.join(chunks))),
+        'mimetype': file_mimetype,
+        'mime_encoding': file_mime_encoding,
+        'page_count': page_count,
+    }
@@ -4,6 +4,7 @@ PICTURE_ERROR_SMALL = u'picture_error.png'
 PICTURE_ERROR_MEDIUM = u'1297211435_error.png'
 PICTURE_UNKNOWN_SMALL = u'1299549572_unknown2.png'
 PICTURE_UNKNOWN_MEDIUM = u'1299549805_unknown.png'
+PICTURE_PENDING = u'ajax-loader.gif'
 
 PERMISSION_DOCUMENT_CREATE = {'namespace': 'documents', 'name': 'document_create', 'label': _(u'Create documents')}
 PERMISSION_DOCUMENT_PROPERTIES_EDIT = {'namespace': 'documents', 'name': 'document_properties_edit', 'label': _(u'Edit document properties')}
@@ -48,3 +49,78 @@ HISTORY_DOCUMENT_DELETED = {
     'details': _(u'Document "%(document)s" deleted on %(datetime)s by %(fullname)s.'),
     'expressions': {'fullname': 'user.get_full_name() if user.get_full_name() else user.username'}
 }
+
+DUPLICATESCAN_STATE_PENDING = 'p'
+DUPLICATESCAN_STATE_PROCESSING = 'i'
+DUPLICATESCAN_STATE_DONE = 'd'
+DUPLICATESCAN_STATE_ERROR = 'e'
+
+DUPLICATESCAN_STATE_CHOICES = (
+    (DUPLICATESCAN_STATE_PENDING, _(u'pending')),
+    (DUPLICATESCAN_STATE_PROCESSING, _(u'processing')),
+    (DUPLICATESCAN_STATE_DONE, _(u'done')),
+    (DUPLICATESCAN_STATE_ERROR, _(u'error')),
+)
+
+# Number of duplicate clusters written per bulk insert statement
+DUPLICATESCAN_INSERT_BATCH_SIZE = 1000
+
+# Bytes read at a time when inspecting a new document's file, the
+# mimetype is sniffed from the first chunk
+INGEST_CHUNK_SIZE = 1024 * 1024
+
+# Formats that can't hold more than one page, their pages aren't counted
+SINGLE_PAGE_MIMETYPES = (
+    u'image/jpeg', u'image/png', u'image/bmp', u'image/x-ms-bmp',
+    u'image/x-portable-pixmap', u'image/x-portable-graymap',
+    u'image/x-portable-bitmap',
+)
+
+ARCHIVEUPLOAD_STATE_PENDING = 'p'
+ARCHIVEUPLOAD_STATE_EXPANDING = 'i'
+ARCHIVEUPLOAD_STATE_EXPANDED = 'd'
+ARCHIVEUPLOAD_STATE_ERROR = 'e'
+
+ARCHIVEUPLOAD_STATE_CHOICES = (
+    (ARCHIVEUPLOAD_STATE_PENDING, _(u'pending')),
+    (ARCHIVEUPLOAD_STATE_EXPANDING, _(u'expanding')),
+    (ARCHIVEUPLOAD_STATE_EXPANDED, _(u'expanded')),
+    (ARCHIVEUPLOAD_STATE_ERROR, _(u'error')),
+)
+
+ARCHIVEMEMBER_STATE_STORED = 's'
+ARCHIVEMEMBER_STATE_DONE = 'd'
+ARCHIVEMEMBER_STATE_ERROR = 'e'
+
+ARCHIVEMEMBER_STATE_CHOICES = (
+    (ARCHIVEMEMBER_STATE_STORED, _(u'stored')),
+    (ARCHIVEMEMBER_STATE_DONE, _(u'done')),
+    (ARCHIVEMEMBER_STATE_ERROR, _(u'error')),
+)
+
+# Seconds after its last modification during which a staging directory
+# is listed again on every request, changes made within the resolution
+# of the filesystem timestamps would otherwise go unnoticed
+STAGING_LISTING_MTIME_GRANULARITY = 2
+
+# Directory of a watch folder where the files that couldn't be stored
+# are moved to
+WATCH_FOLDER_FAILED_DIRECTORY = u'failed'
+
+# Directory of a watch folder where the files are moved to while being
+# stored, files left there were interrupted and aren't ingested again
+WATCH_FOLDER_PROCESSING_DIRECTORY = u'processing'
+
+# Seconds between checks of the files being delivered to watch folders
+WATCH_FOLDER_TICK = 1
+
+BULKIMPORTFILE_STATE_DONE = 'd'
+BULKIMPORTFILE_STATE_ERROR = 'e'
+
+BULKIMPORTFILE_STATE_CHOICES = (
+    (BULKIMPORTFILE_STATE_DONE, _(u'imported')),
+    (BULKIMPORTFILE_STATE_ERROR, _(u'error')),
+)
+
+# Files imported by a worker per database transaction
+BULKIMPORT_BATCH_SIZE = 100
@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import multiprocessing
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from common.utils import pretty_size
+from document_indexing.models import IndexRebuild
+from document_indexing.tasks import task_rebuild_all_indexes
+
+from documents.models import DocumentType, BulkImport
+from documents.bulk_import import BulkImportError, walk_directory, \
+    read_manifest, run_bulk_import
+
+
+class Command(BaseCommand):
+    help = 'Import the files of a directory tree or of a CSV manifest, running the same command again resumes an interrupted import.'
+    args = '<directory|manifest.csv>'
+    option_list = BaseCommand.option_list + (
+        make_option('--workers', action='store', type='int', dest='workers', default=multiprocessing.cpu_count(),
+            help='Amount of worker processes.'),
+        make_option('--document-type', action='store', dest='document_type', default=None,
+            help='Name of the document type of the documents without one in the manifest.'),
+        make_option('--no-index', action='store_false', dest='index', default=True,
+            help='Don\'t queue an index rebuild once the import finishes.'),
+    )
+
+    def handle(self, source=None, *args, **options):
+        if not source:
+            raise CommandError('Enter a directory or a manifest to import.')
+        source = os.path.abspath(source.decode(sys.getfilesystemencoding() or 'utf-8'))
+        if not os.path.exists(source):
+            raise CommandError('Source not found: %s' % source)
+
+        document_type = None
+        if options['document_type']:
+            try:
+                document_type = DocumentType.objects.filter(name=options['document_type'])[0]
+            except IndexError:
+                raise CommandError('Unknown document type: %s' % options['document_type'])
+
+        bulk_import, created = BulkImport.objects.get_or_create(source=source)
+        if not created:
+            print 'Resuming import of: %s, %d files imported previously.' % (source, bulk_import.imported_count)
+        bulk_import.document_type = document_type
+        bulk_import.save()
+
+        if os.path.isdir(source):
+            entries = walk_directory(source)
+        else:
+            entries = read_manifest(source)
+
+        def progress(stats):
+            elapsed = max(time.time() - stats['started'], 0.001)
+            sys.stdout.write('\rImported: %d, errors: %d, skipped: %d, %0.1f files/s, %s/s' % (
+                stats['imported'], stats['errors'], stats['skipped'],
+                stats['imported'] / elapsed, pretty_size(stats['bytes'] / elapsed)))
+            sys.stdout.flush()
+
+        try:
+            stats = run_bulk_import(bulk_import, entries, options['workers'], progress_callback=progress)
+        except BulkImportError, exc:
+            raise CommandError(exc)
+        except KeyboardInterrupt:
+            print
+            raise CommandError('Import interrupted, run the same command again to resume it.')
+
+        print
+        print 'Imported %d files in %0.1f seconds, %d errors.' % (stats['imported'], time.time() - stats['started'], stats['errors'])
+        if bulk_import.error_count:
+            print 'Files not imported: %d, they are listed in the bulk import files of the administration interface.' % bulk_import.error_count
+
+        if options['index'] and stats['imported']:
+            index_rebuild = IndexRebuild.objects.create()
+            task_rebuild_all_indexes.delay(index_rebuild.pk)
+            print 'Index rebuild queued.'
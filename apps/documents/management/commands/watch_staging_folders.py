@@ -0,0 +1,62 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.exceptions import ImproperlyConfigured
+
+from documents.watch_folders import WatchFolder, run_watch_folders, \
+    get_monitor_class, InotifyMonitor
+from documents.conf.settings import WATCH_FOLDERS
+from documents.conf.settings import WATCH_FOLDER_SETTLE_TIME
+from documents.conf.settings import WATCH_FOLDER_POLL_INTERVAL
+from documents.conf.settings import WATCH_FOLDER_CONCURRENT_INGESTIONS
+from documents.conf.settings import USE_STAGING_DIRECTORY
+from documents.conf.settings import STAGING_DIRECTORY
+
+
+class Command(BaseCommand):
+    help = 'Ingest the files delivered to the watch folders until interrupted.'
+    args = '[path path ...]'
+    option_list = BaseCommand.option_list + (
+        make_option('--workers', action='store', type='int', dest='workers', default=WATCH_FOLDER_CONCURRENT_INGESTIONS,
+            help='Maximum amount of files ingested at the same time.'),
+        make_option('--settle-time', action='store', type='int', dest='settle_time', default=WATCH_FOLDER_SETTLE_TIME,
+            help='Seconds a file must remain unchanged before it is ingested.'),
+        make_option('--poll-interval', action='store', type='int', dest='poll_interval', default=WATCH_FOLDER_POLL_INTERVAL,
+            help='Seconds between listings of the folders when polling.'),
+        make_option('--poll', action='store_false', dest='use_inotify', default=True,
+            help='List the folders periodically even if inotify is available.'),
+    )
+
+    def handle(self, *paths, **options):
+        if paths:
+            # Folders given in the command line are watched without defaults
+            configuration = [{'path': path} for path in paths]
+        elif WATCH_FOLDERS:
+            configuration = WATCH_FOLDERS
+        elif USE_STAGING_DIRECTORY:
+            configuration = [{'path': STAGING_DIRECTORY}]
+        else:
+            raise CommandError('No watch folders configured.')
+
+        try:
+            watch_folders = [WatchFolder(**dict([(str(key), value) for key, value in folder.items()])) for folder in configuration]
+        except ImproperlyConfigured, exc:
+            raise CommandError(exc)
+
+        def report(watch_folder, filepath, document, result):
+            if document:
+                print 'Ingested: %s, as document: %d' % (filepath, document.pk)
+                for warning in result:
+                    print '    Warning: %s' % warning
+            else:
+                print 'Failed: %s; %s' % (filepath, result)
+
+        monitor_class = get_monitor_class(options['use_inotify'])
+        for watch_folder in watch_folders:
+            print 'Watching: %s' % watch_folder.path
+        print 'Using %s, press CONTROL-C to quit.' % ('inotify' if monitor_class is InotifyMonitor else 'polling every %d seconds' % options['poll_interval'])
+
+        try:
+            run_watch_folders(watch_folders, options['settle_time'], options['poll_interval'], options['workers'], callback=report, use_inotify=options['use_inotify'])
+        except KeyboardInterrupt:
+            print 'Stopped.'
@@ -1,6 +1,9 @@
 from datetime import datetime
 
-from django.db import models
+from django.db import models, connection, transaction
+from django.db.models import Count
+
+from common.utils import insert_rows
 
 from documents.conf.settings import RECENT_COUNT
 
@@ -13,3 +16,37 @@ class RecentDocumentManager(models.Manager):
         to_delete = self.model.objects.filter(user=user)[RECENT_COUNT:]
         for recent_to_delete in to_delete:
             recent_to_delete.delete()
+
+
+class DocumentChecksumManager(models.Manager):
+    def set_for_document(self, document):
+        if document.checksum:
+            if not self.model.objects.filter(document=document).update(checksum=document.checksum):
+                self.model.objects.create(document=document, checksum=document.checksum)
+        else:
+            self.model.objects.filter(document=document).delete()
+
+    def get_duplicated_checksums(self):
+        """
+        Return a list of (checksum, document count) tuples of the
+        checksums shared by more than one document, using a single
+        grouped query over the checksum index
+        """
+        return list(self.model.objects.values_list('checksum').annotate(document_count=Count('document')).filter(document_count__gt=1).order_by('checksum'))
+
+    @transaction.commit_on_success
+    def rebuild(self):
+        """
+        Copy the checksum of every document
+        """
+        from documents.models import Document
+
+        qn = connection.ops.quote_name
+        opts = self.model._meta
+        cursor = connection.cursor()
+        cursor.execute(u'DELETE FROM %s' % qn(opts.db_table))
+        rows = list(Document.objects.exclude(checksum=None).exclude(checksum=u'').values_list('pk', 'checksum').iterator())
+        insert_rows(cursor, opts.db_table, [opts.get_field('document').column, opts.get_field('checksum').column], rows)
+        # Raw statements don't mark the transaction as dirty
+        transaction.set_dirty()
+        return len(rows)
@@ -2,23 +2,33 @@ import os
 import tempfile
 
 from django.db import models
+from django.db.models.signals import post_save
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.auth.models import User
 from django.contrib.contenttypes import generic
 from django.contrib.comments.models import Comment
 
 from taggit.managers import TaggableManager
-from dynamic_search.api import register
+from taggit.models import TaggedItem
+from dynamic_search.api import register, register_dependency
 from converter.api import get_page_count
 from converter import TRANFORMATION_CHOICES
+from common.expressions import evaluate_expression, \
+    register_expression_model
 
 from documents.utils import get_document_mimetype
-from documents.conf.settings import CHECKSUM_FUNCTION
+from documents.ingest import compute_checksum, probe_file
 from documents.conf.settings import UUID_FUNCTION
 from documents.conf.settings import STORAGE_BACKEND
 from documents.conf.settings import AVAILABLE_TRANSFORMATIONS
 from documents.conf.settings import DEFAULT_TRANSFORMATIONS
-from documents.managers import RecentDocumentManager
+from documents.conf.settings import PREGENERATE_IMAGES
+from documents.managers import RecentDocumentManager, \
+    DocumentChecksumManager
+from documents.literals import DUPLICATESCAN_STATE_CHOICES, \
+    DUPLICATESCAN_STATE_PENDING, ARCHIVEUPLOAD_STATE_CHOICES, \
+    ARCHIVEUPLOAD_STATE_PENDING, ARCHIVEMEMBER_STATE_CHOICES, \
+    ARCHIVEMEMBER_STATE_STORED, BULKIMPORTFILE_STATE_CHOICES
 
 available_transformations = ([(name, data['label']) for name, data in AVAILABLE_TRANSFORMATIONS.items()])
 
@@ -89,19 +99,44 @@ class Document(models.Model):
     def save(self, *args, **kwargs):
         """
         Overloaded save method that updates the document's checksum,
-        mimetype, page count and transformation when originally created
+        mimetype, page count and transformation when originally created,
+        callers saving inside a longer transaction can pass
+        pregenerate_images=False and queue the images once it commits
         """
+        pregenerate_images = kwargs.pop('pregenerate_images', PREGENERATE_IMAGES)
         new_document = not self.pk
+        probe = None
+
+        if new_document and self.file and not self.file._committed:
+            # Inspect the new file before it is stored so that the
+            # results are persisted by the same save
+            content = self.file.file
+            local_path = content.temporary_file_path() if hasattr(content, 'temporary_file_path') else None
+            content.seek(0)
+            probe = probe_file(content, self.file.name, local_path)
+            content.seek(0)
+            self.apply_probe(probe)
 
         super(Document, self).save(*args, **kwargs)
 
         if new_document:
             #Only do this for new documents
-            self.update_checksum(save=False)
-            self.update_mimetype(save=False)
-            self.save()
-            self.update_page_count(save=False)
+            if probe is None:
+                # The file was already in storage
+                source = self.open()
+                try:
+                    probe = probe_file(source, self.get_fullname())
+                finally:
+                    source.close()
+                self.apply_probe(probe)
+                self.save()
+            self.update_page_count(save=False, page_count=probe['page_count'])
             self.apply_default_transformations()
+            if pregenerate_images:
+                # Imported here to avoid a circular import with the
+                # tasks module
+                from documents.tasks import queue_document_image_pregeneration
+                queue_document_image_pregeneration(self)
 
     @models.permalink
     def get_absolute_url(self):
@@ -113,6 +148,14 @@ class Document(models.Model):
         """
         return os.extsep.join([self.file_filename, self.file_extension])
 
+    def apply_probe(self, probe):
+        """
+        Copy the checksum and mimetype found by probe_file
+        """
+        self.checksum = probe['checksum']
+        self.file_mimetype = probe['mimetype']
+        self.file_mime_encoding = probe['mime_encoding']
+
     def update_mimetype(self, save=True):
         """
         Read a document's file and determine the mimetype by calling the
@@ -120,7 +163,7 @@ class Document(models.Model):
         """
         if self.exists():
             try:
-                self.file_mimetype, self.mime_encoding = get_document_mimetype(self)
+                self.file_mimetype, self.file_mime_encoding = get_document_mimetype(self)
             except:
                 self.file_mimetype = u''
                 self.file_mime_encoding = u''
@@ -133,6 +176,9 @@ class Document(models.Model):
         Return a file descriptor to a document's file irrespective of
         the storage backend
         """
+        if hasattr(self.file.storage, 'get_cached_path'):
+            # Local copies are shared by documents with the same contents
+            return self.file.storage.open(self.file.path, key=self.checksum or None)
         return self.file.storage.open(self.file.path)
 
     def update_checksum(self, save=True):
@@ -142,20 +188,29 @@ class Document(models.Model):
         """
         if self.exists():
             source = self.open()
-            self.checksum = unicode(CHECKSUM_FUNCTION(source.read()))
-            source.close()
+            try:
+                self.checksum = compute_checksum(source)
+            finally:
+                source.close()
             if save:
                 self.save()
 
-    def update_page_count(self, save=True):
-        handle, filepath = tempfile.mkstemp()
-        self.save_to_file(filepath)
-        detected_pages = get_page_count(filepath)
-        os.close(handle)
-        try:
-            os.remove(filepath)
-        except OSError:
-            pass
+    def update_page_count(self, save=True, page_count=None):
+        """
+        Make the document's pages match the page count of its file,
+        counted unless page_count is given
+        """
+        if page_count is None:
+            handle, filepath = tempfile.mkstemp()
+            self.save_to_file(filepath)
+            detected_pages = get_page_count(filepath)
+            os.close(handle)
+            try:
+                os.remove(filepath)
+            except OSError:
+                pass
+        else:
+            detected_pages = page_count
 
         current_pages = DocumentPage.objects.filter(document=self).order_by('page_number',)
         if current_pages.count() > detected_pages:
@@ -176,6 +231,9 @@ class Document(models.Model):
         Save a copy of the document from the document storage backend
         to the local filesystem
         """
+        if hasattr(self.file.storage, 'copy_to_file'):
+            return self.file.storage.copy_to_file(self.file.path, filepath, key=self.checksum or None)
+
         input_descriptor = self.open()
         output_descriptor = open(filepath, 'wb')
         while True:
@@ -262,7 +320,7 @@ class DocumentPage(models.Model):
             try:
                 if page_transformation.transformation in TRANFORMATION_CHOICES:
                     transformation_list.append(
-                        TRANFORMATION_CHOICES[page_transformation.transformation] % eval(
+                        TRANFORMATION_CHOICES[page_transformation.transformation] % evaluate_expression(
                             page_transformation.arguments
                         )
                     )
@@ -311,6 +369,181 @@ class RecentDocument(models.Model):
         verbose_name_plural = _(u'recent documents')
 
 
+class DocumentChecksum(models.Model):
+    """
+    Indexed copy of the checksum of a document used to find duplicated
+    documents with grouped queries
+    """
+    document = models.OneToOneField(Document, primary_key=True, verbose_name=_(u'document'))
+    checksum = models.CharField(max_length=255, db_index=True, verbose_name=_(u'checksum'))
+
+    objects = DocumentChecksumManager()
+
+    def __unicode__(self):
+        return self.checksum
+
+    class Meta:
+        verbose_name = _(u'document checksum')
+        verbose_name_plural = _(u'document checksums')
+
+
+class DuplicateScan(models.Model):
+    """
+    Progress and outcome of a search for duplicated documents, the
+    clusters found are kept for the most recent finished scan
+    """
+    datetime_submitted = models.DateTimeField(verbose_name=_(u'date time submitted'), auto_now_add=True, db_index=True)
+    datetime_finished = models.DateTimeField(verbose_name=_(u'date time finished'), blank=True, null=True)
+    state = models.CharField(max_length=4,
+        choices=DUPLICATESCAN_STATE_CHOICES,
+        default=DUPLICATESCAN_STATE_PENDING,
+        verbose_name=_(u'state'))
+    cluster_count = models.PositiveIntegerField(default=0, verbose_name=_(u'cluster count'))
+    document_count = models.PositiveIntegerField(default=0, verbose_name=_(u'document count'))
+    result = models.TextField(blank=True, null=True, verbose_name=_(u'result'))
+
+    class Meta:
+        ordering = ('-datetime_submitted',)
+        verbose_name = _(u'duplicate scan')
+        verbose_name_plural = _(u'duplicate scans')
+
+    def __unicode__(self):
+        return unicode(self.datetime_submitted).split('.')[0]
+
+
+class DuplicateCluster(models.Model):
+    """
+    Checksum shared by several documents found by a duplicate scan
+    """
+    duplicate_scan = models.ForeignKey(DuplicateScan, verbose_name=_(u'duplicate scan'))
+    checksum = models.CharField(max_length=255, verbose_name=_(u'checksum'))
+    document_count = models.PositiveIntegerField(verbose_name=_(u'document count'))
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = _(u'duplicate cluster')
+        verbose_name_plural = _(u'duplicate clusters')
+
+    def __unicode__(self):
+        return self.checksum
+
+
+class ArchiveUpload(models.Model):
+    """
+    Compressed file uploaded to be expanded into one document per
+    member in the background
+    """
+    user = models.ForeignKey(User, verbose_name=_(u'user'), editable=False)
+    document_type = models.ForeignKey(DocumentType, verbose_name=_(u'document type'), null=True, blank=True)
+    filename = models.CharField(max_length=255, verbose_name=_(u'filename'))
+    query_string = models.TextField(blank=True, verbose_name=_(u'query string'))
+    datetime_submitted = models.DateTimeField(verbose_name=_(u'date time submitted'), auto_now_add=True, db_index=True)
+    datetime_finished = models.DateTimeField(verbose_name=_(u'date time finished'), blank=True, null=True)
+    state = models.CharField(max_length=4,
+        choices=ARCHIVEUPLOAD_STATE_CHOICES,
+        default=ARCHIVEUPLOAD_STATE_PENDING,
+        verbose_name=_(u'state'))
+    # Name of the uploaded archive in the document storage until it is
+    # expanded
+    spool_name = models.CharField(max_length=255, blank=True, editable=False, verbose_name=_(u'spool name'))
+    member_count = models.PositiveIntegerField(default=0, verbose_name=_(u'member count'))
+    done_count = models.PositiveIntegerField(default=0, verbose_name=_(u'done count'))
+    error_count = models.PositiveIntegerField(default=0, verbose_name=_(u'error count'))
+    result = models.TextField(blank=True, null=True, verbose_name=_(u'result'))
+
+    class Meta:
+        ordering = ('-datetime_submitted',)
+        verbose_name = _(u'archive upload')
+        verbose_name_plural = _(u'archive uploads')
+
+    def __unicode__(self):
+        return self.filename
+
+    @models.permalink
+    def get_absolute_url(self):
+        return ('archive_upload_view', [self.pk])
+
+    def get_progress_display(self):
+        return _(u'%(done)d of %(total)d done, %(errors)d errors') % {
+            'done': self.done_count,
+            'total': self.member_count,
+            'errors': self.error_count}
+
+
+class ArchiveMember(models.Model):
+    """
+    File of an uploaded archive and the outcome of its ingestion
+    """
+    archive_upload = models.ForeignKey(ArchiveUpload, verbose_name=_(u'archive upload'))
+    filename = models.CharField(max_length=255, verbose_name=_(u'filename'))
+    document = models.ForeignKey(Document, verbose_name=_(u'document'), null=True, blank=True)
+    state = models.CharField(max_length=4,
+        choices=ARCHIVEMEMBER_STATE_CHOICES,
+        default=ARCHIVEMEMBER_STATE_STORED,
+        verbose_name=_(u'state'))
+    message = models.TextField(blank=True, verbose_name=_(u'message'))
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = _(u'archive member')
+        verbose_name_plural = _(u'archive members')
+
+    def __unicode__(self):
+        return self.filename
+
+
+class BulkImport(models.Model):
+    """
+    Import of the files of a directory tree or of a manifest, the files
+    imported are recorded so an interrupted import can be resumed
+    """
+    source = models.CharField(max_length=255, unique=True, verbose_name=_(u'source'))
+    document_type = models.ForeignKey(DocumentType, verbose_name=_(u'document type'), null=True, blank=True)
+    datetime_started = models.DateTimeField(verbose_name=_(u'date time started'), auto_now_add=True)
+    datetime_finished = models.DateTimeField(verbose_name=_(u'date time finished'), blank=True, null=True)
+    file_count = models.PositiveIntegerField(default=0, verbose_name=_(u'file count'))
+    imported_count = models.PositiveIntegerField(default=0, verbose_name=_(u'imported count'))
+    error_count = models.PositiveIntegerField(default=0, verbose_name=_(u'error count'))
+
+    class Meta:
+        ordering = ('-datetime_started',)
+        verbose_name = _(u'bulk import')
+        verbose_name_plural = _(u'bulk imports')
+
+    def __unicode__(self):
+        return self.source
+
+
+class BulkImportFile(models.Model):
+    """
+    Outcome of the import of a single file, looked up by the checksum of
+    its path as paths can be longer than an indexed column allows
+    """
+    bulk_import = models.ForeignKey(BulkImport, verbose_name=_(u'bulk import'))
+    path = models.TextField(verbose_name=_(u'path'))
+    path_checksum = models.CharField(max_length=40, verbose_name=_(u'path checksum'))
+    document = models.ForeignKey(Document, verbose_name=_(u'document'), null=True, blank=True)
+    state = models.CharField(max_length=4,
+        choices=BULKIMPORTFILE_STATE_CHOICES,
+        verbose_name=_(u'state'))
+    message = models.TextField(blank=True, verbose_name=_(u'message'))
+
+    class Meta:
+        ordering = ('id',)
+        unique_together = ('bulk_import', 'path_checksum')
+        verbose_name = _(u'bulk import file')
+        verbose_name_plural = _(u'bulk import files')
+
+    def __unicode__(self):
+        return self.path
+
+
+def document_post_save(sender, instance, **kwargs):
+    DocumentChecksum.objects.set_for_document(instance)
+
+
+post_save.connect(document_post_save, sender=Document, dispatch_uid=u'documents_checksum_save_Document')
+
 # Register the fields that will be searchable
 register('document', Document, _(u'document'), [
     {'name': u'document_type__name', 'title': _(u'Document type')},
@@ -324,4 +557,8 @@ register('document', Document, _(u'document'), [
     {'name': u'comments__comment', 'title': _(u'Comments')},
     ]
 )
+register_dependency(DocumentPage, lambda x: x.document)
+register_dependency(TaggedItem, lambda x: x.content_object)
+register_dependency(Comment, lambda x: x.content_object)
 #register(Document, _(u'document'), ['document_type__name', 'file_mimetype', 'file_extension', 'documentmetadata__value', 'documentpage__content', 'description', {'field_name':'file_filename', 'comparison':'iexact'}])
+register_expression_model(DocumentPageTransformation, ('arguments',))
@@ -1,5 +1,7 @@
 import errno
 import os
+import stat
+import time
 import hashlib
 
 from django.core.files.base import File
@@ -8,6 +10,7 @@ from django.utils.translation import ugettext
 from django.contrib import messages
 from django.utils.translation import ugettext_lazy as _
 
+from common.expressions import evaluate_expression
 from converter import TRANFORMATION_CHOICES
 from converter.api import convert, cache_cleanup
 
@@ -17,17 +20,18 @@ from documents.conf.settings import STAGING_FILES_PREVIEW_SIZE
 from documents.conf.settings import USER_STAGING_DIRECTORY_ROOT
 from documents.conf.settings import USER_STAGING_DIRECTORY_EXPRESSION
 
+from documents.ingest import compute_checksum
 from documents.literals import UPLOAD_SOURCE_STAGING, \
-    UPLOAD_SOURCE_USER_STAGING
+    UPLOAD_SOURCE_USER_STAGING, STAGING_LISTING_MTIME_GRANULARITY
 
 HASH_FUNCTION = lambda x: hashlib.sha256(x).hexdigest()
-#TODO: Do benchmarks
-#func = lambda:[StagingFile.get_all() is None for i in range(100)]
-#t1=time.time();func();t2=time.time();print '%s took %0.3f ms' % (func.func_name, (t2-t1)*1000.0)
+
+# Directory path: (directory modification time, time listed, staging files)
+_listing_cache = {}
 
 STAGING_FILE_FUNCTIONS = {
     UPLOAD_SOURCE_STAGING: lambda x: STAGING_DIRECTORY,
-    UPLOAD_SOURCE_USER_STAGING: lambda x: os.path.join(USER_STAGING_DIRECTORY_ROOT, eval(USER_STAGING_DIRECTORY_EXPRESSION, {'user': x.user}))
+    UPLOAD_SOURCE_USER_STAGING: lambda x: os.path.join(USER_STAGING_DIRECTORY_ROOT, evaluate_expression(USER_STAGING_DIRECTORY_EXPRESSION, {'user': x.user}))
 }
 
 
@@ -39,12 +43,46 @@ def evaluate_user_staging_path(request, source):
         return u''
 
 
-def get_all_files(path):
+def get_staging_files(path):
+    """
+    Return the StagingFile instances of the files in a directory sorted
+    by filename, the listing is reused until the modification time of
+    the directory changes
+    """
     try:
-        return sorted([os.path.normcase(f) for f in os.listdir(path) if os.path.isfile(os.path.join(path, f))])
+        mtime = os.stat(path).st_mtime
+        cached = _listing_cache.get(path)
+        if cached and cached[0] == mtime and cached[1] - mtime > STAGING_LISTING_MTIME_GRANULARITY:
+            return cached[2]
+
+        listed = time.time()
+        # Keep the instances of unchanged files along with their checksums
+        previous = dict([(staging_file.id, staging_file) for staging_file in (cached[2] if cached else [])])
+        staging_files = []
+        for filename in sorted([os.path.normcase(f) for f in os.listdir(path)]):
+            filepath = os.path.join(path, filename)
+            try:
+                stat_result = os.stat(filepath)
+            except OSError:
+                # Removed after being listed
+                continue
+            if stat.S_ISREG(stat_result.st_mode):
+                staging_file = StagingFile(filepath, stat_result)
+                staging_files.append(previous.get(staging_file.id, staging_file))
     except OSError, exc:
         raise OSError(ugettext(u'Unable get list of staging files: %s') % exc)
 
+    _listing_cache[path] = (mtime, listed, staging_files)
+    return staging_files
+
+
+def get_staging_file_id(filepath, stat_result):
+    """
+    Return an id that changes whenever the file is replaced, resized or
+    modified, without reading its contents
+    """
+    return HASH_FUNCTION('%r:%d:%d:%d:%r' % (filepath, stat_result.st_dev, stat_result.st_ino, stat_result.st_size, stat_result.st_mtime))
+
 
 def _return_new_class():
     return type('StagingFile', (StagingFile,), dict(StagingFile.__dict__))
@@ -73,12 +111,7 @@ class StagingFile(object):
         Return a list of StagingFile instances corresponding to the
         current path
         """
-        staging_files = []
-        for filename in get_all_files(cls.path):
-            staging_files.append(StagingFile(
-                filepath=os.path.join(cls.path, filename)))
-
-        return staging_files
+        return list(get_staging_files(cls.path))
 
     @classmethod
     def get(cls, id):
@@ -86,16 +119,22 @@ class StagingFile(object):
         Return a single StagingFile instance corresponding to the id
         given as argument
         """
-        files_dict = dict([(file.id, file) for file in cls.get_all()])
-        if id in files_dict:
-            return files_dict[id]
-        else:
-            raise ObjectDoesNotExist
-
-    def __init__(self, filepath):
+        # Files written in place don't change the modification time of
+        # the directory, a stale listing is refreshed before giving up
+        for refresh in (False, True):
+            if refresh:
+                _listing_cache.pop(cls.path, None)
+            for staging_file in cls.get_all():
+                if staging_file.id == id and staging_file.is_current():
+                    return staging_file
+
+        raise ObjectDoesNotExist
+
+    def __init__(self, filepath, stat_result=None):
         self.filepath = filepath
         self.filename = os.path.basename(filepath)
-        self._id = HASH_FUNCTION(open(filepath).read())
+        self.id = get_staging_file_id(filepath, stat_result or os.stat(filepath))
+        self._checksum = None
 
     def __unicode__(self):
         return self.filename
@@ -103,11 +142,25 @@ class StagingFile(object):
     def __repr__(self):
         return self.__unicode__()
 
-    def __getattr__(self, name):
-        if name == 'id':
-            return self._id
-        else:
-            raise AttributeError
+    def is_current(self):
+        try:
+            return get_staging_file_id(self.filepath, os.stat(self.filepath)) == self.id
+        except OSError:
+            return False
+
+    @property
+    def checksum(self):
+        """
+        Checksum of the file's contents, computed the first time it is
+        needed
+        """
+        if self._checksum is None:
+            source = open(self.filepath, 'rb')
+            try:
+                self._checksum = compute_checksum(source)
+            finally:
+                source.close()
+        return self._checksum
 
     def upload(self):
         """
@@ -142,7 +195,7 @@ def get_transformation_string(transformations):
     for transformation in transformations:
         try:
             if transformation['name'] in TRANFORMATION_CHOICES:
-                output = TRANFORMATION_CHOICES[transformation['name']] % eval(transformation['arguments'])
+                output = TRANFORMATION_CHOICES[transformation['name']] % evaluate_expression(transformation['arguments'])
                 transformation_list.append(output)
         except Exception, e:
             errors.append(e)
@@ -0,0 +1,102 @@
+import fcntl
+import os
+
+from celery.decorators import task
+
+from common import TEMPORARY_DIRECTORY
+from converter.api import convert_document_pages, QUALITY_DEFAULT, \
+    DEFAULT_FILE_FORMAT
+
+from documents.models import Document, DuplicateScan, ArchiveUpload, \
+    ArchiveMember
+from documents.duplicates import run_duplicate_scan
+from documents.archives import expand_archive, process_archive_member
+from documents.conf.settings import THUMBNAIL_SIZE
+from documents.conf.settings import MULTIPAGE_PREVIEW_SIZE
+from documents.conf.settings import PREVIEW_SIZE
+from documents.conf.settings import PREGENERATE_CONCURRENT_EXECUTION
+from documents.conf.settings import PREGENERATE_RETRY_DELAY
+
+PREGENERATE_SIZES = [THUMBNAIL_SIZE, MULTIPAGE_PREVIEW_SIZE, PREVIEW_SIZE]
+
+
+def acquire_node_slot():
+    """
+    Try to lock one of the node's image pregeneration slots, the locks
+    are released by the OS if the worker dies
+    """
+    for slot in range(PREGENERATE_CONCURRENT_EXECUTION):
+        lock_file = open(os.path.join(TEMPORARY_DIRECTORY, u'document_image_pregeneration_%d.lock' % slot), 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return lock_file
+        except IOError:
+            lock_file.close()
+
+    return None
+
+
+def release_node_slot(lock_file):
+    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    lock_file.close()
+
+
+@task
+def task_pregenerate_document_images(document_id, first_page_only=False):
+    """
+    Render a document's thumbnails and previews into the render cache,
+    the first page is rendered first and the rest of the pages are
+    queued afterwards
+    """
+    lock_file = acquire_node_slot()
+    if not lock_file:
+        # Node is busy, try again later
+        task_pregenerate_document_images.apply_async(
+            args=[document_id, first_page_only],
+            countdown=PREGENERATE_RETRY_DELAY)
+        return
+
+    try:
+        try:
+            document = Document.objects.get(pk=document_id)
+        except Document.DoesNotExist:
+            return
+
+        if first_page_only:
+            page_list = document.documentpage_set.filter(page_number=1)
+        else:
+            page_list = document.documentpage_set.all()
+
+        for size in PREGENERATE_SIZES:
+            try:
+                convert_document_pages(document, page_list, size=size, file_format=DEFAULT_FILE_FORMAT, quality=QUALITY_DEFAULT)
+            except Exception:
+                # Leave the failed images to be rendered on demand
+                pass
+    finally:
+        release_node_slot(lock_file)
+
+    if first_page_only and document.documentpage_set.count() > 1:
+        task_pregenerate_document_images.delay(document_id)
+
+
+def queue_document_image_pregeneration(document):
+    task_pregenerate_document_images.delay(document.pk, True)
+
+
+@task
+def task_find_duplicates(duplicate_scan_id):
+    run_duplicate_scan(DuplicateScan.objects.get(pk=duplicate_scan_id))
+
+
+@task
+def task_expand_archive(archive_upload_id):
+    expand_archive(
+        ArchiveUpload.objects.get(pk=archive_upload_id),
+        member_callback=lambda archive_member: task_process_archive_member.delay(archive_member.pk)
+    )
+
+
+@task
+def task_process_archive_member(archive_member_id):
+    process_archive_member(ArchiveMember.objects.get(pk=archive_member_id))
@@ -5,8 +5,25 @@ unittest). These will both pass when you run "manage.py test".
 Replace these with more appropriate tests for your application.
 """
 
+import os
+import shutil
+import tempfile
+import hashlib
+from StringIO import StringIO
+
 from django.test import TestCase
 
+from documents import ingest
+from documents.literals import INGEST_CHUNK_SIZE
+from documents.staging import StagingFile, get_staging_files, \
+    get_staging_file_id, _listing_cache
+
+
+def write_file(filepath, contents):
+    destination = open(filepath, 'wb')
+    destination.write(contents)
+    destination.close()
+
 class SimpleTest(TestCase):
     def test_basic_addition(self):
         """
@@ -14,6 +31,174 @@ class SimpleTest(TestCase):
         """
         self.failUnlessEqual(1 + 1, 2)
 
+
+
+class StagingFileTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        _listing_cache.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        _listing_cache.clear()
+
+    def get_id(self, filename):
+        filepath = os.path.join(self.directory, filename)
+        return get_staging_file_id(filepath, os.stat(filepath))
+
+    def set_directory_mtime(self, mtime):
+        os.utime(self.directory, (mtime, mtime))
+
+    def test_id_unchanged(self):
+        write_file(os.path.join(self.directory, u'a'), 'contents')
+        self.assertEqual(self.get_id(u'a'), self.get_id(u'a'))
+
+    def test_id_modified(self):
+        filepath = os.path.join(self.directory, u'a')
+        write_file(filepath, 'contents')
+        os.utime(filepath, (1000000000, 1000000000))
+        staging_id = self.get_id(u'a')
+        os.utime(filepath, (1000000100, 1000000100))
+        self.assertNotEqual(self.get_id(u'a'), staging_id)
+
+    def test_id_resized(self):
+        filepath = os.path.join(self.directory, u'a')
+        write_file(filepath, 'contents')
+        os.utime(filepath, (1000000000, 1000000000))
+        staging_id = self.get_id(u'a')
+        write_file(filepath, 'other contents')
+        os.utime(filepath, (1000000000, 1000000000))
+        self.assertNotEqual(self.get_id(u'a'), staging_id)
+
+    def test_id_replaced(self):
+        filepath = os.path.join(self.directory, u'a')
+        write_file(filepath, 'contents')
+        os.utime(filepath, (1000000000, 1000000000))
+        staging_id = self.get_id(u'a')
+        # Same size and modification time, different file
+        write_file(os.path.join(self.directory, u'b'), 'CONTENTS')
+        os.utime(os.path.join(self.directory, u'b'), (1000000000, 1000000000))
+        os.rename(os.path.join(self.directory, u'b'), filepath)
+        self.assertNotEqual(self.get_id(u'a'), staging_id)
+
+    def test_listing(self):
+        write_file(os.path.join(self.directory, u'b'), 'contents')
+        write_file(os.path.join(self.directory, u'a'), 'contents')
+        os.mkdir(os.path.join(self.directory, u'directory'))
+        self.assertEqual([staging_file.filename for staging_file in get_staging_files(self.directory)], [u'a', u'b'])
+
+    def test_listing_reused(self):
+        write_file(os.path.join(self.directory, u'a'), 'contents')
+        self.set_directory_mtime(1000000000)
+        listing = get_staging_files(self.directory)
+        # A change that doesn't touch the directory's modification time
+        write_file(os.path.join(self.directory, u'b'), 'contents')
+        self.set_directory_mtime(1000000000)
+        self.failUnless(get_staging_files(self.directory) is listing)
+
+    def test_listing_invalidated(self):
+        write_file(os.path.join(self.directory, u'a'), 'contents')
+        self.set_directory_mtime(1000000000)
+        listing = get_staging_files(self.directory)
+        staging_file = listing[0]
+        write_file(os.path.join(self.directory, u'b'), 'contents')
+        self.set_directory_mtime(1000000100)
+        refreshed = get_staging_files(self.directory)
+        self.assertEqual([item.filename for item in refreshed], [u'a', u'b'])
+        # Unchanged files keep their instance and checksum
+        self.failUnless(refreshed[0] is staging_file)
+
+    def test_recently_modified_directory_listed_again(self):
+        write_file(os.path.join(self.directory, u'a'), 'contents')
+        listing = get_staging_files(self.directory)
+        write_file(os.path.join(self.directory, u'b'), 'contents')
+        # Changes within the timestamp resolution keep the same mtime
+        self.set_directory_mtime(os.stat(self.directory).st_mtime)
+        self.failIf(get_staging_files(self.directory) is listing)
+
+    def test_get_file_modified_in_place(self):
+        filepath = os.path.join(self.directory, u'a')
+        write_file(filepath, 'contents')
+        self.set_directory_mtime(1000000000)
+        cls = type('StagingFile', (StagingFile,), {})
+        cls.set_path(self.directory)
+        cls.get_all()
+        write_file(filepath, 'other contents')
+        self.set_directory_mtime(1000000000)
+        self.assertEqual(cls.get(self.get_id(u'a')).filepath, filepath)
+
+
+class ProbeFileTest(TestCase):
+    def setUp(self):
+        self.get_buffer_mimetype = ingest.get_buffer_mimetype
+        self.get_page_count = ingest.get_page_count
+        self.checksum_function = ingest.CHECKSUM_FUNCTION
+        self.sniffed = []
+        self.counted = []
+        self.mimetype = u'application/pdf'
+
+        def get_buffer_mimetype(buffer, filename):
+            self.sniffed.append(buffer)
+            return self.mimetype, u'binary'
+
+        def get_page_count(filepath):
+            self.counted.append((filepath, open(filepath, 'rb').read()))
+            return 3
+
+        ingest.get_buffer_mimetype = get_buffer_mimetype
+        ingest.get_page_count = get_page_count
+        # Spans several chunks with a partial last one
+        self.contents = os.urandom(INGEST_CHUNK_SIZE * 2 + 100)
+
+    def tearDown(self):
+        ingest.get_buffer_mimetype = self.get_buffer_mimetype
+        ingest.get_page_count = self.get_page_count
+        ingest.CHECKSUM_FUNCTION = self.checksum_function
+
+    def test_checksum(self):
+        result = ingest.probe_file(StringIO(self.contents), u'test.pdf')
+        self.assertEqual(result['checksum'], hashlib.sha256(self.contents).hexdigest())
+        self.assertEqual(result['checksum'], ingest.compute_checksum(StringIO(self.contents)))
+
+    def test_custom_checksum(self):
+        ingest.CHECKSUM_FUNCTION = lambda x: hashlib.md5(x).hexdigest()
+        result = ingest.probe_file(StringIO(self.contents), u'test.pdf')
+        self.assertEqual(result['checksum'], hashlib.md5(self.contents).hexdigest())
+
+    def test_mimetype_sniffed_once(self):
+        result = ingest.probe_file(StringIO(self.contents), u'test.pdf')
+        self.assertEqual(self.sniffed, [self.contents[:INGEST_CHUNK_SIZE]])
+        self.assertEqual(result['mimetype'], u'application/pdf')
+        self.assertEqual(result['mime_encoding'], u'binary')
+
+    def test_page_count_spooled(self):
+        result = ingest.probe_file(StringIO(self.contents), u'test.pdf')
+        self.assertEqual(result['page_count'], 3)
+        self.assertEqual(len(self.counted), 1)
+        spool_path, spooled = self.counted[0]
+        self.assertEqual(spooled, self.contents)
+        self.failIf(os.path.exists(spool_path))
+
+    def test_page_count_local_path(self):
+        handle, local_path = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            write_file(local_path, self.contents)
+            result = ingest.probe_file(StringIO(self.contents), u'test.pdf', local_path)
+            self.assertEqual(result['page_count'], 3)
+            self.assertEqual([filepath for filepath, spooled in self.counted], [local_path])
+            self.failUnless(os.path.exists(local_path))
+        finally:
+            os.remove(local_path)
+
+    def test_single_page_mimetype(self):
+        self.mimetype = u'image/png'
+        result = ingest.probe_file(StringIO(self.contents), u'test.png')
+        self.assertEqual(result['page_count'], 1)
+        self.assertEqual(self.counted, [])
+        self.assertEqual(result['checksum'], hashlib.sha256(self.contents).hexdigest())
+
+
 __test__ = {"doctest": """
 Another way to test that 1 + 1 is equal to 2.
 
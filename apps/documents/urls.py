@@ -39,7 +39,12 @@ urlpatterns = patterns('documents.views',
     url(r'^(?P<document_id>\d+)/clear_transformations/$', 'document_clear_transformations', (), 'document_clear_transformations'),
 
     url(r'^multiple/clear_transformations/$', 'document_multiple_clear_transformations', (), 'document_multiple_clear_transformations'),
+    url(r'^archive/list/$', 'archive_upload_list', (), 'archive_upload_list'),
+    url(r'^archive/(?P<archive_upload_id>\d+)/$', 'archive_upload_view', (), 'archive_upload_view'),
+
     url(r'^duplicates/list/$', 'document_find_all_duplicates', (), 'document_find_all_duplicates'),
+    url(r'^duplicates/scan/$', 'document_duplicate_scan', (), 'document_duplicate_scan'),
+    url(r'^duplicates/scan/list/$', 'document_duplicate_scan_list', (), 'document_duplicate_scan_list'),
 
     url(r'^staging_file/type/(?P<source>\w+)/(?P<staging_file_id>\w+)/preview/$', 'staging_file_preview', (), 'staging_file_preview'),
     url(r'^staging_file/type/(?P<source>\w+)/(?P<staging_file_id>\w+)/delete/$', 'staging_file_delete', (), 'staging_file_delete'),
@@ -2,6 +2,8 @@ import os
 
 from common import TEMPORARY_DIRECTORY
 
+from documents.literals import INGEST_CHUNK_SIZE
+
 try:
     from python_magic import magic
     USE_PYTHON_MAGIC = True
@@ -39,28 +41,33 @@ def document_save_to_temp_dir(document, filename, buffer_size=1024 * 1024):
     return document.save_to_file(temporary_path, buffer_size)
 
 
-def get_document_mimetype(document):
+def get_buffer_mimetype(buffer, filename):
     """
-    Determine a documents mimetype by calling the system's libmagic
-    library via python-magic or fallback to use python's mimetypes
+    Determine the mimetype and encoding of a file from its first bytes
+    by calling the system's libmagic library via python-magic or
+    fallback to guess them from the filename with python's mimetypes
     library
     """
-    file_mimetype = u''
-    file_mime_encoding = u''    
-    
+    if USE_PYTHON_MAGIC:
+        file_mimetype = magic.Magic(mime=True).from_buffer(buffer)
+        file_mime_encoding = magic.Magic(mime_encoding=True).from_buffer(buffer)
+    else:
+        file_mimetype, file_mime_encoding = mimetypes.guess_type(filename)
+
+    return file_mimetype or u'', file_mime_encoding or u''
+
+
+def get_document_mimetype(document):
+    """
+    Determine a documents mimetype from the head of its file
+    """
     if USE_PYTHON_MAGIC:
         if document.exists():
+            source = document.open()
             try:
-                source = document.open()
-                mime = magic.Magic(mime=True)
-                file_mimetype = mime.from_buffer(source.read())
-                source.seek(0)
-                mime_encoding = magic.Magic(mime_encoding=True)
-                file_mime_encoding = mime_encoding.from_buffer(source.read())
+                return get_buffer_mimetype(source.read(INGEST_CHUNK_SIZE), document.get_fullname())
             finally:
-                if source:
-                    source.close()
+                source.close()
+        return u'', u''
     else:
-        file_mimetype, file_mime_encoding = mimetypes.guess_type(document.get_fullname())
-        
-    return file_mimetype, file_mime_encoding
+        return get_buffer_mimetype(None, document.get_fullname())
@@ -1,7 +1,7 @@
 import os
-import zipfile
 import urlparse
 import copy
+from datetime import datetime, timedelta
 
 from django.utils.translation import ugettext_lazy as _
 from django.http import HttpResponseRedirect
@@ -13,7 +13,10 @@ from django.core.urlresolvers import reverse
 from django.views.generic.create_update import delete_object, update_object
 from django.conf import settings
 from django.utils.http import urlencode
-from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.exceptions import PermissionDenied
+from django.utils.cache import add_never_cache_headers
+from django.utils.safestring import mark_safe
+from django.utils.html import escape
 
 import sendfile
 from common.utils import pretty_size, parse_range, urlquote, \
@@ -22,7 +25,8 @@ from common.widgets import two_state_template
 from common.literals import PAGE_SIZE_DIMENSIONS, \
     PAGE_ORIENTATION_PORTRAIT, PAGE_ORIENTATION_LANDSCAPE
 from common.conf.settings import DEFAULT_PAPER_SIZE
-from converter.api import convert_document, QUALITY_DEFAULT
+from converter.api import convert_document, convert_document_pages, \
+    get_cached_document_image, QUALITY_DEFAULT
 from converter.exceptions import UnkownConvertError, UnknownFormat
 from converter.api import DEFAULT_ZOOM_LEVEL, DEFAULT_ROTATION, \
     DEFAULT_FILE_FORMAT, QUALITY_PRINT
@@ -41,6 +45,7 @@ from documents.conf.settings import USE_STAGING_DIRECTORY
 from documents.conf.settings import PER_USER_STAGING_DIRECTORY
 
 from documents.conf.settings import PREVIEW_SIZE
+from documents.conf.settings import MULTIPAGE_PREVIEW_SIZE
 from documents.conf.settings import THUMBNAIL_SIZE
 from documents.conf.settings import STORAGE_BACKEND
 from documents.conf.settings import ZOOM_PERCENT_STEP
@@ -49,6 +54,8 @@ from documents.conf.settings import ZOOM_MIN_LEVEL
 from documents.conf.settings import ROTATION_STEP
 from documents.conf.settings import PRINT_SIZE
 from documents.conf.settings import RECENT_COUNT
+from documents.conf.settings import PREGENERATE_IMAGES
+from documents.conf.settings import PREGENERATE_TIMEOUT
 
 from documents.literals import PERMISSION_DOCUMENT_CREATE, \
     PERMISSION_DOCUMENT_PROPERTIES_EDIT, \
@@ -68,10 +75,15 @@ from documents.forms import DocumentTypeSelectForm, \
         DocumentTypeFilenameForm, DocumentTypeFilenameForm_create
 from documents.wizards import DocumentCreateWizard
 from documents.models import Document, DocumentType, DocumentPage, \
-    DocumentPageTransformation, RecentDocument, DocumentTypeFilename
+    DocumentPageTransformation, RecentDocument, DocumentTypeFilename, \
+    DuplicateScan, ArchiveUpload
+from documents.duplicates import get_document_duplicates, \
+    get_latest_duplicate_scan, DuplicateClusters
+from documents.archives import is_archive, create_archive_upload
+from documents.tasks import task_find_duplicates, task_expand_archive
 from documents.staging import create_staging_file_class
 from documents.literals import PICTURE_ERROR_SMALL, PICTURE_ERROR_MEDIUM, \
-    PICTURE_UNKNOWN_SMALL, PICTURE_UNKNOWN_MEDIUM
+    PICTURE_UNKNOWN_SMALL, PICTURE_UNKNOWN_MEDIUM, PICTURE_PENDING
 from documents.literals import UPLOAD_SOURCE_LOCAL, \
     UPLOAD_SOURCE_STAGING, UPLOAD_SOURCE_USER_STAGING
     
@@ -144,18 +156,11 @@ def _handle_save_document(request, document, form=None):
 
 
 def _handle_zip_file(request, uploaded_file, document_type=None):
-    filename = getattr(uploaded_file, 'filename', getattr(uploaded_file, 'name', ''))
-    if filename.lower().endswith('zip'):
-        zfobj = zipfile.ZipFile(uploaded_file)
-        for filename in zfobj.namelist():
-            if not filename.endswith('/'):
-                zip_document = Document(file=SimpleUploadedFile(
-                    name=filename, content=zfobj.read(filename)))
-                if document_type:
-                    zip_document.document_type = document_type
-                zip_document.save()
-                _handle_save_document(request, zip_document)
-                messages.success(request, _(u'Extracted file: %s, uploaded successfully.') % filename)
+    if is_archive(uploaded_file):
+        # The members are stored and processed in the background
+        archive_upload = create_archive_upload(request.user, uploaded_file, document_type, request.GET.urlencode())
+        task_expand_archive.delay(archive_upload.pk)
+        messages.success(request, _(u'Compressed file: %s, queued for expansion.') % archive_upload.filename)
         #Signal that uploaded file was a zip file
         return True
     else:
@@ -422,17 +427,21 @@ def document_edit(request, document_id):
         old_document = copy.copy(document)
         form = DocumentForm_edit(request.POST, instance=document)
         if form.is_valid():
-            warnings = delete_indexes(document)
-            if request.user.is_staff or request.user.is_superuser:
-                for warning in warnings:
-                    messages.warning(request, warning)
-
-            document.file_filename = form.cleaned_data['new_filename']
-            document.description = form.cleaned_data['description']
-
+            new_filename = form.cleaned_data['new_filename']
             if 'document_type_available_filenames' in form.cleaned_data:
                 if form.cleaned_data['document_type_available_filenames']:
-                    document.file_filename = form.cleaned_data['document_type_available_filenames'].filename
+                    new_filename = form.cleaned_data['document_type_available_filenames'].filename
+
+            if new_filename != document.file_filename:
+                # Links are named after the file, remove them while the
+                # old name is known, update_indexes recreates them
+                warnings = delete_indexes(document)
+                if request.user.is_staff or request.user.is_superuser:
+                    for warning in warnings:
+                        messages.warning(request, warning)
+
+            document.file_filename = new_filename
+            document.description = form.cleaned_data['description']
 
             document.save()
             create_history(HISTORY_DOCUMENT_EDITED, document, {'user': request.user, 'diff': return_diff(old_document, document, ['file_filename', 'description'])})
@@ -503,8 +512,20 @@ def get_document_image(request, document_id, size=PREVIEW_SIZE, quality=QUALITY_
         for warning in warnings:
             messages.warning(request, _(u'Page transformation error: %s') % warning)
 
+    pending = False
     try:
-        output_file = convert_document(document, **arguments)
+        output_file = None
+        if PREGENERATE_IMAGES and size in [THUMBNAIL_SIZE, MULTIPAGE_PREVIEW_SIZE, PREVIEW_SIZE] and zoom == DEFAULT_ZOOM_LEVEL and rotation == DEFAULT_ROTATION and document.date_added > datetime.now() - timedelta(seconds=PREGENERATE_TIMEOUT):
+            # Don't block on the converter while the image is still
+            # being rendered by the pregeneration tasks, a placeholder
+            # is served until it is in the cache
+            output_file = get_cached_document_image(document, **arguments)
+            if not output_file:
+                pending = True
+                output_file = os.path.join(settings.MEDIA_ROOT, u'images', PICTURE_PENDING)
+
+        if not output_file:
+            output_file = convert_document(document, **arguments)
     except UnkownConvertError, e:
         if request.user.is_staff or request.user.is_superuser:
             messages.error(request, e)
@@ -525,7 +546,10 @@ def get_document_image(request, document_id, size=PREVIEW_SIZE, quality=QUALITY_
         else:
             output_file = os.path.join(settings.MEDIA_ROOT, u'images', PICTURE_ERROR_MEDIUM)
     finally:
-        return sendfile.sendfile(request, output_file)
+        response = sendfile.sendfile(request, output_file)
+        if pending:
+            add_never_cache_headers(response)
+        return response
 
 
 def document_download(request, document_id):
@@ -689,39 +713,130 @@ def document_find_duplicates(request, document_id):
     check_permissions(request.user, [PERMISSION_DOCUMENT_VIEW])
 
     document = get_object_or_404(Document, pk=document_id)
-    return _find_duplicate_list(request, [document], include_source=True, confirmation=False)
+    duplicates = get_document_duplicates(document)
+    if duplicates.count() < 2:
+        duplicates = Document.objects.none()
+
+    return render_to_response('generic_list.html', {
+        'object_list': duplicates,
+        'title': _(u'duplicated documents'),
+    }, context_instance=RequestContext(request))
 
 
-def _find_duplicate_list(request, source_document_list=Document.objects.all(), include_source=False, confirmation=True):
+def document_find_all_duplicates(request):
+    check_permissions(request.user, [PERMISSION_DOCUMENT_VIEW])
+
+    duplicate_scan = get_latest_duplicate_scan()
+    if not duplicate_scan:
+        return HttpResponseRedirect(reverse('document_duplicate_scan'))
+
+    return render_to_response('generic_list.html', {
+        'object_list': DuplicateClusters(duplicate_scan),
+        'title': _(u'duplicated documents found on %s') % duplicate_scan.datetime_finished.strftime('%Y-%m-%d %H:%M'),
+        'hide_object': True,
+        'hide_links': True,
+        'extra_columns': [
+            {'name': _(u'checksum'), 'attribute': 'checksum'},
+            {'name': _(u'count'), 'attribute': 'document_count'},
+            {'name': _(u'documents'), 'attribute': lambda x: mark_safe(u', '.join([u'<a href="%s">%s</a>' % (document.get_absolute_url(), escape(document)) for document in x.documents]))},
+        ],
+    }, context_instance=RequestContext(request))
+
+
+def document_duplicate_scan(request):
+    check_permissions(request.user, [PERMISSION_DOCUMENT_VIEW])
+
     previous = request.POST.get('previous', request.GET.get('previous', request.META.get('HTTP_REFERER', None)))
 
-    if confirmation and request.method != 'POST':
+    if request.method != 'POST':
         return render_to_response('generic_confirm.html', {
             'previous': previous,
             'title': _(u'Are you sure you wish to find all duplicates?'),
-            'message': _(u'On large databases this operation may take some time to execute.'),
+            'message': _(u'The search runs in the background, the duplicates found will be listed once it finishes.'),
             'form_icon': u'page_refresh.png',
         }, context_instance=RequestContext(request))
     else:
-        duplicated = []
-        for document in source_document_list:
-            if document.pk not in duplicated:
-                results = Document.objects.filter(checksum=document.checksum).exclude(id__in=duplicated).exclude(pk=document.pk).values_list('pk', flat=True)
-                duplicated.extend(results)
+        try:
+            duplicate_scan = DuplicateScan.objects.create()
+            task_find_duplicates.delay(duplicate_scan.pk)
+            messages.success(request, _(u'Duplicate search queued successfully.'))
+        except Exception, e:
+            messages.error(request, _(u'Duplicate search error: %s') % e)
 
-                if include_source and results:
-                    duplicated.append(document.pk)
-
-        return render_to_response('generic_list.html', {
-            'object_list': Document.objects.filter(pk__in=duplicated),
-            'title': _(u'duplicated documents'),
-        }, context_instance=RequestContext(request))
+        return HttpResponseRedirect(reverse('document_duplicate_scan_list'))
 
 
-def document_find_all_duplicates(request):
+def document_duplicate_scan_list(request):
     check_permissions(request.user, [PERMISSION_DOCUMENT_VIEW])
 
-    return _find_duplicate_list(request, include_source=True)
+    return object_list(
+        request,
+        queryset=DuplicateScan.objects.all(),
+        template_name='generic_list.html',
+        extra_context={
+            'title': _(u'duplicate searches'),
+            'hide_object': True,
+            'extra_columns': [
+                {'name': _(u'submitted'), 'attribute': lambda x: unicode(x.datetime_submitted).split('.')[0], 'keep_together': True},
+                {'name': _(u'finished'), 'attribute': lambda x: unicode(x.datetime_finished).split('.')[0] if x.datetime_finished else u'', 'keep_together': True},
+                {'name': _(u'state'), 'attribute': lambda x: x.get_state_display()},
+                {'name': _(u'clusters'), 'attribute': 'cluster_count'},
+                {'name': _(u'documents'), 'attribute': 'document_count'},
+                {'name': _(u'result'), 'attribute': 'result'},
+            ],
+        },
+    )
+
+
+def archive_upload_list(request):
+    check_permissions(request.user, [PERMISSION_DOCUMENT_CREATE])
+
+    queryset = ArchiveUpload.objects.all()
+    if not (request.user.is_staff or request.user.is_superuser):
+        queryset = queryset.filter(user=request.user)
+
+    return object_list(
+        request,
+        queryset=queryset,
+        template_name='generic_list.html',
+        extra_context={
+            'title': _(u'compressed file uploads'),
+            'extra_columns': [
+                {'name': _(u'user'), 'attribute': 'user'},
+                {'name': _(u'submitted'), 'attribute': lambda x: unicode(x.datetime_submitted).split('.')[0], 'keep_together': True},
+                {'name': _(u'state'), 'attribute': lambda x: x.get_state_display()},
+                {'name': _(u'progress'), 'attribute': lambda x: x.get_progress_display()},
+                {'name': _(u'result'), 'attribute': 'result'},
+            ],
+        },
+    )
+
+
+def archive_upload_view(request, archive_upload_id):
+    check_permissions(request.user, [PERMISSION_DOCUMENT_CREATE])
+
+    archive_upload = get_object_or_404(ArchiveUpload, pk=archive_upload_id)
+    if archive_upload.user != request.user and not (request.user.is_staff or request.user.is_superuser):
+        raise PermissionDenied
+
+    return object_list(
+        request,
+        queryset=archive_upload.archivemember_set.select_related('document'),
+        template_name='generic_list.html',
+        extra_context={
+            'title': _(u'files of: %(filename)s, %(progress)s') % {
+                'filename': archive_upload, 'progress': archive_upload.get_progress_display()},
+            'object': archive_upload,
+            'hide_object': True,
+            'hide_links': True,
+            'extra_columns': [
+                {'name': _(u'file'), 'attribute': 'filename'},
+                {'name': _(u'document'), 'attribute': lambda x: mark_safe(u'<a href="%s">%s</a>' % (x.document.get_absolute_url(), escape(x.document))) if x.document else u''},
+                {'name': _(u'state'), 'attribute': lambda x: x.get_state_display()},
+                {'name': _(u'message'), 'attribute': 'message'},
+            ],
+        },
+    )
 
 
 def document_clear_transformations(request, document_id=None, document_id_list=None):
@@ -1044,9 +1159,6 @@ def document_hard_copy(request, document_id):
 
     arguments, warnings = calculate_converter_arguments(document, size=PRINT_SIZE, file_format=DEFAULT_FILE_FORMAT, quality=QUALITY_PRINT)
 
-    # Pre-generate
-    convert_document(document, **arguments)
-
     # Extract dimension values ignoring any unit
     page_width = request.GET.get('page_width', dict(PAGE_SIZE_DIMENSIONS)[DEFAULT_PAPER_SIZE][0])
     page_height = request.GET.get('page_height', dict(PAGE_SIZE_DIMENSIONS)[DEFAULT_PAPER_SIZE][1])
@@ -1063,6 +1175,11 @@ def document_hard_copy(request, document_id):
     else:
         pages = document.documentpage_set.all()
 
+    # Pre-generate all the pages to print in one pass
+    convert_document_pages(document, pages, size=PRINT_SIZE, file_format=DEFAULT_FILE_FORMAT, quality=QUALITY_PRINT)
+    # The first page is always needed to calculate the print aspect ratio
+    convert_document(document, **arguments)
+
     return render_to_response('document_print.html', {
         'object': document,
         'page_aspect': width / height,
@@ -0,0 +1,308 @@
+"""
+Unattended ingestion of the files delivered to watched staging folders.
+New files are noticed with inotify when pyinotify is installed and by
+listing the folders periodically otherwise, a file is only ingested
+once its size and modification time have stopped changing and the
+ingestions run in a fixed number of worker threads
+"""
+import os
+import time
+import threading
+import Queue
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import File
+from django.db import connection
+
+from metadata.api import save_metadata_list
+from metadata.models import MetadataType
+from document_indexing.api import update_indexes
+from history.api import create_history
+
+from documents.models import Document, DocumentType, RecentDocument
+from documents.staging import get_staging_files, get_staging_file_id
+from documents.literals import HISTORY_DOCUMENT_CREATED, \
+    WATCH_FOLDER_FAILED_DIRECTORY, WATCH_FOLDER_PROCESSING_DIRECTORY, \
+    WATCH_FOLDER_TICK
+
+try:
+    import pyinotify
+except ImportError:
+    pyinotify = None
+
+
+class WatchFolder(object):
+    """
+    Staging folder along with the defaults given to the documents
+    ingested from it
+    """
+    def __init__(self, path, document_type=None, metadata=None, user=None):
+        self.path = os.path.abspath(path)
+        if not os.path.isdir(self.path):
+            raise ImproperlyConfigured(u'Watch folder: %s, is not a directory' % self.path)
+
+        try:
+            self.document_type = DocumentType.objects.get(name=document_type) if document_type else None
+            self.user = User.objects.get(username=user) if user else None
+            self.metadata_list = [
+                {'id': MetadataType.objects.get(name=name).pk, 'value': value}
+                for name, value in (metadata or {}).items()
+            ]
+        except (DocumentType.DoesNotExist, User.DoesNotExist, MetadataType.DoesNotExist), exc:
+            raise ImproperlyConfigured(u'Watch folder: %s, %s' % (self.path, exc))
+
+    def __unicode__(self):
+        return self.path
+
+    def get_files(self):
+        """
+        Return the paths of the files in the folder, hidden files are
+        skipped as scanners and file transfers often write to a hidden
+        name before renaming
+        """
+        return [staging_file.filepath for staging_file in get_staging_files(self.path) if not staging_file.filename.startswith(u'.')]
+
+    def get_subdirectory(self, name):
+        directory = os.path.join(self.path, name)
+        if not os.path.isdir(directory):
+            os.mkdir(directory)
+        return directory
+
+
+class WatchedFile(File):
+    """
+    File of a watch folder, its path lets the document probe read it in
+    place and lets filesystem storages move it instead of copying it
+    """
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def ingest_file(watch_folder, filepath):
+    """
+    Create a document from a file of a watch folder and remove the file,
+    a file that can't be stored is moved to the folder's failed
+    directory.  The file is moved out of the folder before being stored
+    so it isn't ingested twice if the process is interrupted.  Return the
+    new document and the indexing warnings
+    """
+    filename = os.path.basename(filepath)
+    processing_path = os.path.join(watch_folder.get_subdirectory(WATCH_FOLDER_PROCESSING_DIRECTORY), filename)
+    os.rename(filepath, processing_path)
+
+    try:
+        source = WatchedFile(open(processing_path, 'rb'), name=filename)
+        try:
+            document = Document(file=source)
+            if watch_folder.document_type:
+                document.document_type = watch_folder.document_type
+            document.save()
+        finally:
+            source.close()
+    except:
+        if os.path.exists(processing_path):
+            os.rename(processing_path, os.path.join(watch_folder.get_subdirectory(WATCH_FOLDER_FAILED_DIRECTORY), filename))
+        raise
+
+    try:
+        os.unlink(processing_path)
+    except OSError:
+        # Moved by the storage
+        pass
+
+    if watch_folder.user:
+        RecentDocument.objects.add_document_for_user(watch_folder.user, document)
+    save_metadata_list(watch_folder.metadata_list, document, create=True)
+    warnings = update_indexes(document)
+    if watch_folder.user:
+        create_history(HISTORY_DOCUMENT_CREATED, document, {'user': watch_folder.user})
+
+    return document, warnings
+
+
+class SettlingFiles(object):
+    """
+    Files that may still be being written, a file is settled once its
+    stat data has not changed for settle_time seconds
+    """
+    def __init__(self, settle_time):
+        self.settle_time = settle_time
+        # filepath: (watch folder, staging id, time the id was first seen)
+        self.files = {}
+
+    def add(self, watch_folder, filepath):
+        self.files.setdefault(filepath, (watch_folder, None, None))
+
+    def remove(self, filepath):
+        self.files.pop(filepath, None)
+
+    def get_settled(self):
+        """
+        Return a list of (watch folder, filepath) tuples of the files
+        settled, files that disappeared are forgotten
+        """
+        now = time.time()
+        settled = []
+        for filepath, (watch_folder, staging_id, since) in self.files.items():
+            try:
+                current_id = get_staging_file_id(filepath, os.stat(filepath))
+            except OSError:
+                del self.files[filepath]
+                continue
+
+            if current_id != staging_id:
+                self.files[filepath] = (watch_folder, current_id, now)
+            elif now - since >= self.settle_time:
+                settled.append((watch_folder, filepath))
+
+        return settled
+
+
+class IngestionPool(object):
+    """
+    Fixed number of threads ingesting the files submitted, callback is
+    called from the threads with the watch folder, the filepath, the
+    new document or None and the list of warnings or the exception
+    raised
+    """
+    def __init__(self, workers, callback=None):
+        self.callback = callback
+        self.queue = Queue.Queue(workers)
+        self.in_progress = set()
+        self.lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._work) for i in range(workers)]
+        for thread in self.threads:
+            thread.setDaemon(True)
+            thread.start()
+
+    def submit(self, watch_folder, filepath):
+        """
+        Queue a file for ingestion, return False when every worker is
+        busy so the caller can try again later
+        """
+        self.lock.acquire()
+        try:
+            if filepath in self.in_progress:
+                return True
+            try:
+                self.queue.put_nowait((watch_folder, filepath))
+            except Queue.Full:
+                return False
+            self.in_progress.add(filepath)
+            return True
+        finally:
+            self.lock.release()
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+
+            watch_folder, filepath = item
+            try:
+                try:
+                    document, warnings = ingest_file(watch_folder, filepath)
+                except Exception, exc:
+                    result = (None, exc)
+                else:
+                    result = (document, warnings)
+                if self.callback:
+                    self.callback(watch_folder, filepath, *result)
+            finally:
+                # Each thread has a connection of its own
+                connection.close()
+                self.lock.acquire()
+                self.in_progress.discard(filepath)
+                self.lock.release()
+
+    def stop(self):
+        for thread in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+
+
+class PollingMonitor(object):
+    """
+    Notice new files by listing the watch folders every poll_interval
+    seconds
+    """
+    def __init__(self, watch_folders, settling_files, poll_interval):
+        self.watch_folders = watch_folders
+        self.settling_files = settling_files
+        self.poll_interval = poll_interval
+        self.last_scan = None
+
+    def scan(self):
+        for watch_folder in self.watch_folders:
+            for filepath in watch_folder.get_files():
+                self.settling_files.add(watch_folder, filepath)
+        self.last_scan = time.time()
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+        if time.time() - self.last_scan >= self.poll_interval:
+            self.scan()
+
+    def close(self):
+        pass
+
+
+class InotifyMonitor(PollingMonitor):
+    """
+    Notice new and modified files with inotify, the folders are only
+    listed at start up and when the kernel's event queue overflowed
+    """
+    def __init__(self, *args, **kwargs):
+        super(InotifyMonitor, self).__init__(*args, **kwargs)
+        self.folders_by_path = dict([(watch_folder.path, watch_folder) for watch_folder in self.watch_folders])
+        self.watch_manager = pyinotify.WatchManager()
+        self.notifier = pyinotify.Notifier(self.watch_manager, self.process_event)
+        mask = pyinotify.IN_CLOSE_WRITE | pyinotify.IN_MOVED_TO | pyinotify.IN_MODIFY
+        for watch_folder in self.watch_folders:
+            self.watch_manager.add_watch(watch_folder.path, mask)
+
+    def process_event(self, event):
+        if event.mask & pyinotify.IN_Q_OVERFLOW:
+            self.scan()
+        elif not event.dir and not event.name.startswith(u'.'):
+            watch_folder = self.folders_by_path.get(os.path.abspath(event.path))
+            if watch_folder:
+                self.settling_files.add(watch_folder, event.pathname)
+
+    def wait(self, timeout):
+        if self.notifier.check_events(timeout=int(timeout * 1000)):
+            self.notifier.read_events()
+            self.notifier.process_events()
+
+    def close(self):
+        self.notifier.stop()
+
+
+def get_monitor_class(use_inotify=True):
+    if use_inotify and pyinotify:
+        return InotifyMonitor
+    else:
+        return PollingMonitor
+
+
+def run_watch_folders(watch_folders, settle_time, poll_interval, workers, callback=None, use_inotify=True):
+    """
+    Ingest the files delivered to the watch folders until interrupted
+    """
+    settling_files = SettlingFiles(settle_time)
+    monitor = get_monitor_class(use_inotify)(watch_folders, settling_files, poll_interval)
+    pool = IngestionPool(workers, callback)
+    try:
+        # Files delivered while nothing was watching
+        monitor.scan()
+        while True:
+            monitor.wait(WATCH_FOLDER_TICK)
+            for watch_folder, filepath in settling_files.get_settled():
+                if pool.submit(watch_folder, filepath):
+                    settling_files.remove(filepath)
+    finally:
+        monitor.close()
+        pool.stop()
@@ -6,15 +6,90 @@ import types
 import datetime
 
 from django.db.models import Q
+from django.db.models.sql.constants import LOOKUP_SEP
+from django.db.models.signals import post_save, post_delete
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils.importlib import import_module
 
 from dynamic_search.conf.settings import LIMIT
+from dynamic_search.conf.settings import BACKEND
+from dynamic_search.literals import TERM_MAX_LENGTH
 
 registered_search_dict = {}
+registered_dependencies = {}
+
+
+def _lazy_load(fn):
+    _cached = []
+
+    def _decorated():
+        if not _cached:
+            _cached.append(fn())
+        return _cached[0]
+    return _decorated
+
+
+@_lazy_load
+def get_backend():
+    """
+    Return the search backend module, loaded on first use as the
+    backends import this module
+    """
+    try:
+        return import_module(BACKEND)
+    except ImportError:
+        raise ImportError(u'Missing or incorrect search backend: %s' % BACKEND)
+
+
+def get_registered_model(model):
+    """
+    Return the registry entry of a searchable model or None
+    """
+    for values in registered_search_dict.values():
+        if values['model'] == model:
+            return values
+
+
+def object_changed(sender, instance, **kwargs):
+    get_backend().update_object(instance)
+
+
+def dependency_changed(sender, instance, **kwargs):
+    for accessor in registered_dependencies.get(sender, []):
+        try:
+            parent = accessor(instance)
+        except ObjectDoesNotExist:
+            continue
+
+        if parent is not None and get_registered_model(parent.__class__):
+            get_backend().update_object(parent)
 
 
 def register(model_name, model, title, fields):
     registered_search_dict.setdefault(model_name, {'model': model, 'fields': [], 'title': title})
     registered_search_dict[model_name]['fields'].extend(fields)
+    post_save.connect(object_changed, sender=model, dispatch_uid=u'search_object_changed_%s' % model_name)
+    post_delete.connect(object_changed, sender=model, dispatch_uid=u'search_object_deleted_%s' % model_name)
+
+
+def register_dependency(model, accessor):
+    """
+    Register a model whose instances contribute to the searchable
+    fields of another object, accessor must return that object
+    """
+    registered_dependencies.setdefault(model, []).append(accessor)
+    post_save.connect(dependency_changed, sender=model, dispatch_uid=u'search_dependency_changed_%s' % model.__name__)
+    post_delete.connect(dependency_changed, sender=model, dispatch_uid=u'search_dependency_deleted_%s' % model.__name__)
+
+
+def tokenize(text, findtokens=re.compile(r'\w+', re.UNICODE).findall):
+    """
+    Split a text in lowercase word tokens, as stored in the search index.
+    Example:
+        >>> tokenize(u'Invoice #42-B, ACME')
+        [u'invoice', u'42', u'b', u'acme']
+    """
+    return [token[:TERM_MAX_LENGTH] for token in findtokens(unicode(text).lower())]
 
 
 def normalize_query(query_string,
@@ -30,10 +105,12 @@ def normalize_query(query_string,
     return [normspace(' ', (t[0] or t[1]).strip()) for t in findterms(query_string)]
 
 
-def get_query(terms, search_fields):
+def get_query(terms, search_fields, model=None):
     """
     Returns a query, that is a combination of Q objects. That combination
     aims to search keywords within a model by testing the given search fields.
+    When the model is given, lookups spanning a relation are turned into
+    subqueries so the joins of each relation don't multiply each other's rows.
     """
     queries = []
     for term in terms:
@@ -48,6 +125,8 @@ def get_query(terms, search_fields):
 
             if field_name:
                 q = Q(**{'%s__%s' % (field_name, comparison): term})
+                if model and LOOKUP_SEP in field_name:
+                    q = Q(pk__in=model.objects.filter(q).values('pk'))
                 if or_query is None:
                     or_query = q
                 else:
@@ -57,11 +136,69 @@ def get_query(terms, search_fields):
     return queries
 
 
-def perform_search(query_string, field_list=None):
+class SearchResults(object):
+    """
+    Ordered results of a search spanning several models.  Counts are
+    computed by the backends and only the slices requested are fetched,
+    which lets the list be handed directly to a paginator
+    """
+    def __init__(self, result_sets=None):
+        self.result_sets = result_sets or []
+        self.count_times = []
+        self._counts = None
+
+    def get_counts(self):
+        if self._counts is None:
+            self._counts = []
+            for result_set in self.result_sets:
+                start_time = datetime.datetime.now()
+                self._counts.append(result_set.count())
+                self.count_times.append(datetime.datetime.now() - start_time)
+        return self._counts
+
+    def count(self):
+        return sum(self.get_counts())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.count())
+            stop = min(stop, start + LIMIT)
+            results = []
+            offset = 0
+            for result_set, count in zip(self.result_sets, self.get_counts()):
+                if start < offset + count and stop > offset:
+                    results.extend(result_set[max(start - offset, 0):min(stop - offset, count)])
+                offset += count
+            return results[::step]
+        else:
+            if key < 0:
+                key += self.count()
+            results = self[key:key + 1] if key >= 0 else []
+            if not results:
+                raise IndexError(u'Search result index out of range')
+            return results[0]
+
+    def __iter__(self):
+        for result_set, count in zip(self.result_sets, self.get_counts()):
+            for offset in range(0, count, LIMIT):
+                for result in result_set[offset:offset + LIMIT]:
+                    yield result
+
+
+def perform_search(query_string, field_list=None, explain=False):
+    """
+    Return the results of a search as a SearchResults instance, results
+    from the same model are ordered and never repeated as each model is
+    queried with a single combined query.  With explain, the query
+    generated for each model and the time taken to count its results
+    are returned too
+    """
     model_list = {}
-    flat_list = []
-    result_count = 0
-    shown_result_count = 0
+    flat_list = SearchResults()
+    explain_list = []
     elapsed_time = 0
     start_time = datetime.datetime.now()
 
@@ -98,41 +235,33 @@ def perform_search(query_string, field_list=None):
                 except ValueError:
                     pass
 
-        for model, data in search_dict.items():
-            title = data['title']
-            queries = []
-
-            for query_entry in data['query_entries']:
-                queries.extend(get_query(query_entry['terms'], query_entry['field_name']))
-
-            model_result_ids = None
-            for query in queries:
-                single_result_ids = set(model.objects.filter(query).values_list('pk', flat=True))
-                #Convert queryset to python set and perform the
-                #AND operation on the program and not as a query
-                if model_result_ids == None:
-                    model_result_ids = single_result_ids
-                else:
-                    model_result_ids &= single_result_ids
+        backend = get_backend()
+        titles = []
+        for model, data in sorted(search_dict.items(), key=lambda x: unicode(x[1]['title'])):
+            titles.append(data['title'])
+            flat_list.result_sets.append(backend.search_model(model, data['query_entries']))
 
-            if model_result_ids == None:
-                model_result_ids = []
+        if explain:
+            for title, result_set, count, count_time in zip(titles, flat_list.result_sets, flat_list.get_counts(), flat_list.count_times):
+                explain_list.append({
+                    'title': title,
+                    'query': backend.explain(result_set),
+                    'count': count,
+                    'elapsed_time': unicode(count_time).split(':')[2]
+                })
 
-            result_count += len(model_result_ids)
-            results = model.objects.in_bulk(list(model_result_ids)[: LIMIT]).values()
-            shown_result_count += len(results)
-            if results:
-                model_list[title] = results
-                for result in results:
-                    if result not in flat_list:
-                        flat_list.append(result)
+        for title, result_set, count in zip(titles, flat_list.result_sets, flat_list.get_counts()):
+            if count:
+                model_list[title] = result_set
 
         elapsed_time = unicode(datetime.datetime.now() - start_time).split(':')[2]
 
     return {
         'model_list': model_list,
         'flat_list': flat_list,
-        'shown_result_count': shown_result_count,
-        'result_count': result_count,
-        'elapsed_time': elapsed_time
+        # Every result is reachable by paging, kept for compatibility
+        'shown_result_count': flat_list.count(),
+        'result_count': flat_list.count(),
+        'elapsed_time': elapsed_time,
+        'explain': explain_list
     }
@@ -0,0 +1,231 @@
+"""
+Search backend that looks up the terms of a query in an inverted index
+of the registered fields, maintained incrementally from a queue of
+changed objects
+"""
+import math
+
+from django.db import connection, transaction
+from django.contrib.contenttypes.models import ContentType
+
+from common.utils import insert_rows
+
+from dynamic_search.api import registered_search_dict, \
+    get_registered_model, tokenize
+from dynamic_search.models import IndexedTerm, IndexedPosting, \
+    IndexQueueEntry
+from dynamic_search.literals import CANDIDATE_FILTER_LIMIT, \
+    INDEX_QUEUE_BATCH_SIZE, QUERY_CHUNK_SIZE
+
+
+def get_term_postings(content_type, field_names, token, candidates=None, with_positions=False):
+    """
+    Return a dictionary mapping the id of every object containing the
+    token to a list of (field name, frequency, positions) tuples
+    """
+    queryset = IndexedPosting.objects.filter(content_type=content_type, field_name__in=field_names, term__term=token)
+    if candidates is not None and len(candidates) <= CANDIDATE_FILTER_LIMIT:
+        queryset = queryset.filter(object_id__in=list(candidates))
+
+    columns = ['object_id', 'field_name', 'frequency']
+    if with_positions:
+        columns.append('positions')
+
+    postings = {}
+    for row in queryset.values_list(*columns):
+        if candidates is None or row[0] in candidates:
+            positions = set([int(position) for position in row[3].split(u',')]) if with_positions else None
+            postings.setdefault(row[0], []).append((row[1], row[2], positions))
+
+    return postings
+
+
+def get_document_frequency(content_type, field_names, token):
+    return IndexedPosting.objects.filter(content_type=content_type, field_name__in=field_names, term__term=token).values('object_id').distinct().count()
+
+
+def search_term(content_type, field_names, tokens, object_count, candidates=None):
+    """
+    Return a dictionary mapping the ids of the objects matching every
+    token, as a phrase when there is more than one, to their score
+    """
+    frequencies = dict([(token, get_document_frequency(content_type, field_names, token)) for token in set(tokens)])
+    if not all(frequencies.values()):
+        return {}
+
+    # Intersect the posting lists starting with the rarest token
+    phrase = len(tokens) > 1
+    token_postings = {}
+    for token in sorted(frequencies.keys(), key=lambda x: frequencies[x]):
+        postings = get_term_postings(content_type, field_names, token, candidates, with_positions=phrase)
+        if not postings:
+            return {}
+        token_postings[token] = postings
+        candidates = set(postings.keys())
+
+    idf = sum([math.log(1.0 + float(object_count) / frequencies[token]) for token in tokens])
+    scores = {}
+    for object_id in candidates:
+        if phrase:
+            matches = 0
+            first_postings = token_postings[tokens[0]][object_id]
+            for field_name, frequency, positions in first_postings:
+                field_positions = []
+                for token in tokens:
+                    for posting_field_name, posting_frequency, posting_positions in token_postings[token][object_id]:
+                        if posting_field_name == field_name:
+                            field_positions.append(posting_positions)
+                            break
+
+                if len(field_positions) == len(tokens):
+                    for start in positions:
+                        if all([start + offset in field_positions[offset] for offset in range(1, len(tokens))]):
+                            matches += 1
+        else:
+            matches = sum([frequency for field_name, frequency, positions in token_postings[tokens[0]][object_id]])
+
+        if matches:
+            scores[object_id] = (1.0 + math.log(matches)) * idf
+
+    return scores
+
+
+class RankedResults(object):
+    """
+    Object ids ordered by score, objects are only fetched for the
+    slices requested
+    """
+    def __init__(self, model, ranking):
+        self.model = model
+        self.ranking = ranking
+
+    def count(self):
+        return len(self.ranking)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        result_ids = self.ranking[key]
+        results = self.model.objects.in_bulk(result_ids)
+        return [results[object_id] for object_id in result_ids if object_id in results]
+
+
+def search_model(model, query_entries):
+    content_type = ContentType.objects.get_for_model(model)
+    object_count = model.objects.count()
+
+    scores = None
+    for query_entry in query_entries:
+        for term in query_entry['terms']:
+            tokens = tokenize(term)
+            if not tokens:
+                continue
+
+            term_scores = search_term(content_type, query_entry['field_name'], tokens, object_count, candidates=scores)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = dict([(object_id, score + term_scores[object_id]) for object_id, score in scores.items() if object_id in term_scores])
+
+            if not scores:
+                return RankedResults(model, [])
+
+    if not scores:
+        return RankedResults(model, [])
+
+    # Ties are broken by newest object first, as with the orm backend
+    return RankedResults(model, sorted(scores.keys(), key=lambda x: (scores[x], x), reverse=True))
+
+
+def explain(result_set):
+    return u'Inverted index lookup of %s, %d ranked ids' % (result_set.model._meta.verbose_name, result_set.count())
+
+
+@transaction.commit_on_success
+def index_object(model, object_id):
+    """
+    Replace the index entries of an object with the tokens currently
+    found in each of its registered fields
+    """
+    content_type = ContentType.objects.get_for_model(model)
+    IndexedPosting.objects.delete_for_object(content_type, object_id)
+
+    # Raw statements don't mark the transaction as dirty
+    transaction.set_dirty()
+
+    queryset = model.objects.filter(pk=object_id)
+    if not queryset.exists():
+        return
+
+    rows = []
+    for field in get_registered_model(model)['fields']:
+        token_positions = {}
+        offset = 0
+        for value in queryset.values_list(field['name'], flat=True):
+            if value:
+                tokens = tokenize(value)
+                for position, token in enumerate(tokens):
+                    token_positions.setdefault(token, []).append(offset + position)
+                # Leave a gap so phrases don't match across values
+                offset += len(tokens) + 1
+
+        term_ids = IndexedTerm.objects.get_term_ids(token_positions.keys())
+        rows.extend([
+            (term_ids[token], content_type.pk, object_id, field['name'], len(positions), u','.join([unicode(position) for position in positions]))
+            for token, positions in token_positions.items()
+        ])
+
+    opts = IndexedPosting._meta
+    insert_rows(connection.cursor(), opts.db_table,
+        [opts.get_field(name).column for name in ('term', 'content_type', 'object_id', 'field_name', 'frequency', 'positions')],
+        rows, QUERY_CHUNK_SIZE)
+
+
+def update_object(instance):
+    # Only queue the object, repeated saves such as one per OCR'd page
+    # are coalesced into a single reindex
+    IndexQueueEntry.objects.add(ContentType.objects.get_for_model(instance), instance.pk)
+
+
+def process_queue(batch_size=INDEX_QUEUE_BATCH_SIZE):
+    """
+    Reindex a batch of queued objects, an object that fails to be
+    indexed is queued again at the end of the queue without stopping
+    the rest of the batch.  Return the number of objects indexed
+    """
+    processed = 0
+    for entry in IndexQueueEntry.objects.select_related('content_type')[:batch_size]:
+        # Dequeue before indexing so changes made meanwhile are queued again
+        IndexQueueEntry.objects.filter(pk=entry.pk).delete()
+        model = entry.content_type.model_class()
+        if model and get_registered_model(model):
+            try:
+                index_object(model, entry.object_id)
+            except Exception:
+                IndexQueueEntry.objects.add(entry.content_type, entry.object_id)
+            else:
+                processed += 1
+
+    return processed
+
+
+@transaction.commit_on_success
+def purge_index():
+    IndexQueueEntry.objects.all().delete()
+    IndexedPosting.objects.purge()
+    IndexedTerm.objects.purge()
+
+
+def rebuild_index():
+    purge_index()
+    indexed = 0
+    for values in registered_search_dict.values():
+        model = values['model']
+        for object_id in model.objects.values_list('pk', flat=True).iterator():
+            index_object(model, object_id)
+            indexed += 1
+
+    return indexed
@@ -0,0 +1,42 @@
+"""
+Search backend that queries the model fields directly, every search
+scans the tables of the registered models
+"""
+from dynamic_search.api import get_query
+
+
+def search_model(model, query_entries):
+    """
+    Compile every term of every query entry into a single ordered
+    queryset, the database does the intersection, deduplication and
+    counting in one statement
+    """
+    queryset = model.objects.all()
+    has_queries = False
+    for query_entry in query_entries:
+        for query in get_query(query_entry['terms'], query_entry['field_name'], model=model):
+            if query is not None:
+                queryset = queryset.filter(query)
+                has_queries = True
+
+    if not has_queries:
+        return model.objects.none()
+
+    return queryset.order_by('-pk')
+
+
+def explain(result_set):
+    return unicode(result_set.query)
+
+
+def update_object(instance):
+    # Nothing to maintain, the model tables are queried directly
+    pass
+
+
+def process_queue():
+    pass
+
+
+def rebuild_index():
+    return 0
@@ -9,7 +9,9 @@ register_settings(
     module=u'dynamic_search.conf.settings',
     settings=[
         {'name': u'SHOW_OBJECT_TYPE', 'global_name': u'SEARCH_SHOW_OBJECT_TYPE', 'default': True, 'hidden': True},
-        {'name': u'LIMIT', 'global_name': u'SEARCH_LIMIT', 'default': 100, 'description': _(u'Maximum amount search hits to fetch and display.')},
+        {'name': u'LIMIT', 'global_name': u'SEARCH_LIMIT', 'default': 100, 'description': _(u'Maximum amount of search hits to fetch at once, results are displayed a page at a time.')},
         {'name': u'RECENT_COUNT', 'global_name': u'SEARCH_RECENT_COUNT', 'default': 5, 'description': _(u'Maximum number of search queries to remember per user.')},
+        {'name': u'BACKEND', 'global_name': u'SEARCH_BACKEND', 'default': u'dynamic_search.backends.orm', 'description': _(u'Search backend to use.  Options are: dynamic_search.backends.orm and dynamic_search.backends.inverted_index.')},
+        {'name': u'INDEX_UPDATE_INTERVAL', 'global_name': u'SEARCH_INDEX_UPDATE_INTERVAL', 'default': 10, 'description': _(u'Interval in seconds at which pending changes are added to the search index.')},
     ]
 )
@@ -0,0 +1,12 @@
+# Longest term stored in the inverted index, longer tokens are truncated
+TERM_MAX_LENGTH = 64
+
+# Largest number of candidate ids that will be pushed into a posting
+# query as an IN clause, bigger candidate sets are intersected in Python
+CANDIDATE_FILTER_LIMIT = 500
+
+# Number of rows fetched or looked up per query when working in batches
+QUERY_CHUNK_SIZE = 500
+
+# Number of queued objects reindexed per index update run
+INDEX_QUEUE_BATCH_SIZE = 100
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from dynamic_search.api import get_backend
+from dynamic_search.conf.settings import BACKEND
+
+
+class Command(BaseCommand):
+    help = 'Discard and rebuild the search index of the configured search backend.'
+
+    def handle(self, *args, **options):
+        print 'Rebuilding search index for backend: %s' % BACKEND
+        print 'Objects indexed: %d' % get_backend().rebuild_index()
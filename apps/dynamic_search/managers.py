@@ -1,10 +1,11 @@
 import urlparse
 from datetime import datetime
 
-from django.db import models
+from django.db import models, connection
 from django.utils.http import urlencode
 
 from dynamic_search.conf.settings import RECENT_COUNT
+from dynamic_search.literals import QUERY_CHUNK_SIZE
 
 
 class RecentSearchManager(models.Manager):
@@ -30,3 +31,56 @@ class RecentSearchManager(models.Manager):
             to_delete = self.model.objects.filter(user=user)[RECENT_COUNT:]
             for recent_to_delete in to_delete:
                 recent_to_delete.delete()
+
+
+def _delete_all(model):
+    cursor = connection.cursor()
+    cursor.execute(u'DELETE FROM %s' % connection.ops.quote_name(model._meta.db_table))
+
+
+class IndexedTermManager(models.Manager):
+    def get_term_ids(self, terms):
+        """
+        Return a dictionary mapping each term to its id, creating the
+        terms not yet in the index
+        """
+        terms = list(terms)
+        term_ids = {}
+        for index in range(0, len(terms), QUERY_CHUNK_SIZE):
+            term_ids.update(self.model.objects.filter(term__in=terms[index:index + QUERY_CHUNK_SIZE]).values_list('term', 'pk'))
+
+        for term in terms:
+            if term not in term_ids:
+                indexed_term, created = self.model.objects.get_or_create(term=term)
+                term_ids[term] = indexed_term.pk
+
+        return term_ids
+
+    def purge(self):
+        _delete_all(self.model)
+
+
+class IndexedPostingManager(models.Manager):
+    def delete_for_object(self, content_type, object_id):
+        # Postings have no dependants, delete them without loading
+        # every row as the queryset delete method does
+        qn = connection.ops.quote_name
+        opts = self.model._meta
+        cursor = connection.cursor()
+        cursor.execute(u'DELETE FROM %s WHERE %s = %%s AND %s = %%s' % (
+            qn(opts.db_table),
+            qn(opts.get_field('content_type').column),
+            qn(opts.get_field('object_id').column)),
+            [content_type.pk, object_id]
+        )
+
+    def purge(self):
+        _delete_all(self.model)
+
+
+class IndexQueueEntryManager(models.Manager):
+    def add(self, content_type, object_id):
+        entry, created = self.model.objects.get_or_create(
+            content_type=content_type, object_id=object_id,
+            defaults={'datetime_queued': datetime.now()})
+        return entry
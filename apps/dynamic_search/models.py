@@ -5,9 +5,12 @@ from datetime import datetime
 from django.db import models
 from django.utils.translation import ugettext as _
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
 from django.core.urlresolvers import reverse
 
-from dynamic_search.managers import RecentSearchManager
+from dynamic_search.managers import RecentSearchManager, IndexedTermManager, \
+    IndexedPostingManager, IndexQueueEntryManager
+from dynamic_search.literals import TERM_MAX_LENGTH
 from dynamic_search.api import registered_search_dict
 
         
@@ -57,4 +60,65 @@ class RecentSearch(models.Model):
     class Meta:
         ordering = ('-datetime_created',)
         verbose_name = _(u'recent search')
-        verbose_name_plural = _(u'recent searches')        
+        verbose_name_plural = _(u'recent searches')
+
+
+class IndexedTerm(models.Model):
+    """
+    Term dictionary of the inverted search index
+    """
+    term = models.CharField(max_length=TERM_MAX_LENGTH, unique=True, verbose_name=_(u'term'))
+
+    objects = IndexedTermManager()
+
+    def __unicode__(self):
+        return self.term
+
+    class Meta:
+        verbose_name = _(u'indexed term')
+        verbose_name_plural = _(u'indexed terms')
+
+
+class IndexedPosting(models.Model):
+    """
+    Occurrences of a term in a searchable field of an object
+    """
+    term = models.ForeignKey(IndexedTerm, verbose_name=_(u'term'))
+    content_type = models.ForeignKey(ContentType, verbose_name=_(u'content type'))
+    object_id = models.PositiveIntegerField(db_index=True, verbose_name=_(u'object id'))
+    field_name = models.CharField(max_length=128, verbose_name=_(u'field name'))
+    frequency = models.PositiveIntegerField(verbose_name=_(u'frequency'))
+    # Comma separated token offsets, used to match phrases
+    positions = models.TextField(verbose_name=_(u'positions'))
+
+    objects = IndexedPostingManager()
+
+    def __unicode__(self):
+        return u'%s: %s' % (self.term, self.field_name)
+
+    def get_positions(self):
+        return [int(position) for position in self.positions.split(u',')]
+
+    class Meta:
+        verbose_name = _(u'indexed posting')
+        verbose_name_plural = _(u'indexed postings')
+
+
+class IndexQueueEntry(models.Model):
+    """
+    Object whose search index entries are out of date
+    """
+    content_type = models.ForeignKey(ContentType, verbose_name=_(u'content type'))
+    object_id = models.PositiveIntegerField(verbose_name=_(u'object id'))
+    datetime_queued = models.DateTimeField(verbose_name=_(u'datetime queued'), db_index=True)
+
+    objects = IndexQueueEntryManager()
+
+    def __unicode__(self):
+        return u'%s: %s' % (self.content_type, self.object_id)
+
+    class Meta:
+        unique_together = ('content_type', 'object_id')
+        ordering = ('datetime_queued',)
+        verbose_name = _(u'index queue entry')
+        verbose_name_plural = _(u'index queue entries')
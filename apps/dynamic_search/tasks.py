@@ -0,0 +1,11 @@
+from datetime import timedelta
+
+from celery.decorators import periodic_task
+
+from dynamic_search.api import get_backend
+from dynamic_search.conf.settings import INDEX_UPDATE_INTERVAL
+
+
+@periodic_task(run_every=timedelta(seconds=INDEX_UPDATE_INTERVAL))
+def task_process_search_index_queue():
+    get_backend().process_queue()
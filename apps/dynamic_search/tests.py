@@ -6,6 +6,13 @@ Replace these with more appropriate tests for your application.
 """
 
 from django.test import TestCase
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+
+from dynamic_search.api import tokenize
+from dynamic_search.literals import TERM_MAX_LENGTH
+from dynamic_search.models import IndexedTerm, IndexedPosting
+from dynamic_search.backends.inverted_index import search_term
 
 class SimpleTest(TestCase):
     def test_basic_addition(self):
@@ -14,6 +21,64 @@ class SimpleTest(TestCase):
         """
         self.failUnlessEqual(1 + 1, 2)
 
+
+
+class TokenizeTest(TestCase):
+    def test_lowercase_words(self):
+        self.assertEqual(tokenize(u'Invoice #42-B, ACME'), [u'invoice', u'42', u'b', u'acme'])
+
+    def test_unicode_words(self):
+        self.assertEqual(tokenize(u'Fa\xe7ade \xc9t\xe9'), [u'fa\xe7ade', u'\xe9t\xe9'])
+
+    def test_long_tokens_truncated(self):
+        self.assertEqual(tokenize(u'a' * (TERM_MAX_LENGTH + 10)), [u'a' * TERM_MAX_LENGTH])
+
+    def test_empty(self):
+        self.assertEqual(tokenize(u' ,.- '), [])
+
+
+class PhraseSearchTest(TestCase):
+    def setUp(self):
+        self.content_type = ContentType.objects.get_for_model(User)
+        self.index(1, u'title', u'The quick brown fox')
+        self.index(2, u'title', u'brown quick fox')
+        # Phrase split between two fields of the same object
+        self.index(3, u'title', u'quick')
+        self.index(3, u'description', u'brown')
+
+    def index(self, object_id, field_name, text):
+        positions = {}
+        for position, token in enumerate(tokenize(text)):
+            positions.setdefault(token, []).append(position)
+        for token, token_positions in positions.items():
+            IndexedPosting.objects.create(
+                term=IndexedTerm.objects.get_or_create(term=token)[0],
+                content_type=self.content_type,
+                object_id=object_id,
+                field_name=field_name,
+                frequency=len(token_positions),
+                positions=u','.join([unicode(position) for position in token_positions])
+            )
+
+    def search(self, text):
+        return search_term(self.content_type, [u'title', u'description'], tokenize(text), 3)
+
+    def test_single_term_matches_every_object(self):
+        self.assertEqual(sorted(self.search(u'quick').keys()), [1, 2, 3])
+
+    def test_phrase_matches_consecutive_tokens(self):
+        self.assertEqual(self.search(u'quick brown').keys(), [1])
+
+    def test_phrase_in_other_order(self):
+        self.assertEqual(self.search(u'brown quick').keys(), [2])
+
+    def test_phrase_not_found(self):
+        self.assertEqual(self.search(u'fox quick'), {})
+
+    def test_unknown_term(self):
+        self.assertEqual(self.search(u'quick zebra'), {})
+
+
 __test__ = {"doctest": """
 Another way to test that 1 + 1 is equal to 2.
 
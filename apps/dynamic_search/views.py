@@ -13,7 +13,6 @@ from dynamic_search.models import RecentSearch
 from dynamic_search.api import perform_search
 from dynamic_search.forms import SearchForm, AdvancedSearchForm
 from dynamic_search.conf.settings import SHOW_OBJECT_TYPE
-from dynamic_search.conf.settings import LIMIT
 
 
 def results(request, extra_context=None):
@@ -24,21 +23,19 @@ def results(request, extra_context=None):
         #'hide_header': True,
         'hide_links': True,
         'multi_select_as_buttons': True,
-        'search_results_limit': LIMIT,
     })
 
     try:
-        response = perform_search(request.GET)
-        if response['shown_result_count'] != response['result_count']:
-            title = _(u'results, (showing only %(shown_result_count)s out of %(result_count)s)') % {
-                'shown_result_count': response['shown_result_count'],
-                'result_count': response['result_count']}
-        else:
-            title = _(u'results')
+        # The results are a lazy list, the list template's paginator
+        # only fetches the page being displayed
+        explain = bool(request.GET.get('explain')) and (request.user.is_staff or request.user.is_superuser)
+        response = perform_search(request.GET, explain=explain)
+        title = _(u'results')
 
         if extra_context:
             context.update(extra_context)
-        query = urlencode(dict(request.GET.items()))
+        # Don't remember the page number or explain flag as part of the query
+        query = urlencode(dict([(key, value) for key, value in request.GET.items() if key not in ('page', 'explain')]))
         
         if query:
             RecentSearch.objects.add_query_for_user(request.user, query, response['result_count'])            
@@ -48,6 +45,7 @@ def results(request, extra_context=None):
             'object_list': response['flat_list'],
             'title': title,
             'time_delta': response['elapsed_time'],
+            'explain_list': response['explain'],
         })
     except Exception, e:
         if settings.DEBUG:
@@ -72,7 +70,6 @@ def search(request, advanced=False):
                 'title': _(u'advanced search'),
                 'form_action': reverse('results'),
                 'submit_method': 'GET',
-                'search_results_limit': LIMIT,
                 'submit_label': _(u'Search'),
                 'submit_icon_famfam': 'zoom',
             },
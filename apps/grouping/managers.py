@@ -1,6 +1,7 @@
 from django.db import models
 from django.db.models import Q
 
+from common.expressions import evaluate_expression
 from metadata.classes import MetadataObject
 from documents.models import Document
 
@@ -29,7 +30,7 @@ class DocumentGroupManager(models.Manager):
                 cls, attribute = item.foreign_document_data.lower().split(u'.')
                 try:
                     if cls == u'metadata':
-                        value_query = Q(**{'documentmetadata__value__%s' % item.operator: eval(item.expression, eval_dict)})
+                        value_query = Q(**{'documentmetadata__value__%s' % item.operator: evaluate_expression(item.expression, eval_dict)})
                         if item.negated:
                             query = (Q(documentmetadata__metadata_type__name=attribute) & ~value_query)
                         else:
@@ -41,7 +42,7 @@ class DocumentGroupManager(models.Manager):
 
                     elif cls == u'document':
                         value_query = Q(**{
-                            '%s__%s' % (attribute, item.operator): eval(item.expression, eval_dict)
+                            '%s__%s' % (attribute, item.operator): evaluate_expression(item.expression, eval_dict)
                         })
                         if item.negated:
                             query = ~value_query
@@ -68,7 +69,7 @@ class DocumentGroupManager(models.Manager):
 
             if group.dynamic_title:
                 try:
-                    document_groups[group]['title'] = eval(group.dynamic_title, eval_dict)
+                    document_groups[group]['title'] = evaluate_expression(group.dynamic_title, eval_dict)
                 except Exception, e:
                     document_groups[group]['title'] = 'Error; %s' % e
             else:
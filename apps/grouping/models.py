@@ -1,6 +1,8 @@
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
 
+from common.expressions import register_expression_model
+
 from grouping.managers import DocumentGroupManager
 from grouping.literals import OPERATOR_CHOICES, INCLUSION_AND, \
     INCLUSION_CHOICES
@@ -38,3 +40,7 @@ class DocumentGroupItem(models.Model):
     class Meta:
         verbose_name = _(u'group item')
         verbose_name_plural = _(u'group items')
+
+
+register_expression_model(DocumentGroup, ('dynamic_title',))
+register_expression_model(DocumentGroupItem, ('expression',))
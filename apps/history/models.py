@@ -9,6 +9,8 @@ from django.utils.translation import ugettext_lazy as _
 from django.core import serializers
 
 #from history.managers import HistoryManager
+from common.expressions import evaluate_expression
+
 from history.runtime_data import history_types_dict
 
 
@@ -97,7 +99,7 @@ def _process_history_text(history, text):
 
     for key, value in history.get_expressions().items():
         try:
-            expressions_dict[key] = eval(value, key_values.copy())
+            expressions_dict[key] = evaluate_expression(value, key_values.copy())
         except Exception, e:
             expressions_dict[key] = e
 
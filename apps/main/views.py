@@ -7,6 +7,7 @@ from django.core.urlresolvers import reverse
 
 from documents.statistics import get_statistics as documents_statistics
 from ocr.statistics import get_statistics as ocr_statistics
+from common.expressions import get_statistics as expressions_statistics
 from permissions.api import check_permissions
 
 from main.api import diagnostics, tools
@@ -47,6 +48,7 @@ def statistics(request):
     blocks = []
     blocks.append(documents_statistics())
     blocks.append(ocr_statistics())
+    blocks.append(expressions_statistics())
 
     return render_to_response('statistics.html', {
         'blocks': blocks,
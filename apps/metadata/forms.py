@@ -2,6 +2,8 @@ from django import forms
 from django.utils.translation import ugettext_lazy as _
 from django.forms.formsets import formset_factory
 
+from common.expressions import evaluate_expression
+
 from metadata.conf.settings import AVAILABLE_MODELS
 from metadata.conf.settings import AVAILABLE_FUNCTIONS
 from metadata.models import MetadataSet, MetadataType, \
@@ -32,13 +34,13 @@ class MetadataForm(forms.Form):
             self.fields['id'].initial = self.metadata_type.pk
             if self.metadata_type.default:
                 try:
-                    self.fields['value'].initial = eval(self.metadata_type.default, AVAILABLE_FUNCTIONS)
+                    self.fields['value'].initial = evaluate_expression(self.metadata_type.default, AVAILABLE_FUNCTIONS)
                 except Exception, err:
                     self.fields['value'].initial = err
 
             if self.metadata_type.lookup:
                 try:
-                    choices = eval(self.metadata_type.lookup, AVAILABLE_MODELS)
+                    choices = evaluate_expression(self.metadata_type.lookup, AVAILABLE_MODELS)
                     self.fields['value'] = forms.ChoiceField(label=self.fields['value'].label)
                     choices = zip(choices, choices)
                     if not required:
@@ -1,6 +1,9 @@
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
 
+from dynamic_search.api import register_dependency
+from common.expressions import register_expression_model
+
 from documents.models import Document, DocumentType
 
 from metadata.conf.settings import AVAILABLE_MODELS
@@ -97,3 +100,7 @@ class DocumentTypeDefaults(models.Model):
     class Meta:
         verbose_name = _(u'document type defaults')
         verbose_name_plural = _(u'document types defaults')
+
+
+register_dependency(DocumentMetadata, lambda x: x.document)
+register_expression_model(MetadataType, ('default', 'lookup'))
@@ -10,7 +10,7 @@ from django.utils.http import urlencode
 from documents.literals import PERMISSION_DOCUMENT_TYPE_EDIT
 from documents.models import Document, RecentDocument, DocumentType
 from permissions.api import check_permissions
-from document_indexing.api import update_indexes, delete_indexes
+from document_indexing.api import update_indexes
 
 from common.utils import generate_choices_w_labels#, two_state_template
 from common.views import assign_remove
@@ -71,12 +71,6 @@ def metadata_edit(request, document_id=None, document_id_list=None):
         formset = MetadataFormSet(request.POST)
         if formset.is_valid():
             for document in documents:
-
-                warnings = delete_indexes(document)
-                if request.user.is_staff or request.user.is_superuser:
-                    for warning in warnings:
-                        messages.warning(request, _(u'Error deleting document indexes; %s') % warning)
-
                 errors = []
                 for form in formset.forms:
                     if form.cleaned_data['update']:
@@ -227,12 +221,6 @@ def metadata_remove(request, document_id=None, document_id_list=None):
         formset = MetadataRemoveFormSet(request.POST)
         if formset.is_valid():
             for document in documents:
-
-                warnings = delete_indexes(document)
-                if request.user.is_staff or request.user.is_superuser:
-                    for warning in warnings:
-                        messages.warning(request, _(u'Error deleting document indexes; %s') % warning)
-
                 for form in formset.forms:
                     if form.cleaned_data['update']:
                         metadata_type = get_object_or_404(MetadataType, pk=form.cleaned_data['id'])
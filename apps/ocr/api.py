@@ -2,20 +2,26 @@
 
 import codecs
 import os
+import shutil
 import subprocess
 import tempfile
 import sys
+from multiprocessing.pool import ThreadPool
 
 from django.utils.translation import ugettext as _
 from django.utils.importlib import import_module
+from django.db import connection
 
+from common import TEMPORARY_DIRECTORY
 from converter.api import convert_document_for_ocr
 from documents.models import DocumentPage
 
 from ocr.conf.settings import TESSERACT_PATH
 from ocr.conf.settings import TESSERACT_LANGUAGE
 from ocr.conf.settings import PDFTOTEXT_PATH
-from ocr.exceptions import TesseractError, PdftotextError
+from ocr.conf.settings import PAGE_CONCURRENT_EXECUTION
+from ocr.conf.settings import WORKSPACE_DIRECTORY
+from ocr.exceptions import TesseractError, PdftotextError, OCRError
 
 
 def get_language_backend():
@@ -73,48 +79,132 @@ def run_pdftotext(input_filename, output_filename, page_number=None):
         raise PdftotextError(error_text)
 
 
+class OCRWorkspace(object):
+    """
+    Temporary directory holding the single copy of a document's file
+    that all the steps of an OCR job work from, along with their
+    intermediate files
+    """
+    def __init__(self, document):
+        self.directory = tempfile.mkdtemp(prefix=u'ocr_', dir=WORKSPACE_DIRECTORY if WORKSPACE_DIRECTORY else TEMPORARY_DIRECTORY)
+        self.source_filepath = os.path.join(self.directory, u'source')
+        try:
+            document.save_to_file(self.source_filepath)
+        except:
+            self.cleanup()
+            raise
+
+    def get_page_filepath(self, page_number):
+        return os.path.join(self.directory, u'page_%d' % page_number)
+
+    def cleanup(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
 def do_document_ocr(document):
     """
     Do OCR on all the pages of the given document object, first
-    trying to extract text from PDF using pdftotext then by calling
-    tesseract
+    trying to extract the text of the whole PDF with a single call to
+    pdftotext and then calling tesseract for the pages without text.
+    Pages are processed in parallel and each page's text is stored as
+    soon as it is ready, an exception is raised at the end if any page
+    failed
     """
-    for page_index, document_page in enumerate(document.documentpage_set.all()):
-        desc, filepath = tempfile.mkstemp()
-        imagefile = None
-        source = u''
-        try:
-            if document.file_mimetype == u'application/pdf':
-                pdf_filename = os.extsep.join([filepath, u'pdf'])
-                document.save_to_file(pdf_filename)
-                run_pdftotext(pdf_filename, filepath, document_page.page_number)
-                cleanup(pdf_filename)
-                if os.stat(filepath).st_size == 0:
-                    #PDF page had no text, run tesseract on the page
-                    imagefile = convert_document_for_ocr(document, page=page_index)
-                    run_tesseract(imagefile, filepath, TESSERACT_LANGUAGE)
-                    ocr_output = os.extsep.join([filepath, u'txt'])
-                    source = _(u'Text from OCR')
+    page_list = list(document.documentpage_set.all())
+    if not page_list:
+        return
+
+    workspace = OCRWorkspace(document)
+    errors = []
+    try:
+        if document.file_mimetype == u'application/pdf':
+            pdf_text = extract_pdf_text(workspace)
+            pending_pages = []
+            for document_page in page_list:
+                content = pdf_text.get(document_page.page_number)
+                if content:
+                    document_page.content = ocr_cleanup(content)
+                    document_page.page_label = _(u'Text extracted from PDF')
+                    document_page.save()
                 else:
-                    ocr_output = filepath
-                    source = _(u'Text extracted from PDF')
-            else:
-                imagefile = convert_document_for_ocr(document, page=page_index)
-                run_tesseract(imagefile, filepath, TESSERACT_LANGUAGE)
-                ocr_output = os.extsep.join([filepath, u'txt'])
-                source = _(u'Text from OCR')
-            f = codecs.open(ocr_output, 'r', 'utf-8')
-            document_page = document.documentpage_set.get(page_number=page_index + 1)
-            document_page.content = ocr_cleanup(f.read().strip())
-            document_page.page_label = source
-            document_page.save()
-            f.close()
-            cleanup(ocr_output)
-        finally:
-            os.close(desc)
-            cleanup(filepath)
-            if imagefile:
-                cleanup(imagefile)
+                    #PDF page had no text, run tesseract on the page
+                    pending_pages.append(document_page)
+        else:
+            pending_pages = page_list
+
+        if pending_pages:
+            pool = ThreadPool(max(1, min(PAGE_CONCURRENT_EXECUTION, len(pending_pages))))
+            try:
+                for document_page, content, exception in pool.imap_unordered(lambda document_page: _do_page_ocr(workspace, document, document_page), pending_pages):
+                    if exception:
+                        errors.append(_(u'page %(page_number)d: %(exception)s') % {
+                            'page_number': document_page.page_number, 'exception': exception})
+                    else:
+                        document_page.content = ocr_cleanup(content)
+                        document_page.page_label = _(u'Text from OCR')
+                        document_page.save()
+            finally:
+                pool.close()
+                pool.join()
+    finally:
+        workspace.cleanup()
+
+    if errors:
+        raise OCRError(u', '.join(errors))
+
+
+def extract_pdf_text(workspace):
+    """
+    Extract the text of all the pages of a PDF file with a single
+    pdftotext call, return a dictionary of page numbers and their
+    stripped text, pages without text are omitted
+    """
+    output_filepath = os.path.join(workspace.directory, u'pdftotext.txt')
+    try:
+        run_pdftotext(workspace.source_filepath, output_filepath)
+    except PdftotextError:
+        # Let tesseract handle every page
+        return {}
+
+    f = codecs.open(output_filepath, 'r', 'utf-8')
+    text = f.read()
+    f.close()
+    cleanup(output_filepath)
+
+    result = {}
+    # pdftotext ends every page with a form feed character
+    for page_index, page_text in enumerate(text.split(u'\f')):
+        page_text = page_text.strip()
+        if page_text:
+            result[page_index + 1] = page_text
+
+    return result
+
+
+def _do_page_ocr(workspace, document, document_page):
+    """
+    Rasterize a single document page and OCR it using tesseract, meant
+    to be called from a worker thread.  Return a tuple with the page,
+    the text and the exception if the page failed
+    """
+    page_index = document_page.page_number - 1
+    filepath = workspace.get_page_filepath(document_page.page_number)
+    imagefile = None
+    try:
+        imagefile = convert_document_for_ocr(document, page=page_index, input_filepath=workspace.source_filepath, output_directory=workspace.directory)
+        run_tesseract(imagefile, filepath, TESSERACT_LANGUAGE)
+        f = codecs.open(os.extsep.join([filepath, u'txt']), 'r', 'utf-8')
+        content = f.read().strip()
+        f.close()
+        return document_page, content, None
+    except Exception, exception:
+        return document_page, None, exception
+    finally:
+        # Free workspace space early, specially when on tmpfs
+        if imagefile:
+            cleanup(imagefile)
+        # Worker threads get their own database connection
+        connection.close()
 
 
 def ocr_cleanup(text):
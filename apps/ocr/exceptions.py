@@ -8,3 +8,7 @@ class TesseractError(Exception):
 
 class PdftotextError(Exception):
     pass
+
+
+class OCRError(Exception):
+    pass
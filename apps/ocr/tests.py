@@ -5,8 +5,21 @@ unittest). These will both pass when you run "manage.py test".
 Replace these with more appropriate tests for your application.
 """
 
+import codecs
+import os
+
 from django.test import TestCase
 
+from ocr import api
+from ocr.exceptions import PdftotextError
+
+
+class SourceDocument(object):
+    def save_to_file(self, filepath):
+        destination = open(filepath, 'wb')
+        destination.write('%PDF-1.4')
+        destination.close()
+
 class SimpleTest(TestCase):
     def test_basic_addition(self):
         """
@@ -14,6 +27,53 @@ class SimpleTest(TestCase):
         """
         self.failUnlessEqual(1 + 1, 2)
 
+
+class ExtractPDFTextTest(TestCase):
+    def setUp(self):
+        self.run_pdftotext = api.run_pdftotext
+        self.workspace = api.OCRWorkspace(SourceDocument())
+        self.output = u''
+        self.calls = []
+
+        def run_pdftotext(input_filename, output_filename, page_number=None):
+            self.calls.append((input_filename, page_number))
+            if self.output is None:
+                raise PdftotextError(u'Syntax Error: Couldn\'t find trailer dictionary')
+            destination = codecs.open(output_filename, 'w', 'utf-8')
+            destination.write(self.output)
+            destination.close()
+
+        api.run_pdftotext = run_pdftotext
+
+    def tearDown(self):
+        api.run_pdftotext = self.run_pdftotext
+        self.workspace.cleanup()
+
+    def test_pages_split(self):
+        self.output = u'first page\f second page \n\fthird page\n\f'
+        self.assertEqual(api.extract_pdf_text(self.workspace), {
+            1: u'first page', 2: u'second page', 3: u'third page'})
+        self.assertEqual(self.calls, [(self.workspace.source_filepath, None)])
+
+    def test_empty_pages_omitted(self):
+        self.output = u'\f \n\fthird page\f\f'
+        self.assertEqual(api.extract_pdf_text(self.workspace), {3: u'third page'})
+
+    def test_unicode_text(self):
+        self.output = u'\u00e1rbol\f\u00f1and\u00fa\f'
+        self.assertEqual(api.extract_pdf_text(self.workspace), {
+            1: u'\u00e1rbol', 2: u'\u00f1and\u00fa'})
+
+    def test_output_removed(self):
+        self.output = u'first page\f'
+        api.extract_pdf_text(self.workspace)
+        self.assertEqual(os.listdir(self.workspace.directory), [u'source'])
+
+    def test_pdftotext_error(self):
+        self.output = None
+        self.assertEqual(api.extract_pdf_text(self.workspace), {})
+
+
 __test__ = {"doctest": """
 Another way to test that 1 + 1 is equal to 2.
 
@@ -1,15 +1,37 @@
+import time
+import operator
+
 from django.db.utils import DatabaseError
-from django.shortcuts import get_object_or_404
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, pre_delete, \
+    m2m_changed, post_syncdb
 from django.utils.translation import ugettext
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import PermissionDenied, ImproperlyConfigured
+from django.core.cache import get_cache, InvalidCacheBackendError
 from django.utils.translation import ugettext_lazy as _
 from django.db import transaction
+from django.contrib.auth.models import User, Group
+from django.contrib.contenttypes.models import ContentType
 
 from permissions import PERMISSION_ROLE_VIEW, PERMISSION_ROLE_EDIT, \
     PERMISSION_ROLE_CREATE, PERMISSION_ROLE_DELETE, \
     PERMISSION_PERMISSION_GRANT, PERMISSION_PERMISSION_REVOKE
 
-from permissions.models import Permission
+from permissions import models as permissions_models
+from permissions.models import Permission, PermissionHolder, Role, \
+    RoleMember, EffectivePermission
+from permissions.conf.settings import CACHE_URI
+from permissions.conf.settings import CACHE_TIMEOUT
+
+PERMISSIONS_VERSION_KEY = u'permissions_version'
+
+if CACHE_URI:
+    try:
+        cache_backend = get_cache(CACHE_URI)
+    except (ImportError, InvalidCacheBackendError), exc:
+        raise ImproperlyConfigured(u'Invalid PERMISSIONS_CACHE_URI: %s; %s' % (CACHE_URI, exc))
+else:
+    cache_backend = None
 
 namespace_titles = {
     'permissions': _(u'Permissions')
@@ -34,15 +56,193 @@ def register_permission(permission):
         transaction.commit()
 
 
+def get_held_permissions(requester):
+    """
+    Return a queryset of the permissions granted to the requester
+    directly, through its groups or through the roles of either
+    """
+    holders = {ContentType.objects.get_for_model(requester): [requester.pk]}
+    if isinstance(requester, User):
+        holders[ContentType.objects.get_for_model(Group)] = list(requester.groups.values_list('pk', flat=True))
+
+    member_query = reduce(operator.or_, [Q(member_type=member_type, member_id__in=member_ids) for member_type, member_ids in holders.items() if member_ids])
+    role_ids = list(RoleMember.objects.filter(member_query).values_list('role', flat=True).distinct())
+    if role_ids:
+        holders.setdefault(ContentType.objects.get_for_model(Role), []).extend(role_ids)
+
+    holder_query = reduce(operator.or_, [Q(permissionholder__holder_type=holder_type, permissionholder__holder_id__in=holder_ids) for holder_type, holder_ids in holders.items() if holder_ids])
+    return Permission.objects.filter(holder_query).distinct()
+
+
+def resolve_permissions(requester):
+    """
+    Return the set of (namespace, name) tuples of the requester's
+    permissions, users are looked up in the effective permission table
+    """
+    if isinstance(requester, User):
+        queryset = Permission.objects.filter(effectivepermission__user=requester)
+    else:
+        queryset = get_held_permissions(requester)
+    return frozenset(queryset.values_list('namespace', 'name'))
+
+
+def get_holder_users(holder):
+    """
+    Return the users whose permissions depend on the given holder
+    """
+    if isinstance(holder, User):
+        return [holder]
+    elif isinstance(holder, Group):
+        return list(holder.user_set.all())
+    elif isinstance(holder, Role):
+        members = dict([(model, list(holder.rolemember_set.filter(member_type=ContentType.objects.get_for_model(model)).values_list('member_id', flat=True))) for model in (User, Group)])
+        return list(User.objects.filter(Q(pk__in=members[User]) | Q(groups__in=members[Group])).distinct())
+    else:
+        return []
+
+
+def update_effective_permissions(users):
+    for user in users:
+        EffectivePermission.objects.set_for_user(user, get_held_permissions(user).values_list('pk', flat=True))
+
+
+def rebuild_effective_permissions():
+    count = 0
+    for user in User.objects.all().iterator():
+        update_effective_permissions([user])
+        count += 1
+    return count
+
+
+def check_effective_permissions():
+    """
+    Compare the effective permission table against the permissions
+    resolved from the grants and memberships, return a list of
+    (user, missing permissions, extra permissions) for every mismatch
+    """
+    mismatches = []
+    for user in User.objects.all().iterator():
+        expected = set(get_held_permissions(user))
+        stored = set(Permission.objects.filter(effectivepermission__user=user))
+        if expected != stored:
+            mismatches.append((user, expected - stored, stored - expected))
+    return mismatches
+
+
+def get_permissions_version():
+    version = cache_backend.get(PERMISSIONS_VERSION_KEY)
+    if version is None:
+        # Start from the clock so entries cached under a version that
+        # was lost with the cache are not reused
+        cache_backend.add(PERMISSIONS_VERSION_KEY, int(time.time()))
+        version = cache_backend.get(PERMISSIONS_VERSION_KEY)
+    return version
+
+
+def invalidate_permissions(*args, **kwargs):
+    """
+    Discard every cached effective permission set, called whenever a
+    permission is granted or revoked or a role or group membership changes
+    """
+    if cache_backend:
+        try:
+            cache_backend.incr(PERMISSIONS_VERSION_KEY)
+        except ValueError:
+            cache_backend.set(PERMISSIONS_VERSION_KEY, int(time.time()))
+
+
+def get_effective_permissions(requester):
+    """
+    Return the effective permissions of a requester, remembered in the
+    requester instance for the rest of the request and in the shared
+    cache, when configured, for the following requests
+    """
+    effective_permissions = getattr(requester, '_effective_permissions', None)
+    if effective_permissions is not None:
+        return effective_permissions
+
+    if getattr(requester, 'pk', None) is None:
+        # Anonymous users hold no permissions
+        effective_permissions = frozenset()
+    elif cache_backend:
+        key = u'permissions_%s_%s_%s' % (requester._meta.object_name.lower(), requester.pk, get_permissions_version())
+        effective_permissions = cache_backend.get(key)
+        if effective_permissions is None:
+            effective_permissions = resolve_permissions(requester)
+            cache_backend.set(key, effective_permissions, CACHE_TIMEOUT)
+    else:
+        effective_permissions = resolve_permissions(requester)
+
+    requester._effective_permissions = effective_permissions
+    return effective_permissions
+
+
 def check_permissions(requester, permission_list):
+    if isinstance(requester, User):
+        if requester.is_superuser or requester.is_staff:
+            return True
+
+    effective_permissions = get_effective_permissions(requester)
     for permission_item in permission_list:
-        permission = get_object_or_404(Permission,
-            namespace=permission_item['namespace'], name=permission_item['name'])
-        if permission.has_permission(requester):
+        if (permission_item['namespace'], permission_item['name']) in effective_permissions:
             return True
 
     raise PermissionDenied(ugettext(u'Insufficient permissions.'))
 
+
+def permission_holder_changed(sender, instance, **kwargs):
+    update_effective_permissions(get_holder_users(instance.holder_object))
+    invalidate_permissions()
+
+
+def role_member_changed(sender, instance, **kwargs):
+    update_effective_permissions(get_holder_users(instance.member_object))
+    invalidate_permissions()
+
+
+def group_pre_delete(sender, instance, **kwargs):
+    instance._affected_users = get_holder_users(instance)
+
+
+def group_post_delete(sender, instance, **kwargs):
+    update_effective_permissions(getattr(instance, '_affected_users', []))
+    invalidate_permissions()
+
+
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # The group's users can't be found once they are removed
+        instance._affected_users = get_holder_users(instance)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            users = [instance]
+        elif action == 'post_clear':
+            users = getattr(instance, '_affected_users', [])
+        else:
+            users = User.objects.filter(pk__in=pk_set)
+        update_effective_permissions(users)
+        invalidate_permissions()
+
+
+def effective_permission_table_created(sender, created_models, verbosity=1, **kwargs):
+    if EffectivePermission in created_models:
+        if verbosity >= 1:
+            print 'Building the effective permission table'
+        rebuild_effective_permissions()
+
+
+for model, handler in ((PermissionHolder, permission_holder_changed), (RoleMember, role_member_changed)):
+    post_save.connect(handler, sender=model, dispatch_uid=u'permissions_save_%s' % model.__name__)
+    post_delete.connect(handler, sender=model, dispatch_uid=u'permissions_delete_%s' % model.__name__)
+for model in (Role, Permission, Group):
+    post_save.connect(invalidate_permissions, sender=model, dispatch_uid=u'invalidate_permissions_save_%s' % model.__name__)
+post_delete.connect(invalidate_permissions, sender=Role, dispatch_uid=u'invalidate_permissions_delete_Role')
+post_delete.connect(invalidate_permissions, sender=Permission, dispatch_uid=u'invalidate_permissions_delete_Permission')
+pre_delete.connect(group_pre_delete, sender=Group, dispatch_uid=u'permissions_pre_delete_Group')
+post_delete.connect(group_post_delete, sender=Group, dispatch_uid=u'permissions_delete_Group')
+m2m_changed.connect(user_groups_changed, sender=User.groups.through, dispatch_uid=u'permissions_user_groups')
+post_syncdb.connect(effective_permission_table_created, sender=permissions_models, dispatch_uid=u'permissions_effective_permission_table_created')
+
 register_permission(PERMISSION_ROLE_VIEW)
 register_permission(PERMISSION_ROLE_EDIT)
 register_permission(PERMISSION_ROLE_CREATE)
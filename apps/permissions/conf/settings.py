@@ -8,5 +8,7 @@ register_settings(
     module=u'permissions.conf.settings',
     settings=[
         {'name': u'DEFAULT_ROLES', 'global_name': u'ROLES_DEFAULT_ROLES', 'default': [], 'description': _('A list of existing roles that are automatically assigned to newly created users')},
+        {'name': u'CACHE_URI', 'global_name': u'PERMISSIONS_CACHE_URI', 'default': None, 'description': _(u'URI of a cache shared by every process, used to remember the effective permissions of users between requests, i.e.: memcached://127.0.0.1:11211/.  When not set permissions are only remembered for the duration of a request.')},
+        {'name': u'CACHE_TIMEOUT', 'global_name': u'PERMISSIONS_CACHE_TIMEOUT', 'default': 300, 'description': _(u'Number of seconds the effective permissions of a user are kept in the shared cache.')},
     ]
 )
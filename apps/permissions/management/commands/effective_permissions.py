@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from permissions.api import rebuild_effective_permissions, \
+    check_effective_permissions, invalidate_permissions
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify the table of effective permissions per user.'
+    args = '[check|rebuild]'
+
+    def handle(self, action=u'check', *args, **options):
+        if action == u'rebuild':
+            print 'Users updated: %d' % rebuild_effective_permissions()
+            invalidate_permissions()
+        elif action == u'check':
+            mismatches = check_effective_permissions()
+            for user, missing, extra in mismatches:
+                print '%s: missing [%s], extra [%s]' % (user,
+                    u', '.join([u'%s.%s' % (permission.namespace, permission.name) for permission in missing]),
+                    u', '.join([u'%s.%s' % (permission.namespace, permission.name) for permission in extra]))
+            if mismatches:
+                raise CommandError('%d users with inconsistent effective permissions, run the rebuild action to fix them.' % len(mismatches))
+            print 'Effective permissions are consistent.'
+        else:
+            raise CommandError('Unknown action: %s' % action)
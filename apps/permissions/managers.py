@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import models, connection, transaction
 from django.contrib.contenttypes.models import ContentType
 
+from common.utils import insert_rows
+
 
 class RoleMemberManager(models.Manager):
     def get_roles_for_member(self, member_obj):
@@ -12,3 +14,27 @@ class PermissionManager(models.Manager):
     def get_for_holder(self, holder):
         ct = ContentType.objects.get_for_model(holder)
         return self.model.objects.filter(permissionholder__holder_type=ct).filter(permissionholder__holder_id=holder.pk)
+
+
+class EffectivePermissionManager(models.Manager):
+    def get_permission_ids(self, user):
+        return set(self.model.objects.filter(user=user).values_list('permission', flat=True))
+
+    @transaction.commit_on_success
+    def set_for_user(self, user, permission_ids):
+        """
+        Make the stored permissions of the user match permission_ids,
+        only adding and removing the rows that differ
+        """
+        current_ids = self.get_permission_ids(user)
+        removed_ids = current_ids - set(permission_ids)
+        if removed_ids:
+            self.model.objects.filter(user=user, permission__in=removed_ids).delete()
+        added_ids = set(permission_ids) - current_ids
+        if added_ids:
+            opts = self.model._meta
+            insert_rows(connection.cursor(), opts.db_table,
+                [opts.get_field('user').column, opts.get_field('permission').column],
+                [(user.pk, permission_id) for permission_id in added_ids])
+            # Raw statements don't mark the transaction as dirty
+            transaction.set_dirty()
@@ -4,7 +4,8 @@ from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import generic
 from django.contrib.auth.models import User
 
-from permissions.managers import RoleMemberManager, PermissionManager
+from permissions.managers import RoleMemberManager, PermissionManager, \
+    EffectivePermissionManager
 
 
 class Permission(models.Model):
@@ -105,3 +106,23 @@ class RoleMember(models.Model):
 
     def __unicode__(self):
         return unicode(self.member_object)
+
+
+class EffectivePermission(models.Model):
+    """
+    Denormalized permissions of each user, whether held directly or
+    through groups and roles, kept up to date as grants and memberships
+    change
+    """
+    user = models.ForeignKey(User, verbose_name=_(u'user'))
+    permission = models.ForeignKey(Permission, verbose_name=_(u'permission'))
+
+    objects = EffectivePermissionManager()
+
+    class Meta:
+        unique_together = ('user', 'permission')
+        verbose_name = _(u'effective permission')
+        verbose_name_plural = _(u'effective permissions')
+
+    def __unicode__(self):
+        return u'%s: %s' % (self.user, self.permission)
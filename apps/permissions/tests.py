@@ -6,6 +6,13 @@ Replace these with more appropriate tests for your application.
 """
 
 from django.test import TestCase
+from django.contrib.auth.models import User, Group
+from django.contrib.contenttypes.models import ContentType
+
+from permissions.models import Permission, PermissionHolder, Role, \
+    RoleMember
+from permissions.api import check_effective_permissions, \
+    resolve_permissions
 
 class SimpleTest(TestCase):
     def test_basic_addition(self):
@@ -14,6 +21,73 @@ class SimpleTest(TestCase):
         """
         self.failUnlessEqual(1 + 1, 2)
 
+
+class EffectivePermissionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(u'tester', u'tester@example.com', u'password')
+        self.group = Group.objects.create(name=u'editors')
+        self.role = Role.objects.create(name=u'reviewer', label=u'Reviewer')
+        self.permission = Permission.objects.create(namespace=u'tests', name=u'review', label=u'Review')
+
+    def grant(self, holder):
+        PermissionHolder.objects.create(permission=self.permission,
+            holder_type=ContentType.objects.get_for_model(holder),
+            holder_id=holder.pk)
+
+    def assertHeld(self, held):
+        self.assertEqual(check_effective_permissions(), [])
+        self.assertEqual((u'tests', u'review') in resolve_permissions(self.user), held)
+
+    def test_direct_grant(self):
+        self.grant(self.user)
+        self.assertHeld(True)
+        PermissionHolder.objects.filter(permission=self.permission).delete()
+        self.assertHeld(False)
+
+    def test_group_membership(self):
+        self.grant(self.group)
+        self.assertHeld(False)
+        self.user.groups.add(self.group)
+        self.assertHeld(True)
+        self.user.groups.remove(self.group)
+        self.assertHeld(False)
+
+    def test_group_cleared(self):
+        self.grant(self.group)
+        self.user.groups.add(self.group)
+        self.group.user_set.clear()
+        self.assertHeld(False)
+
+    def test_group_deleted(self):
+        self.grant(self.group)
+        self.user.groups.add(self.group)
+        self.assertHeld(True)
+        self.group.delete()
+        self.assertHeld(False)
+
+    def test_role_membership(self):
+        self.grant(self.role)
+        self.role.add_member(self.user)
+        self.assertHeld(True)
+        RoleMember.objects.filter(role=self.role).delete()
+        self.assertHeld(False)
+
+    def test_role_granted_after_membership(self):
+        self.role.add_member(self.user)
+        self.assertHeld(False)
+        self.grant(self.role)
+        self.assertHeld(True)
+
+    def test_role_through_group(self):
+        self.grant(self.role)
+        self.role.add_member(self.group)
+        self.assertHeld(False)
+        self.user.groups.add(self.group)
+        self.assertHeld(True)
+        self.user.groups.remove(self.group)
+        self.assertHeld(False)
+
+
 __test__ = {"doctest": """
 Another way to test that 1 + 1 is equal to 2.
 
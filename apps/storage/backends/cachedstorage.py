@@ -0,0 +1,187 @@
+import errno
+import os
+import time
+import hashlib
+import tempfile
+
+from django.core.files.base import File
+from django.core.files.storage import Storage
+from django.core.urlresolvers import get_callable
+from django.utils.encoding import smart_str
+
+from storage.conf.settings import CACHED_STORAGE_BACKEND
+from storage.conf.settings import CACHED_STORAGE_LOCATION
+from storage.conf.settings import CACHED_STORAGE_MAXIMUM_SIZE
+
+# Seconds during which a cache entry that was just used is not evicted,
+# so it isn't removed between being fetched and being opened
+EVICTION_GRACE_PERIOD = 60
+
+
+class CachedStorage(Storage):
+    """
+    Wrapper of a remote storage backend keeping the files read in a
+    local directory up to a size budget, the least recently used are
+    evicted first.  Files can be fetched under a key of the caller's
+    choice, such as the checksum of their contents, so identical files
+    are only cached once
+    """
+    def __init__(self, *args, **kwargs):
+        self.backend = get_callable(CACHED_STORAGE_BACKEND)()
+        self.separator = getattr(self.backend, 'separator', u'/')
+        self.location = CACHED_STORAGE_LOCATION
+        self.maximum_size = CACHED_STORAGE_MAXIMUM_SIZE
+
+    def get_cache_filepath(self, key):
+        return os.path.join(self.location, hashlib.sha1(smart_str(key)).hexdigest())
+
+    def get_cached_path(self, name, key=None):
+        """
+        Return the path of the local copy of a file, fetching it from
+        the backend if it isn't cached
+        """
+        filepath = self.get_cache_filepath(key or name)
+        try:
+            # Mark as recently used
+            os.utime(filepath, None)
+            return filepath
+        except OSError, exc:
+            if exc.errno != errno.ENOENT:
+                raise
+
+        if not os.path.isdir(self.location):
+            os.makedirs(self.location)
+
+        # Fetched to a temporary name and renamed so that other processes
+        # never see a partial copy
+        handle, temporary_path = tempfile.mkstemp(dir=self.location, prefix=u'.')
+        try:
+            destination = os.fdopen(handle, 'wb')
+            try:
+                source = self.backend.open(name)
+                try:
+                    while True:
+                        chunk = source.read(1024 * 1024)
+                        if not chunk:
+                            break
+                        destination.write(chunk)
+                finally:
+                    source.close()
+            finally:
+                destination.close()
+            os.rename(temporary_path, filepath)
+        except:
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+            raise
+
+        self.evict()
+        return filepath
+
+    def evict(self):
+        """
+        Remove the least recently used files until the cache fits its
+        size budget, return the number of files removed
+        """
+        entries = []
+        total_size = 0
+        for filename in os.listdir(self.location):
+            try:
+                stat_result = os.stat(os.path.join(self.location, filename))
+            except OSError:
+                continue
+            total_size += stat_result.st_size
+            if not filename.startswith(u'.'):
+                entries.append((stat_result.st_mtime, stat_result.st_size, filename))
+
+        removed = 0
+        now = time.time()
+        for mtime, size, filename in sorted(entries):
+            if total_size <= self.maximum_size or now - mtime < EVICTION_GRACE_PERIOD:
+                break
+            try:
+                os.remove(os.path.join(self.location, filename))
+            except OSError:
+                continue
+            total_size -= size
+            removed += 1
+
+        return removed
+
+    def discard(self, key):
+        try:
+            os.remove(self.get_cache_filepath(key))
+        except OSError:
+            pass
+
+    def open(self, name, mode='rb', key=None):
+        try:
+            return File(open(self.get_cached_path(name, key), mode))
+        except IOError, exc:
+            if exc.errno != errno.ENOENT:
+                raise
+            # Evicted by another process meanwhile
+            self.discard(key or name)
+            return File(open(self.get_cached_path(name, key), mode))
+
+    def copy_to_file(self, name, filepath, key=None):
+        """
+        Place a copy of a file at filepath, as a hard link to the local
+        copy when possible so the contents aren't duplicated.  Renaming
+        over filepath keeps previous links to the cache from being
+        written through
+        """
+        directory, filename = os.path.split(filepath)
+        temporary_path = os.path.join(directory, u'.%s.%d' % (filename, os.getpid()))
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+
+        try:
+            os.link(self.get_cached_path(name, key), temporary_path)
+        except (OSError, AttributeError):
+            # Different filesystem, platform without hard links or
+            # evicted meanwhile
+            source = self.open(name, key=key)
+            destination = open(temporary_path, 'wb')
+            try:
+                for chunk in source.chunks():
+                    destination.write(chunk)
+            finally:
+                destination.close()
+                source.close()
+
+        os.rename(temporary_path, filepath)
+        return filepath
+
+    # Everything else is handled by the backend
+    def save(self, name, content):
+        return self.backend.save(name, content)
+
+    def delete(self, name):
+        self.discard(name)
+        self.backend.delete(name)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def path(self, name):
+        return self.backend.path(name)
+
+    def size(self, name):
+        return self.backend.size(name)
+
+    def url(self, name):
+        return self.backend.url(name)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def get_valid_name(self, name):
+        return self.backend.get_valid_name(name)
+
+    def get_available_name(self, name):
+        return self.backend.get_available_name(name)
@@ -11,5 +11,8 @@ register_settings(
         {'name': u'GRIDFS_PORT', 'global_name': u'STORAGE_GRIDFS_PORT', 'default': 27017},
         {'name': u'GRIDFS_DATABASE_NAME', 'global_name': u'STORAGE_GRIDFS_DATABASE_NAME', 'default': u'document_storage'},
         {'name': u'FILESTORAGE_LOCATION', 'global_name': u'STORAGE_FILESTORAGE_LOCATION', 'default': u'document_storage', 'exists': True},
+        {'name': u'CACHED_STORAGE_BACKEND', 'global_name': u'STORAGE_CACHED_STORAGE_BACKEND', 'default': u'storage.backends.gridfsstorage.GridFSStorage', 'description': _(u'Dotted path of the storage backend class whose files are cached locally by the storage.backends.cachedstorage.CachedStorage backend.')},
+        {'name': u'CACHED_STORAGE_LOCATION', 'global_name': u'STORAGE_CACHED_STORAGE_LOCATION', 'default': u'document_storage_cache', 'description': _(u'Directory of the local copies of the files of the cached storage backend, hard links are used to hand them out when it is in the same filesystem as the temporary directory.')},
+        {'name': u'CACHED_STORAGE_MAXIMUM_SIZE', 'global_name': u'STORAGE_CACHED_STORAGE_MAXIMUM_SIZE', 'default': 2147483648, 'description': _(u'Maximum size in bytes of the local copies kept by the cached storage backend, the least recently used are removed first.')},
     ]
 )
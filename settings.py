@@ -180,21 +180,35 @@ TEMPLATE_CONTEXT_PROCESSORS = (
 #STORAGE_GRIDFS_DATABASE_NAME = u'document_storage'
 # Filebased
 #STORAGE_FILESTORAGE_LOCATION = u'document_storage'
+# Local cache of a remote backend, enabled with:
+# DOCUMENTS_STORAGE_BACKEND = CachedStorage
+#STORAGE_CACHED_STORAGE_BACKEND = u'storage.backends.gridfsstorage.GridFSStorage'
+#STORAGE_CACHED_STORAGE_LOCATION = u'document_storage_cache'
+#STORAGE_CACHED_STORAGE_MAXIMUM_SIZE = 2147483648  # In bytes
 #---------- Metadata -----------------
 # METADATA_AVAILABLE_FUNCTIONS = {}
 # METADATA_AVAILABLE_MODELS = {}
 #---------- Indexing -----------------
 #DOCUMENT_INDEXING_AVAILABLE_INDEXING_FUNCTIONS = {}
+#DOCUMENT_INDEXING_REBUILD_CONCURRENT_PROCESSES = 1
 # Flesystem serving
 #DOCUMENT_INDEXING_FILESYSTEM_FILESERVING_ENABLE = True
 #DOCUMENT_INDEXING_FILESYSTEM_FILESERVING_PATH = u'/tmp/mayan/documents'
 #DOCUMENT_INDEXING_FILESYSTEM_SLUGIFY_PATHS = False
+# WebDAV serving
+#DOCUMENT_INDEXING_VIRTUAL_FILESYSTEM_CACHE_URI = None  # Can be a single host (u'memcached://127.0.0.1:11211/'), or multiple separated by a semicolon
+#DOCUMENT_INDEXING_VIRTUAL_FILESYSTEM_CACHE_TIMEOUT = 60  # In seconds
 #---------- Documents ------------------
 # Upload
 #DOCUMENTS_USE_STAGING_DIRECTORY = False
 #DOCUMENTS_STAGING_DIRECTORY = u'/tmp/mayan/staging'
 #DOCUMENTS_DELETE_STAGING_FILE_AFTER_UPLOAD = False
 #DOCUMENTS_STAGING_FILES_PREVIEW_SIZE = '640x480'
+#DOCUMENTS_WATCH_FOLDERS = []
+#example: DOCUMENTS_WATCH_FOLDERS = [{'path': u'/srv/scans/invoices', 'document_type': u'invoice', 'metadata': {'department': u'accounting'}, 'user': u'scanner'}]
+#DOCUMENTS_WATCH_FOLDER_SETTLE_TIME = 10  # In seconds
+#DOCUMENTS_WATCH_FOLDER_POLL_INTERVAL = 10  # In seconds
+#DOCUMENTS_WATCH_FOLDER_CONCURRENT_INGESTIONS = 4
 #DOCUMENTS_ENABLE_SINGLE_DOCUMENT_UPLOAD = True
 #DOCUMENTS_UNCOMPRESS_COMPRESSED_LOCAL_FILES = True
 #DOCUMENTS_UNCOMPRESS_COMPRESSED_STAGING_FILES = True
@@ -218,6 +232,12 @@ TEMPLATE_CONTEXT_PROCESSORS = (
 #DOCUMENTS_ZOOM_MIN_LEVEL = 50
 #DOCUMENTS_ROTATION_STEP = 90
 
+# Image pregeneration
+#DOCUMENTS_PREGENERATE_IMAGES = False
+#DOCUMENTS_PREGENERATE_CONCURRENT_EXECUTION = 1
+#DOCUMENTS_PREGENERATE_RETRY_DELAY = 10  # In seconds
+#DOCUMENTS_PREGENERATE_TIMEOUT = 300  # In seconds
+
 #------------- Groups --------------------
 #GROUPING_SHOW_EMPTY_GROUPS = True
 #------------ Converter --------------
@@ -231,19 +251,31 @@ TEMPLATE_CONTEXT_PROCESSORS = (
 #CONVERTER_GRAPHICS_BACKEND = u'converter.backends.imagemagick'
 #CONVERTER_GM_PATH = u'/usr/bin/gm'
 #CONVERTER_GM_SETTINGS = u''
+#CONVERTER_BATCH_POOL_SIZE = 2
+#CONVERTER_BATCH_TIMEOUT = 120  # In seconds
+#CONVERTER_BATCH_MAX_JOBS = 100
+#CONVERTER_CACHE_DIRECTORY = u''
+#CONVERTER_CACHE_MAXIMUM_SIZE = 512 * 1024 * 1024  # In bytes
+#CONVERTER_CACHE_EVICTION_POLICY = u'lru'  # or u'lfu'
 #------------ OCR --------------
 #OCR_TESSERACT_PATH = u'/usr/bin/tesseract'
 #OCR_NODE_CONCURRENT_EXECUTION = 1
+#OCR_PAGE_CONCURRENT_EXECUTION = 1
 #OCR_TESSERACT_LANGUAGE = u'eng'
 #OCR_REPLICATION_DELAY = 10
 #OCR_AUTOMATIC_OCR = False
 #OCR_PDFTOTEXT_PATH = u'/usr/bin/pdftotext'
+#OCR_WORKSPACE_DIRECTORY = u''  # For example u'/dev/shm'
 #OCR_QUEUE_PROCESSING_INTERVAL = 10  # In seconds
 #OCR_CACHE_URI = None  # Can be a single host (u'memcached://127.0.0.1:11211/'), or multiple separated by a semicolon
 #------------ Permissions --------------
 #ROLES_DEFAULT_ROLES = []
+#PERMISSIONS_CACHE_URI = None  # Can be a single host (u'memcached://127.0.0.1:11211/'), or multiple separated by a semicolon
+#PERMISSIONS_CACHE_TIMEOUT = 300  # In seconds
 #------------ Searching --------------
 #SEARCH_LIMIT = 100
+#SEARCH_BACKEND = u'dynamic_search.backends.orm'
+#SEARCH_INDEX_UPDATE_INTERVAL = 10  # In seconds
 #------------ django-sendfile --------------
 # Change to xsendfile for apache if x-sendfile is enabled
 SENDFILE_BACKEND = 'sendfile.backends.simple'
@@ -284,6 +316,9 @@ LOGIN_EXEMPT_URLS = (
     r'^password/reset/confirm/(?P<uidb36>[0-9A-Za-z]+)-(?P<token>.+)/$',
     r'^password/reset/complete/$',
     r'^password/reset/done/$',
+
+    # Authenticates WebDAV clients itself
+    r'^document_indexing/webdav/',
 )
 #--------- Pagination ----------------
 PAGINATION_INVALID_PAGE_RAISES_404 = True